@@ -1,16 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Header
+from fastapi.responses import StreamingResponse, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import uuid
+import json
+import asyncio
+import polars as pl
 import tempfile
 from datetime import datetime
 
+from ..core.config import settings
 from ..core.database import get_db
 from ..services.session_manager import SessionManager
 from ..services.data_profiler import DataProfiler
-from ..core.version_manager import VersionManager
+from ..services.profile_tasks import profile_task_manager
+from ..services.profile_cache import ProfileCache, profile_cache, file_content_hash
+from ..services.file_ingest import ingest_file, convert_to_parquet, CONVERTIBLE_FORMATS
+from ..services.upload_stream import receive_upload
+from ..services.file_catalog import FileCatalog, meta_object_key
+from ..services.jobs import job_manager, TERMINAL_STATUSES
+from ..core.version_manager import VersionManager, parse_sort
 from ..core.minio_client import MinIOClient
+from ..core.parquet_reader import ParquetObjectReader
+from ..core.http_cache import make_etag, etag_matches, cached, IMMUTABLE, REVALIDATE
+from ..core.preview_payload import (
+    resolve_format, table_response, columnar, rows_frame, truncate_strings, json_response
+)
+from ..core.executors import io_pool, cpu_pool, offload, pool_stats, event_loop_lag
+from ..core.services import services
 from ..models.data_version import Project
 from pydantic import BaseModel
 
@@ -24,6 +42,8 @@ class ProjectCreate(BaseModel):
 class ChatRequest(BaseModel):
     session_id: str
     message: str
+    background: bool = False  # 作为后台任务执行，立即返回任务ID
+    pipeline: Optional[bool] = None  # 流水线模式（延迟物化），未指定时使用 PIPELINE_MODE
 
 class ChatResponse(BaseModel):
     status: str
@@ -31,6 +51,11 @@ class ChatResponse(BaseModel):
     data_preview: Optional[List[dict]] = None
     version_id: Optional[str] = None
     rows_affected: Optional[int] = None
+    job_id: Optional[str] = None
+
+class JobSubmitRequest(BaseModel):
+    kind: str  # profile, chat
+    params: dict = {}
 
 class VersionRollbackRequest(BaseModel):
     session_id: str
@@ -41,17 +66,29 @@ def get_session_manager(db: Session = Depends(get_db)):
     return SessionManager(db)
 
 def get_data_profiler():
-    return DataProfiler()
-
-def get_version_manager():
-    return VersionManager()
+    return services.profiler
 
 def get_minio_client():
-    return MinIOClient()
+    return services.minio
+
+def get_version_manager(db: Session = Depends(get_db),
+                        minio_client: MinIOClient = Depends(get_minio_client)):
+    return VersionManager(db, minio_client)
+
+def parse_columns(columns: Optional[str]) -> Optional[List[str]]:
+    """解析逗号分隔的列名参数"""
+    if not columns:
+        return None
+    return [col.strip() for col in columns.split(',') if col.strip()]
+
+def clamp_rows(rows: int) -> int:
+    """单次读取的行数限制在 [0, PREVIEW_MAX_ROWS]"""
+    return max(0, min(rows, settings.PREVIEW_MAX_ROWS))
 
 # 项目相关端点
 @router.post("/projects", response_model=dict)
-async def create_project(
+@offload(io_pool)
+def create_project(
     project: ProjectCreate,
     db: Session = Depends(get_db)
 ):
@@ -75,7 +112,8 @@ async def create_project(
     }
 
 @router.get("/projects", response_model=List[dict])
-async def get_projects(db: Session = Depends(get_db)):
+@offload(io_pool)
+def get_projects(db: Session = Depends(get_db)):
     """获取所有项目列表"""
     projects = db.query(Project).all()
     return [
@@ -90,7 +128,8 @@ async def get_projects(db: Session = Depends(get_db)):
     ]
 
 @router.get("/projects/{project_id}", response_model=dict)
-async def get_project_details(
+@offload(io_pool)
+def get_project_details(
     project_id: str,
     db: Session = Depends(get_db)
 ):
@@ -134,166 +173,408 @@ async def upload_file(
     if file_ext not in allowed_extensions:
         raise HTTPException(status_code=400, detail="不支持的文件类型")
     
-    # 保存文件
     file_id = str(uuid.uuid4())
     filename = f"{file_id}_{file.filename}"
     upload_dir = "uploads"
     os.makedirs(upload_dir, exist_ok=True)
-    
     file_path = os.path.join(upload_dir, filename)
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
     
-    # 上传到MinIO
     bucket_name = f"project-{project_id}"
-    object_name = f"data/{filename}"
-    
-    if not minio_client.upload_file(file_path, bucket_name, object_name):
-        raise HTTPException(status_code=500, detail="文件上传失败")
-    
-    # 创建初始版本
-    version_manager = VersionManager(db, minio_client)
-    version = version_manager.create_version(
-        project_id=project_id,
-        message=f"上传文件: {file.filename}",
-        code="# 初始数据上传",
-        data_path=file_path
-    )
+    # CSV/TSV/Excel在接入时转换为Parquet，数据对象总是列式快照；原始文件按配置保留在 raw/ 下
+    convert = file_ext in CONVERTIBLE_FORMATS
+    if convert:
+        object_name = f"data/{file_id}_{os.path.splitext(file.filename)[0]}.parquet"
+        original_object = f"raw/{filename}" if settings.INGEST_KEEP_ORIGINAL else None
+    else:
+        object_name = f"data/{filename}"
+        original_object = None
+    parquet_path = os.path.join(upload_dir, os.path.basename(object_name))
+    
+    try:
+        # 分块接收：同时写本地文件、计算哈希、分段上传MinIO，不把整个文件读入内存
+        received = await receive_upload(file, file_path, minio_client, bucket_name,
+                                        original_object if convert else object_name)
+        if not received['uploaded']:
+            raise HTTPException(status_code=500, detail="文件上传失败")
+        
+        # 检测一次编码和分隔符，文本文件就地转码为UTF-8，再转换为Parquet
+        try:
+            manifest = await cpu_pool.run(ingest_file, file_path, utf8_valid=received['utf8_valid'])
+            if convert:
+                manifest = await cpu_pool.run(convert_to_parquet, file_path, manifest, parquet_path)
+        except Exception as e:
+            if original_object:
+                await io_pool.run(minio_client.delete_file, bucket_name, original_object)
+            elif not convert:
+                await io_pool.run(minio_client.delete_file, bucket_name, object_name)
+            raise HTTPException(status_code=400, detail=f"文件解析失败: {str(e)}")
+        
+        def store_upload():
+            # 上传Parquet、写清单、登记目录并创建初始版本（阻塞I/O，在I/O池中执行）
+            content_hash = received['content_hash']
+            if convert:
+                manifest['source_hash'] = content_hash
+                manifest['original_object'] = original_object
+                if not minio_client.upload_file(parquet_path, bucket_name, object_name):
+                    raise HTTPException(status_code=500, detail="文件上传失败")
+                content_hash = file_content_hash(parquet_path)
+            manifest['content_hash'] = content_hash
+            manifest['original_name'] = file.filename
+            minio_client.put_json(bucket_name, meta_object_key(object_name), manifest)
+            profile_cache.bind(f"{bucket_name}/{file_id}", content_hash)
+            size = manifest['size'] if convert else received['size']
+            FileCatalog(db).register(project_id, file_id, file.filename, object_name, size, manifest)
+            
+            # 创建初始版本（快照在对象存储服务端复制）
+            version_manager = VersionManager(db, minio_client)
+            version = version_manager.create_version(
+                project_id=project_id,
+                message=f"上传文件: {file.filename}",
+                code="# 初始数据上传",
+                data_path=parquet_path if convert else file_path,
+                manifest=manifest,
+                source_object=(bucket_name, object_name)
+            )
+            return content_hash, version
+        
+        content_hash, version = await io_pool.run(store_upload)
+    finally:
+        for path in {file_path, parquet_path}:
+            if os.path.exists(path):
+                os.remove(path)
     
     return {
         "message": "文件上传成功",
         "file_id": file_id,
         "filename": file.filename,
-        "version_id": version.id
+        "version_id": version.id,
+        "size": received['size'],
+        "content_hash": content_hash,
+        "encoding": manifest.get("source_encoding"),
+        "delimiter": manifest.get("delimiter"),
+        "format": manifest["format"],
+        "source_format": manifest.get("source_format", manifest["format"]),
+        "rows": manifest.get("rows")
     }
 
 # 获取项目文件列表
 @router.get("/projects/{project_id}/files")
-async def get_project_files(
+@offload(io_pool)
+def get_project_files(
     project_id: str,
     db: Session = Depends(get_db),
     minio_client: MinIOClient = Depends(get_minio_client)
 ):
     """获取项目中的所有文件"""
     try:
-        # 获取项目的存储桶
-        bucket_name = f"project-{project_id}"
-        
-        # 从MinIO获取文件列表
-        files = minio_client.list_files(bucket_name, prefix="data/")
-        
-        # 格式化为标准响应
+        # 从文件目录读取，不列举存储桶
         file_list = []
-        for file_info in files:
-            file_name = file_info["object_name"].split("/")[-1]
-            file_id = file_name.split("_")[0]  # 从文件名提取file_id
-            
+        for record in FileCatalog(db).list(project_id):
             file_list.append({
-                "id": file_id,
-                "name": "_".join(file_name.split("_")[1:]),  # 移除file_id前缀
-                "path": file_info["object_name"],
-                "size": file_info.get("size", 0),
-                "uploaded_at": file_info.get("last_modified", ""),
-                "file_type": file_name.split(".")[-1].lower()
+                "id": record.file_id,
+                "name": record.name,
+                "path": record.object_key,
+                "size": record.size or 0,
+                "uploaded_at": record.created_at.isoformat() if record.created_at else "",
+                "file_type": record.source_format or record.format,
+                "format": record.format,
+                "rows": record.row_count,
+                "content_hash": record.content_hash
             })
         
         return file_list
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 获取文件前几行（按范围读取）
+@router.get("/projects/{project_id}/files/{file_id}/head")
+@offload(io_pool)
+def get_file_head(
+    project_id: str,
+    file_id: str,
+    rows: int = 5,
+    offset: int = 0,
+    columns: Optional[str] = None,
+    format: str = 'rows',
+    max_chars: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    minio_client: MinIOClient = Depends(get_minio_client)
+):
+    """读取文件的一段行和schema
+
+    Parquet数据对象只按范围读取元数据和覆盖这些行的行组中的所需列，不下载整个文件。
+    format: rows（逐行字典）、columnar（列数组，字符串默认截断到 PREVIEW_MAX_CHARS）、
+    arrow（Arrow IPC流，也可通过 Accept: application/vnd.apache.arrow.stream 选择）；
+    max_chars 指定字符串单元格的截断长度。
+    ETag由文件内容哈希和参数生成，内容未变化时返回304，不读取对象。
+    """
+    format = resolve_format(format, accept)
+    record = FileCatalog(db).get(project_id, file_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="文件未找到")
+    if record.format != 'parquet':
+        raise HTTPException(status_code=400, detail="只支持接入后的Parquet文件")
+    
+    bucket_name = f"project-{project_id}"
+    
+    def build() -> Response:
+        reader = ParquetObjectReader(minio_client)
+        try:
+            df = reader.read(bucket_name, record.object_key, columns=parse_columns(columns),
+                             offset=offset, limit=clamp_rows(rows))
+            total_rows = record.row_count
+            if total_rows is None:
+                total_rows = reader.row_count(bucket_name, record.object_key)
+        except pl.exceptions.ColumnNotFoundError as e:
+            raise HTTPException(status_code=400, detail=f"列不存在: {str(e)}")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        
+        return table_response(df, format, {"file_id": file_id, "total_rows": total_rows, "offset": offset},
+                              max_chars=max_chars, default_max_chars=settings.PREVIEW_MAX_CHARS)
+    
+    etag = make_etag('head', record.content_hash or record.object_key, record.size,
+                     rows, offset, columns, format, max_chars)
+    return cached(if_none_match, etag, REVALIDATE, build, vary='Accept')
+
+# 按存储桶校正文件目录
+@router.post("/projects/{project_id}/files/reconcile")
+@offload(io_pool)
+def reconcile_project_files(
+    project_id: str,
+    db: Session = Depends(get_db),
+    minio_client: MinIOClient = Depends(get_minio_client)
+):
+    """用存储桶中的实际对象校正项目文件目录（补登、删除、更新大小）"""
+    try:
+        return FileCatalog(db).reconcile(project_id, minio_client)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def format_preview_profile(raw_profile: dict, format: str = 'rows', columns: Optional[List[str]] = None,
+                           top_values: bool = True, max_chars: Optional[int] = None) -> dict:
+    """转换数据格式以匹配前端DataProfile接口
+
+    format='columnar' 时样本行以列数组返回，字符串单元格按 max_chars（默认 PREVIEW_MAX_CHARS）截断；
+    columns 只保留指定列的统计和样本；top_values=false 时不返回高频值。
+    """
+    column_names = raw_profile['basic_info']['column_names']
+    if columns:
+        missing = [col for col in columns if col not in raw_profile['columns']]
+        if missing:
+            raise HTTPException(status_code=400, detail=f"列不存在: {', '.join(missing)}")
+    selected = columns or column_names
+    
+    head = raw_profile['sample_data']['head']
+    if format == 'columnar':
+        preview = columnar(rows_frame(head, columns), max_chars if max_chars is not None else settings.PREVIEW_MAX_CHARS)
+    elif columns or max_chars:
+        sample_df, _ = truncate_strings(rows_frame(head, columns), max_chars)
+        preview = {'headers': selected, 'rows': sample_df.to_dicts()}
+    else:
+        preview = {'headers': column_names, 'rows': head}
+    
+    profile = {
+        'shape': {
+            'rows': raw_profile['basic_info']['total_rows'],
+            'columns': raw_profile['basic_info']['total_columns']
+        },
+        'memory_usage': str(raw_profile['basic_info']['memory_usage']),
+        'columns': {},
+        'quality': {
+            'score': raw_profile['quality_report']['overall_score'],
+            'issues': [issue['description'] for issue in raw_profile['quality_report']['issues']]
+        },
+        'preview': preview
+    }
+    
+    # 转换列信息
+    for col_name in selected:
+        col_data = raw_profile['columns'][col_name]
+        column_stats = {
+            'type': col_data['dtype'],
+            'non_null_count': col_data['unique_count'] + col_data['null_count'],  # 近似计算
+            'null_count': col_data['null_count'],
+            'unique_count': col_data['unique_count'],
+            'duplicate_rate': 0  # 默认值
+        }
+        
+        # 添加数值统计
+        if col_data.get('is_numeric') and col_data.get('min') is not None:
+            column_stats['numeric_stats'] = {
+                'min': col_data['min'],
+                'max': col_data['max'],
+                'mean': col_data['mean'],
+                'std': col_data['std']
+            }
+        
+        # 添加分类值统计
+        if top_values and col_data.get('top_values'):
+            column_stats['top_values'] = []
+            for item in col_data['top_values']:
+                if isinstance(item, dict) and 'value' in item and 'count' in item:
+                    column_stats['top_values'].append([item['value'], item['count']])
+        
+        profile['columns'][col_name] = column_stats
+    
+    return profile
+
 # 获取文件预览
 @router.get("/projects/{project_id}/files/{file_id}/preview")
 async def preview_file(
     project_id: str,
     file_id: str,
+    progressive: bool = False,
+    background: bool = False,
+    format: str = 'rows',
+    columns: Optional[str] = None,
+    top_values: bool = True,
+    max_chars: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     minio_client: MinIOClient = Depends(get_minio_client),
     profiler: DataProfiler = Depends(get_data_profiler)
 ):
-    """获取文件预览和数据探查"""
+    """获取文件预览和数据探查
+
+    progressive=true 时在时间预算内返回抽样探查结果，完整探查转入后台，
+    可通过 /projects/{project_id}/files/{file_id}/profile 获取。
+    background=true 时缓存未命中即提交探查任务，返回任务信息，结果通过 /jobs/{job_id}/result 获取。
+    format=columnar 时样本行以列数组返回，并给出按页读取的 rows_url；columns、top_values、max_chars
+    用于只返回前端需要展示的内容。
+    完整探查结果带有由文件内容哈希和参数生成的ETag，内容未变化时返回304。
+    """
+    if format not in ('rows', 'columnar'):
+        raise HTTPException(status_code=400, detail="预览只支持 rows 和 columnar 格式")
+    rows_url = f"{router.prefix}/projects/{project_id}/files/{file_id}/head?format=columnar"
+    
+    def preview_etag(content_hash: str) -> str:
+        return make_etag('file-preview', content_hash, progressive, format, columns, top_values, max_chars)
+    
+    def respond(raw_profile: dict, content_hash: Optional[str] = None, **extra) -> Response:
+        profile = format_preview_profile(raw_profile, format=format, columns=parse_columns(columns),
+                                         top_values=top_values, max_chars=max_chars)
+        if format == 'columnar':
+            profile['preview']['rows_url'] = rows_url
+        profile.update(extra)
+        response = json_response(profile)
+        if content_hash:
+            # 只有完整探查结果带ETag，抽样结果会被后台结果替换
+            response.headers.update({'ETag': preview_etag(content_hash), 'Cache-Control': REVALIDATE})
+        return response
+    
     try:
         # 构建文件路径
         bucket_name = f"project-{project_id}"
+        task_id = f"{project_id}/{file_id}"
+        profile_url = f"{router.prefix}/projects/{project_id}/files/{file_id}/profile"
         
-        # 获取文件列表找到对应的文件
-        files = minio_client.list_files(bucket_name, prefix="data/")
-        file_info = None
+        # 已上传文件内容不变，缓存命中时直接返回完整探查结果，不访问MinIO
+        cache_ref = f"{bucket_name}/{file_id}"
+        content_hash = profile_cache.resolve(cache_ref)
+        if content_hash:
+            etag = preview_etag(content_hash)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers={'ETag': etag, 'Cache-Control': REVALIDATE})
+            raw_profile = await io_pool.run(profile_cache.get,
+                                            ProfileCache.make_key(content_hash, {'approximate': False}))
+            if raw_profile is not None:
+                if progressive:
+                    return respond(raw_profile, content_hash,
+                                   full_profile={'task_id': task_id, 'status': 'completed', 'url': profile_url})
+                return respond(raw_profile, content_hash)
         
-        for file in files:
-            if file["object_name"].startswith(f"data/{file_id}_"):
-                file_info = file
-                break
-        
-        if not file_info:
-            raise HTTPException(status_code=404, detail="文件未找到")
+        if background:
+            job = await io_pool.run(job_manager.submit, 'profile', {'project_id': project_id, 'file_id': file_id})
+            job['url'] = f"{router.prefix}/jobs/{job['job_id']}"
+            return {'job': job}
         
-        # 下载文件到临时位置进行探查
-        original_filename = file_info["object_name"].split("/")[-1]  # 获取原始文件名
-        file_extension = os.path.splitext(original_filename)[1]  # 获取文件扩展名
-        file_path = f"/tmp/{file_id}_preview{file_extension}"  # 添加扩展名
-        minio_client.download_file(bucket_name, file_info["object_name"], file_path)
-        
-        # 获取数据探查结果
-        raw_profile = profiler.profile_data(file_path)
+        def fetch_file():
+            # 从文件目录按file_id查找数据对象，下载到临时位置并查缓存（阻塞I/O）
+            record = FileCatalog(db).get(project_id, file_id)
+            if not record:
+                raise HTTPException(status_code=404, detail="文件未找到")
+            
+            file_extension = os.path.splitext(record.object_key)[1]  # 获取文件扩展名
+            # 每个请求使用独立的临时文件，后台探查任务读取的文件不会被其他请求覆盖或删除
+            fd, file_path = tempfile.mkstemp(prefix=f"{file_id}_preview", suffix=file_extension)
+            os.close(fd)
+            minio_client.download_file(bucket_name, record.object_key, file_path)
+            
+            # 相同内容可能以其他文件名上传过
+            content_hash = file_content_hash(file_path)
+            profile_cache.bind(cache_ref, content_hash)
+            cache_key = ProfileCache.make_key(content_hash, {'approximate': False})
+            # 上传时生成的接入清单，旧文件没有清单时由探查器现场检测
+            return file_path, record.manifest, content_hash, cache_key, profile_cache.get(cache_key)
         
-        # 转换数据格式以匹配前端DataProfile接口
-        profile = {
-            'shape': {
-                'rows': raw_profile['basic_info']['total_rows'],
-                'columns': raw_profile['basic_info']['total_columns']
-            },
-            'memory_usage': str(raw_profile['basic_info']['memory_usage']),
-            'columns': {},
-            'quality': {
-                'score': raw_profile['quality_report']['overall_score'],
-                'issues': [issue['description'] for issue in raw_profile['quality_report']['issues']]
-            },
-            'preview': {
-                'headers': raw_profile['basic_info']['column_names'],
-                'rows': raw_profile['sample_data']['head']
-            }
-        }
+        file_path, manifest, content_hash, cache_key, raw_profile = await io_pool.run(fetch_file)
         
-        # 转换列信息
-        for col_name, col_data in raw_profile['columns'].items():
-            column_stats = {
-                'type': col_data['dtype'],
-                'non_null_count': col_data['unique_count'] + col_data['null_count'],  # 近似计算
-                'null_count': col_data['null_count'],
-                'unique_count': col_data['unique_count'],
-                'duplicate_rate': 0  # 默认值
-            }
+        if raw_profile is None and progressive:
+            # 先返回抽样结果，完整探查在后台进行，结束后写入缓存并删除临时文件
+            def run_full_profile():
+                full_profile = profiler.profile_data(file_path, manifest=manifest)
+                profile_cache.put(cache_key, full_profile)
+                return full_profile
             
-            # 添加数值统计
-            if col_data.get('is_numeric') and col_data.get('min') is not None:
-                column_stats['numeric_stats'] = {
-                    'min': col_data['min'],
-                    'max': col_data['max'],
-                    'mean': col_data['mean'],
-                    'std': col_data['std']
-                }
+            raw_profile = await cpu_pool.run(profiler.profile_sample, file_path, manifest=manifest)
             
-            # 添加分类值统计
-            if col_data.get('top_values'):
-                column_stats['top_values'] = []
-                for item in col_data['top_values']:
-                    if isinstance(item, dict) and 'value' in item and 'count' in item:
-                        column_stats['top_values'].append([item['value'], item['count']])
-            
-            profile['columns'][col_name] = column_stats
+            if raw_profile['sampling']['exact']:
+                await io_pool.run(profile_cache.put, cache_key, raw_profile)
+                profile_task_manager.complete(task_id, raw_profile)
+                os.remove(file_path)
+                full_profile = {'task_id': task_id, 'status': 'completed'}
+            else:
+                full_profile, accepted = profile_task_manager.submit(
+                    task_id, run_full_profile, cleanup_path=file_path
+                )
+                if not accepted:
+                    # 同一文件的完整探查已在进行，本请求的临时文件不再需要
+                    os.remove(file_path)
+            full_profile['url'] = profile_url
+            return respond(raw_profile, sampling=raw_profile['sampling'], full_profile=full_profile)
+        
+        # 获取数据探查结果
+        if raw_profile is None:
+            raw_profile = await cpu_pool.run(profiler.profile_data, file_path, manifest=manifest)
+            await io_pool.run(profile_cache.put, cache_key, raw_profile)
         
         # 清理临时文件
         if os.path.exists(file_path):
             os.remove(file_path)
         
-        return profile
+        if progressive:
+            return respond(raw_profile, content_hash,
+                           full_profile={'task_id': task_id, 'status': 'completed', 'url': profile_url})
+        return respond(raw_profile, content_hash)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# 获取后台完整探查结果
+@router.get("/projects/{project_id}/files/{file_id}/profile")
+async def get_full_profile(project_id: str, file_id: str):
+    """获取渐进式预览提交的完整探查结果"""
+    task = profile_task_manager.get(f"{project_id}/{file_id}")
+    if task is None:
+        # 任务记录可能已被淘汰，从缓存中取
+        content_hash = profile_cache.resolve(f"project-{project_id}/{file_id}")
+        raw_profile = profile_cache.get(ProfileCache.make_key(content_hash, {'approximate': False})) if content_hash else None
+        if raw_profile is None:
+            raise HTTPException(status_code=404, detail="探查任务不存在")
+        return {'task_id': f"{project_id}/{file_id}", 'status': 'completed', 'profile': format_preview_profile(raw_profile)}
+    
+    if task['status'] == 'completed':
+        task['profile'] = format_preview_profile(task.pop('result'))
+    return task
+
 # 删除文件
 @router.delete("/projects/{project_id}/files/{file_id}")
-async def delete_project_file(
+@offload(io_pool)
+def delete_project_file(
     project_id: str,
     file_id: str,
     db: Session = Depends(get_db),
@@ -303,20 +584,20 @@ async def delete_project_file(
     try:
         bucket_name = f"project-{project_id}"
         
-        # 查找要删除的文件
-        files = minio_client.list_files(bucket_name, prefix="data/")
-        file_to_delete = None
-        
-        for file in files:
-            if file["object_name"].startswith(f"data/{file_id}_"):
-                file_to_delete = file["object_name"]
-                break
-        
-        if not file_to_delete:
+        # 从文件目录查找要删除的文件
+        catalog = FileCatalog(db)
+        record = catalog.get(project_id, file_id)
+        if not record:
             raise HTTPException(status_code=404, detail="文件未找到")
         
-        # 删除文件
-        minio_client.delete_file(bucket_name, file_to_delete)
+        # 删除文件，以及接入时保留的原始文件
+        manifest = record.manifest
+        minio_client.delete_file(bucket_name, record.object_key)
+        if manifest and manifest.get('original_object'):
+            minio_client.delete_file(bucket_name, manifest['original_object'])
+        minio_client.delete_file(bucket_name, meta_object_key(record.object_key))
+        catalog.remove(project_id, file_id)
+        profile_cache.forget(f"{bucket_name}/{file_id}")
         
         return {"message": "文件删除成功"}
     except Exception as e:
@@ -326,15 +607,45 @@ async def delete_project_file(
 @router.post("/data/profile")
 async def profile_data(
     file_path: str,
+    approximate: bool = False,
+    duplicate_groups: int = 0,
     profiler: DataProfiler = Depends(get_data_profiler)
 ):
-    """探查数据文件"""
+    """探查数据文件
+
+    探查在CPU池中执行（EXECUTOR_CPU_POOL_KIND=process 时在子进程中），缓存在本进程中读写。
+    """
     try:
-        profile = profiler.profile_data(file_path)
+        options = {'approximate': approximate}
+        if duplicate_groups:
+            options['duplicate_groups'] = duplicate_groups
+        cache_key = ProfileCache.make_key(await io_pool.run(file_content_hash, file_path), options)
+        profile = await io_pool.run(profile_cache.get, cache_key)
+        if profile is None:
+            profile = await cpu_pool.run(profiler.profile_data, file_path, approximate=approximate,
+                                         duplicate_groups=duplicate_groups)
+            await io_pool.run(profile_cache.put, cache_key, profile)
         return profile
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/data/profile/cache")
+async def get_profile_cache_stats():
+    """探查缓存命中统计"""
+    return profile_cache.stats()
+
+# 执行池指标
+@router.get("/metrics/pools")
+async def get_pool_metrics():
+    """各执行池的饱和度（执行中、排队、等待、排队耗时）、沙箱执行后端以及事件循环调度延迟"""
+    loaded = services.loaded()
+    return {
+        "pools": pool_stats(),
+        "services": loaded,
+        "sandbox": services.sandbox.stats() if loaded['sandbox'] else None,
+        "event_loop_lag_ms": await event_loop_lag()
+    }
+
 # 会话管理端点
 @router.post("/sessions", response_model=dict)
 async def create_session(
@@ -344,7 +655,7 @@ async def create_session(
     session_manager: SessionManager = Depends(get_session_manager)
 ):
     """创建新会话"""
-    session_id = session_manager.create_session(project_id, title, initial_message)
+    session_id = await io_pool.run(session_manager.create_session, project_id, title, initial_message)
     
     # 如果有初始消息，立即处理
     if initial_message:
@@ -373,7 +684,8 @@ async def create_session(
     }
 
 @router.get("/sessions", response_model=List[dict])
-async def get_sessions(
+@offload(io_pool)
+def get_sessions(
     project_id: str,
     db: Session = Depends(get_db)
 ):
@@ -392,7 +704,8 @@ async def get_sessions(
     ]
 
 @router.get("/sessions/{session_id}", response_model=dict)
-async def get_session(
+@offload(io_pool)
+def get_session(
     session_id: str,
     db: Session = Depends(get_db)
 ):
@@ -411,7 +724,8 @@ async def get_session(
     }
 
 @router.get("/sessions/{session_id}/history", response_model=List[dict])
-async def get_session_history(
+@offload(io_pool)
+def get_session_history(
     session_id: str,
     session_manager: SessionManager = Depends(get_session_manager)
 ):
@@ -424,11 +738,22 @@ async def chat(
     request: ChatRequest,
     session_manager: SessionManager = Depends(get_session_manager)
 ):
-    """处理聊天消息"""
+    """处理聊天消息
+
+    background=true 时作为后台任务执行，返回任务ID，通过 /jobs/{job_id} 查询进度和结果。
+    pipeline=true 时本轮的转换追加到当前版本的查询计划中，只计算预览，版本在读取时才物化。
+    """
+    if request.background:
+        job = await io_pool.run(job_manager.submit, 'chat',
+                                {'session_id': request.session_id, 'message': request.message,
+                                 'pipeline': request.pipeline})
+        return ChatResponse(status='accepted', message='已提交后台任务', job_id=job['job_id'])
+    
     try:
         result = await session_manager.process_user_input(
             session_id=request.session_id,
-            user_input=request.message
+            user_input=request.message,
+            pipeline=request.pipeline
         )
         
         if result['status'] == 'success':
@@ -450,19 +775,26 @@ async def chat(
 
 # 版本管理端点
 @router.get("/versions/{project_id}", response_model=List[dict])
-async def get_versions(
+@offload(io_pool)
+def get_versions(
     project_id: str,
+    if_none_match: Optional[str] = Header(None),
     version_manager: VersionManager = Depends(get_version_manager)
 ):
-    """获取项目版本历史"""
+    """获取项目版本历史
+
+    ETag由版本ID和物化状态生成，历史没有新增、删除版本且没有逻辑版本物化时返回304。
+    """
     try:
-        versions = version_manager.get_version_history(project_id)
-        return versions
+        etag = make_etag('history', project_id, *version_manager.history_state(project_id))
+        return cached(if_none_match, etag, REVALIDATE,
+                      lambda: json_response(version_manager.get_version_history(project_id)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/versions/rollback")
-async def rollback_version(
+@offload(io_pool)
+def rollback_version(
     request: VersionRollbackRequest,
     session_manager: SessionManager = Depends(get_session_manager)
 ):
@@ -477,19 +809,267 @@ async def rollback_version(
     
     return result
 
+@router.get("/versions/{version_id}/preview")
+@offload(io_pool)
+def get_version_preview(
+    version_id: str,
+    rows: int = 5,
+    offset: int = 0,
+    columns: Optional[str] = None,
+    format: str = 'rows',
+    max_chars: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    version_manager: VersionManager = Depends(get_version_manager)
+):
+    """按范围读取版本快照的schema、行数和一段行，不下载整个快照
+
+    format 和 max_chars 与 /projects/{project_id}/files/{file_id}/head 相同。
+    版本不可变，响应可长期缓存；ETag匹配时返回304，不读取快照。
+    """
+    format = resolve_format(format, accept)
+    etag = make_etag('preview', version_id, rows, offset, columns, format, max_chars)
+    return cached(if_none_match, etag, IMMUTABLE, lambda: build_version_preview(
+        version_manager, version_id, rows, offset, columns, format, max_chars
+    ), vary='Accept', exists=lambda: version_manager.get_version(version_id) is not None)
+
+def build_version_preview(version_manager: VersionManager, version_id: str, rows: int, offset: int,
+                          columns: Optional[str], format: str, max_chars: Optional[int]) -> Response:
+    """读取版本快照的一段行并按格式生成响应"""
+    try:
+        info = version_manager.get_version_schema(version_id)
+        if info is None:
+            raise HTTPException(status_code=404, detail="版本不存在")
+        df = version_manager.read_version(version_id, columns=parse_columns(columns),
+                                          offset=offset, limit=clamp_rows(rows))
+    except HTTPException:
+        raise
+    except pl.exceptions.ColumnNotFoundError as e:
+        raise HTTPException(status_code=400, detail=f"列不存在: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    metadata = {"version_id": version_id, "total_rows": info['rows'], "offset": offset}
+    if format == 'rows':
+        metadata["schema"] = info['schema']
+    return table_response(df, format, metadata,
+                          max_chars=max_chars, default_max_chars=settings.PREVIEW_MAX_CHARS)
+
+@router.get("/versions/{version_id}/rows")
+@offload(io_pool)
+def get_version_rows(
+    version_id: str,
+    offset: int = 0,
+    limit: int = 100,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    format: str = 'rows',
+    max_chars: Optional[int] = None,
+    accept: Optional[str] = Header(None),
+    if_none_match: Optional[str] = Header(None),
+    version_manager: VersionManager = Depends(get_version_manager)
+):
+    """分页浏览版本快照的任意一段行
+
+    只读取覆盖该页的行组；sort 为逗号分隔的列名，前缀 - 表示降序（如 sort=city,-amount），
+    首次按某种排序访问时生成排序视图并缓存，之后的分页直接读取视图。
+    format 和 max_chars 与 /projects/{project_id}/files/{file_id}/head 相同。
+    版本不可变，每一页都可长期缓存；ETag匹配时返回304。
+    """
+    format = resolve_format(format, accept)
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset不能为负数")
+    limit = clamp_rows(limit)
+    etag = make_etag('rows', version_id, offset, limit, columns, sort, format, max_chars)
+    return cached(if_none_match, etag, IMMUTABLE, lambda: build_version_rows(
+        version_manager, version_id, offset, limit, columns, sort, format, max_chars
+    ), vary='Accept', exists=lambda: version_manager.get_version(version_id) is not None)
+
+def build_version_rows(version_manager: VersionManager, version_id: str, offset: int, limit: int,
+                       columns: Optional[str], sort: Optional[str], format: str,
+                       max_chars: Optional[int]) -> Response:
+    """读取版本快照（或排序视图）的一页并按格式生成响应"""
+    sort_by = parse_sort(sort)
+    try:
+        page = version_manager.read_rows(version_id, offset=offset, limit=limit,
+                                         columns=parse_columns(columns), sort_by=sort_by)
+    except (pl.exceptions.ColumnNotFoundError, pl.exceptions.SchemaFieldNotFoundError) as e:
+        raise HTTPException(status_code=400, detail=f"列不存在: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail="版本不存在")
+    
+    df = page['data']
+    next_offset = offset + len(df)
+    metadata = {
+        "version_id": version_id,
+        "total_rows": page['total_rows'],
+        "offset": offset,
+        "limit": limit,
+        "sort": sort,
+        "next_offset": next_offset if next_offset < page['total_rows'] else None,
+        "row_groups": page['row_groups']
+    }
+    if format == 'arrow':
+        metadata = {key: value for key, value in metadata.items() if key != 'row_groups'}
+    return table_response(df, format, metadata,
+                          max_chars=max_chars, default_max_chars=settings.PREVIEW_MAX_CHARS)
+
 @router.get("/versions/{version1_id}/{version2_id}/diff")
-async def get_version_diff(
+@offload(io_pool)
+def get_version_diff(
     version1_id: str,
     version2_id: str,
+    if_none_match: Optional[str] = Header(None),
     version_manager: VersionManager = Depends(get_version_manager)
 ):
-    """获取版本差异"""
-    try:
+    """获取版本差异
+
+    两个版本都不可变，差异可长期缓存；ETag匹配时返回304，不重新比较。
+    """
+    def build() -> Response:
         diff = version_manager.compare_versions(version1_id, version2_id)
-        return diff
+        if 'error' in diff:
+            # 版本不存在时不缓存
+            return json_response(diff, status_code=404)
+        return json_response(diff)
+    
+    try:
+        return cached(if_none_match, make_etag('diff', version1_id, version2_id), IMMUTABLE, build,
+                      exists=lambda: all(version_manager.get_version(version_id) is not None
+                                         for version_id in (version1_id, version2_id)))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/versions/{version_id}/download")
+@offload(io_pool)
+def download_version(
+    version_id: str,
+    if_none_match: Optional[str] = Header(None),
+    version_manager: VersionManager = Depends(get_version_manager)
+):
+    """下载版本快照（Parquet），从对象存储流式转发；快照不可变，ETag匹配时返回304"""
+    version = version_manager.get_version(version_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="版本不存在")
+    
+    def build() -> Response:
+        # 流水线模式的逻辑版本在首次下载时物化
+        snapshot_path = version_manager.snapshot_path(version)
+        size = version_manager.minio.stat_size(version_manager.bucket_name, snapshot_path)
+        if size is None:
+            raise HTTPException(status_code=404, detail="版本快照不存在")
+        stream = version_manager.minio.open_object(version_manager.bucket_name, snapshot_path)
+        
+        def chunks():
+            try:
+                yield from stream.stream(settings.UPLOAD_CHUNK_BYTES)
+            finally:
+                stream.close()
+                stream.release_conn()
+        
+        return StreamingResponse(chunks(), media_type="application/vnd.apache.parquet", headers={
+            'Content-Length': str(size),
+            'Content-Disposition': f'attachment; filename="{version_id}.parquet"'
+        })
+    
+    return cached(if_none_match, make_etag('download', version_id, version.data_snapshot_path), IMMUTABLE, build)
+
+# 后台任务端点
+@router.post("/jobs", status_code=202)
+@offload(io_pool)
+def submit_job(request: JobSubmitRequest):
+    """提交后台任务（profile: project_id, file_id; chat: session_id, message）"""
+    try:
+        return job_manager.submit(request.kind, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/jobs", response_model=List[dict])
+@offload(io_pool)
+def list_jobs(kind: Optional[str] = None, status: Optional[str] = None, limit: int = 50):
+    """最近的后台任务"""
+    return job_manager.list(kind=kind, status=status, limit=limit)
+
+@router.get("/jobs/{job_id}")
+@offload(io_pool)
+def get_job(job_id: str):
+    """任务状态和进度"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.get("/jobs/{job_id}/result")
+@offload(io_pool)
+def get_job_result(job_id: str):
+    """任务结果，任务未成功结束时返回409"""
+    job = job_manager.result(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job['status'] != 'succeeded':
+        raise HTTPException(status_code=409, detail=f"任务状态为 {job['status']}")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+@offload(io_pool)
+def cancel_job(job_id: str):
+    """取消任务"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.post("/jobs/{job_id}/retry", status_code=202)
+@offload(io_pool)
+def retry_job(job_id: str):
+    """以相同参数重新提交已结束的任务"""
+    try:
+        job = job_manager.retry(job_id)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, last_event_id: Optional[str] = Header(None)):
+    """以SSE推送任务的状态和进度事件，任务结束后关闭连接"""
+    job = await io_pool.run(job_manager.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    
+    def format_event(event_id: int, event_type: str, data: dict) -> str:
+        return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    
+    async def event_stream():
+        if not job_manager.has_events(job_id):
+            # 其他进程或重启前的任务，只推送当前状态
+            yield format_event(0, 'status', job)
+            if job['status'] in TERMINAL_STATUSES:
+                return
+        after = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+        idle = 0.0
+        while True:
+            events = job_manager.events_since(job_id, after)
+            for event in events:
+                after = event['id']
+                yield format_event(event['id'], event['type'], {**event['data'], 'time': event['time']})
+                if event['type'] == 'status' and event['data']['status'] in TERMINAL_STATUSES:
+                    return
+            if events:
+                idle = 0.0
+            elif idle >= 15:
+                # 保持连接，避免代理超时断开
+                yield ": keep-alive\n\n"
+                idle = 0.0
+            await asyncio.sleep(settings.JOB_EVENT_POLL_INTERVAL)
+            idle += settings.JOB_EVENT_POLL_INTERVAL
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # 健康检查端点
 @router.get("/health")
 async def health_check():
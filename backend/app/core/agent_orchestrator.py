@@ -18,10 +18,18 @@ class AgentOrchestrator:
     """智能体编排器，负责意图理解和代码生成"""
     
     def __init__(self, api_key: str):
-        openai.api_key = api_key
+        self.api_key = api_key
+        self._client: Optional[openai.AsyncOpenAI] = None
         self.model = "gpt-4o-mini"  # 可根据需要切换模型
+    
+    @property
+    def client(self) -> openai.AsyncOpenAI:
+        """异步客户端，等待模型响应时不阻塞事件循环；首次调用时创建（未配置密钥时创建会失败）"""
+        if self._client is None:
+            self._client = openai.AsyncOpenAI(api_key=self.api_key)
+        return self._client
         
-    def extract_intent(self, instruction: str, data_info: Dict[str, Any]) -> IntentParameter:
+    async def extract_intent(self, instruction: str, data_info: Dict[str, Any]) -> IntentParameter:
         """从自然语言指令中提取结构化意图参数"""
         
         prompt = f"""
@@ -50,7 +58,7 @@ class AgentOrchestrator:
 """
         
         try:
-            response = openai.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.1,
@@ -15,15 +15,103 @@ class Settings(BaseSettings):
     MINIO_SECRET_KEY: str = os.getenv("MINIO_SECRET_KEY", "minioadmin")
     MINIO_SECURE: bool = os.getenv("MINIO_SECURE", "false").lower() == "true"
     MINIO_BUCKET_PREFIX: str = "dp-agent"
+    MINIO_POOL_SIZE: int = int(os.getenv("MINIO_POOL_SIZE", os.getenv("EXECUTOR_IO_WORKERS", "32")))
     
     # OpenAI配置
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     
     # Docker配置
-    DOCKER_IMAGE: str = "python:3.9-slim"
-    SANDBOX_MEMORY_LIMIT: str = "2g"
-    SANDBOX_CPU_LIMIT: float = 1.0
+    # 沙箱运行时镜像（backend/sandbox/Dockerfile 构建），预装polars/pyarrow
+    DOCKER_IMAGE: str = os.getenv("DOCKER_IMAGE", "dp-agent-sandbox:latest")
+    SANDBOX_MEMORY_LIMIT: str = os.getenv("SANDBOX_MEMORY_LIMIT", "2g")
+    SANDBOX_CPU_LIMIT: float = float(os.getenv("SANDBOX_CPU_LIMIT", "1.0"))
+    # 沙箱容器启动（运行器导入依赖并开始监听）的超时秒数
+    SANDBOX_STARTUP_TIMEOUT: float = float(os.getenv("SANDBOX_STARTUP_TIMEOUT", "60"))
+    
+    # 沙箱后端：docker（预热容器池）、local（本地forkserver子进程，不需要Docker）、auto（Docker不可用时使用local）
+    SANDBOX_BACKEND: str = os.getenv("SANDBOX_BACKEND", "docker")
+    # 本地进程沙箱单个输出文件的大小上限（MB）
+    SANDBOX_MAX_OUTPUT_MB: int = int(os.getenv("SANDBOX_MAX_OUTPUT_MB", "1024"))
+    # 后端以root运行时，本地进程沙箱的子进程切换到的用户ID起始值（每个执行槽位一个用户，组ID相同）
+    SANDBOX_LOCAL_UID: int = int(os.getenv("SANDBOX_LOCAL_UID", "62000"))
+    # 沙箱容器内运行器的用户ID（与 sandbox/Dockerfile 中的 sandbox 用户一致）
+    SANDBOX_CONTAINER_UID: int = int(os.getenv("SANDBOX_CONTAINER_UID", "10001"))
+    
+    # 沙箱容器池配置（容器总数上限、空闲容器数范围、每个容器执行的任务数上限、单个任务超时秒数）
+    SANDBOX_POOL_SIZE: int = int(os.getenv("SANDBOX_POOL_SIZE", "4"))
+    SANDBOX_POOL_MIN_WARM: int = int(os.getenv("SANDBOX_POOL_MIN_WARM", "1"))
+    SANDBOX_POOL_MAX_WARM: int = int(os.getenv("SANDBOX_POOL_MAX_WARM", "2"))
+    SANDBOX_WORKER_MAX_JOBS: int = int(os.getenv("SANDBOX_WORKER_MAX_JOBS", "20"))
+    SANDBOX_TIMEOUT: float = float(os.getenv("SANDBOX_TIMEOUT", "30"))
+    # 与沙箱交换文件的目录（挂载到容器内，后端和Docker守护进程需在同一主机上），默认在tmpfs上
+    SANDBOX_SHARED_DIR: str = os.getenv("SANDBOX_SHARED_DIR",
+                                        "/dev/shm/dp-sandbox" if os.path.isdir("/dev/shm") else "/tmp/dp-sandbox")
+    # 交换目录中各版本Arrow文件的总大小上限（MB）；执行结果清单中预览的行数
+    SANDBOX_EXCHANGE_CACHE_MB: int = int(os.getenv("SANDBOX_EXCHANGE_CACHE_MB", "2048"))
+    SANDBOX_PREVIEW_ROWS: int = int(os.getenv("SANDBOX_PREVIEW_ROWS", "20"))
+
+    # 流水线模式：对话中连续的转换组合为一个惰性查询计划，每轮只计算预览，版本在读取时才物化；
+    # 一个计划中的最大步骤数，超过时先物化当前版本再开始新的计划
+    PIPELINE_MODE: bool = os.getenv("PIPELINE_MODE", "false").lower() == "true"
+    PIPELINE_MAX_STEPS: int = int(os.getenv("PIPELINE_MAX_STEPS", "20"))
+
+    # 数据探查配置
+    PROFILE_STREAMING_THRESHOLD_MB: int = int(os.getenv("PROFILE_STREAMING_THRESHOLD_MB", "512"))
+    PROFILE_BATCH_SIZE: int = int(os.getenv("PROFILE_BATCH_SIZE", "100000"))
+    PROFILE_HLL_PRECISION: int = int(os.getenv("PROFILE_HLL_PRECISION", "12"))
+    PROFILE_KLL_K: int = int(os.getenv("PROFILE_KLL_K", "200"))
+    # 流式探查中每列精确去重的值数上限，以及所有列合计的上限，超过后去重数改为HyperLogLog估计
+    PROFILE_EXACT_DISTINCT_MAX: int = int(os.getenv("PROFILE_EXACT_DISTINCT_MAX", "10000"))
+    PROFILE_EXACT_DISTINCT_BUDGET: int = int(os.getenv("PROFILE_EXACT_DISTINCT_BUDGET", "1000000"))
+    # 流式探查统计重复行时保存的行哈希数上限，超过后重复行数改为HyperLogLog估计
+    PROFILE_DUPLICATE_MAX_HASHES: int = int(os.getenv("PROFILE_DUPLICATE_MAX_HASHES", "2000000"))
+    PROFILE_SAMPLE_SIZE: int = int(os.getenv("PROFILE_SAMPLE_SIZE", "50000"))
+    PROFILE_SAMPLE_TIME_BUDGET: float = float(os.getenv("PROFILE_SAMPLE_TIME_BUDGET", "1.5"))
+    PROFILE_BACKGROUND_WORKERS: int = int(os.getenv("PROFILE_BACKGROUND_WORKERS", "2"))
+    # 探查缓存目录，默认在 backend/data 下（不随工作目录变化）
+    PROFILE_CACHE_DIR: str = os.getenv(
+        "PROFILE_CACHE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                     "data", "profile_cache")
+    )
+    PROFILE_CACHE_MEMORY_ENTRIES: int = int(os.getenv("PROFILE_CACHE_MEMORY_ENTRIES", "128"))
+    PROFILE_CACHE_DISK_MB: int = int(os.getenv("PROFILE_CACHE_DISK_MB", "512"))
+    # 探查缓存保存的对象引用（文件、版本到内容哈希的映射）数量上限
+    PROFILE_CACHE_MAX_REFS: int = int(os.getenv("PROFILE_CACHE_MAX_REFS", "100000"))
+    PROFILE_COLUMN_SHARD_SIZE: int = int(os.getenv("PROFILE_COLUMN_SHARD_SIZE", "16"))
+    PROFILE_WORKERS: int = int(os.getenv("PROFILE_WORKERS", str(os.cpu_count() or 4)))
+    
+    # 上传配置
+    UPLOAD_CHUNK_BYTES: int = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+    UPLOAD_PART_SIZE_MB: int = int(os.getenv("UPLOAD_PART_SIZE_MB", "16"))
+    UPLOAD_QUEUE_CHUNKS: int = int(os.getenv("UPLOAD_QUEUE_CHUNKS", "16"))
+    INGEST_ROW_GROUP_SIZE: int = int(os.getenv("INGEST_ROW_GROUP_SIZE", "131072"))
+    INGEST_ZSTD_LEVEL: int = int(os.getenv("INGEST_ZSTD_LEVEL", "3"))
+    INGEST_KEEP_ORIGINAL: bool = os.getenv("INGEST_KEEP_ORIGINAL", "true").lower() == "true"
+    
+    # 预览配置（单次最多返回的行数；列式预览中字符串单元格的默认截断长度）
+    PREVIEW_MAX_ROWS: int = int(os.getenv("PREVIEW_MAX_ROWS", "10000"))
+    PREVIEW_MAX_CHARS: int = int(os.getenv("PREVIEW_MAX_CHARS", "200"))
+    
+    # HTTP缓存配置（不可变资源：版本快照、差异、版本预览）
+    HTTP_CACHE_IMMUTABLE: str = os.getenv("HTTP_CACHE_IMMUTABLE", "public, max-age=31536000, immutable")
+    
+    # 文件目录配置（与存储桶的校正间隔，秒；0表示不做定期校正）
+    CATALOG_RECONCILE_INTERVAL: float = float(os.getenv("CATALOG_RECONCILE_INTERVAL", "600"))
+    
+    # 执行池配置（阻塞I/O和CPU密集调用不在事件循环上执行）
+    EXECUTOR_IO_WORKERS: int = int(os.getenv("EXECUTOR_IO_WORKERS", "32"))
+    EXECUTOR_CPU_WORKERS: int = int(os.getenv("EXECUTOR_CPU_WORKERS", str(os.cpu_count() or 4)))
+    EXECUTOR_CPU_POOL_KIND: str = os.getenv("EXECUTOR_CPU_POOL_KIND", "thread")
+    EXECUTOR_MAX_PENDING: int = int(os.getenv("EXECUTOR_MAX_PENDING", "256"))
+    
+    # 后台任务配置
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_EVENT_POLL_INTERVAL: float = float(os.getenv("JOB_EVENT_POLL_INTERVAL", "0.5"))
+    JOB_MAX_EVENTS: int = int(os.getenv("JOB_MAX_EVENTS", "200"))
+    # 服务关闭时等待执行中的任务在检查点停止的秒数
+    JOB_STOP_TIMEOUT: float = float(os.getenv("JOB_STOP_TIMEOUT", "10"))
     
     # 应用配置
     HOST: str = os.getenv("HOST", "0.0.0.0")
@@ -36,6 +124,8 @@ class Settings(BaseSettings):
     # 版本控制配置
     VERSION_RETENTION_DAYS: int = int(os.getenv("VERSION_RETENTION_DAYS", "30"))
     MAX_VERSIONS_PER_PROJECT: int = int(os.getenv("MAX_VERSIONS_PER_PROJECT", "100"))
+    # 排序视图的行组大小，越小分页时读取的多余行越少
+    VERSION_VIEW_ROW_GROUP_SIZE: int = int(os.getenv("VERSION_VIEW_ROW_GROUP_SIZE", "16384"))
     
     class Config:
         env_file = ".env"
@@ -0,0 +1,172 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+import time
+import weakref
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+import logging
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+def _timed_call(fn: Callable, args: tuple, kwargs: dict) -> Tuple[float, Any]:
+    """在工作线程/进程中执行，返回开始时间和结果（模块级函数，进程池可序列化）"""
+    started = time.time()
+    return started, fn(*args, **kwargs)
+
+class BoundedPool:
+    """有界的执行池：阻塞I/O或CPU密集的同步调用在这里执行，不占用事件循环
+
+    同时提交（执行中+排队）的任务数不超过 max_pending，超出时调用方在事件循环上等待，
+    不会无限堆积。记录执行中、排队、等待、完成、失败数以及排队耗时，用于观察饱和度
+    （多个线程的事件循环共用一个池，计数在锁内更新）。
+    kind="process" 时使用进程池，提交的函数和参数必须可序列化（模块级函数、普通对象）。
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, kind: str = 'thread'):
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max(max_pending, max_workers)
+        self._executor: Optional[Executor] = None
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = \
+            weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.waiting = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.run_seconds = 0.0
+
+    @property
+    def executor(self) -> Executor:
+        """首次使用时创建执行器"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.kind == 'process':
+                        # polars 自带线程池，fork 后可能死锁，进程池使用 spawn
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.max_workers,
+                            mp_context=multiprocessing.get_context('spawn')
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                            thread_name_prefix=f"{self.name}-pool")
+        return self._executor
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # 每个事件循环一个信号量（测试客户端、服务进程和后台任务线程的事件循环不同），
+        # 以事件循环对象为弱引用键，循环被回收后条目随之删除，不会被新循环误用
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_pending)
+        return semaphore
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """在池中执行 fn(*args, **kwargs) 并等待结果"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphore()
+        with self._stats_lock:
+            self.submitted += 1
+            self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            with self._stats_lock:
+                self.waiting -= 1
+        with self._stats_lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        submitted_at = time.time()
+        try:
+            started, result = await loop.run_in_executor(self.executor, _timed_call, fn, args, kwargs)
+            finished = time.time()
+            queued = max(started - submitted_at, 0.0)
+            with self._stats_lock:
+                self.completed += 1
+                self.queue_seconds += queued
+                self.max_queue_seconds = max(self.max_queue_seconds, queued)
+                self.run_seconds += finished - started
+            return result
+        except BaseException:
+            with self._stats_lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """池的使用和饱和度指标"""
+        with self._stats_lock:
+            return self._stats()
+
+    def _stats(self) -> Dict[str, Any]:
+        running = min(self.in_flight, self.max_workers)
+        return {
+            'kind': self.kind,
+            'max_workers': self.max_workers,
+            'max_pending': self.max_pending,
+            'running': running,
+            'queued': self.in_flight - running,
+            'waiting': self.waiting,
+            'peak_in_flight': self.peak_in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'saturation': round(self.in_flight / self.max_workers, 3),
+            'avg_queue_ms': round(self.queue_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            'max_queue_ms': round(self.max_queue_seconds * 1000, 2),
+            'avg_run_ms': round(self.run_seconds / self.completed * 1000, 2) if self.completed else 0.0
+        }
+
+    def shutdown(self) -> None:
+        """关闭执行器"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+def offload(pool: BoundedPool) -> Callable:
+    """把同步的路由函数包装为在池中执行的异步函数，保留原签名供依赖注入解析
+
+    只能用于线程池：被装饰后模块属性是包装函数，进程池无法序列化原函数，
+    且路由函数中的数据库会话、缓存写入等只在本进程中有效。
+    """
+    if pool.kind == 'process':
+        raise ValueError(f"offload 不能用于进程池 {pool.name}，请在路由中用 pool.run 调用模块级函数")
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            return await pool.run(fn, *args, **kwargs)
+        return wrapper
+    return decorator
+
+async def event_loop_lag() -> float:
+    """事件循环调度延迟（毫秒）：回调排队到执行之间的时间"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    scheduled = time.perf_counter()
+    loop.call_soon(lambda: future.set_result(time.perf_counter() - scheduled))
+    return round(await future * 1000, 3)
+
+# 阻塞I/O（数据库、对象存储、Docker）
+io_pool = BoundedPool("io", settings.EXECUTOR_IO_WORKERS, settings.EXECUTOR_MAX_PENDING)
+# CPU密集（解析、转换、探查）；polars 计算时释放GIL，默认使用线程
+cpu_pool = BoundedPool("cpu", settings.EXECUTOR_CPU_WORKERS, settings.EXECUTOR_MAX_PENDING,
+                       kind=settings.EXECUTOR_CPU_POOL_KIND)
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """所有执行池的指标"""
+    return {pool.name: pool.stats() for pool in (io_pool, cpu_pool)}
@@ -0,0 +1,43 @@
+import hashlib
+from typing import Callable, Optional
+
+from fastapi.responses import Response
+
+from .config import settings
+
+# 版本快照及其派生结果写入后不再变化，浏览器和代理可以长期缓存
+IMMUTABLE = settings.HTTP_CACHE_IMMUTABLE
+# 会变化的资源每次向服务端确认，未变化时返回304
+REVALIDATE = "no-cache"
+
+def make_etag(*parts) -> str:
+    """由版本ID、内容哈希和请求参数生成强ETag"""
+    digest = hashlib.sha256('\x1f'.join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否包含该ETag（按弱比较，忽略 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return any((tag[2:] if tag.startswith('W/') else tag) == etag for tag in candidates)
+
+def cached(if_none_match: Optional[str], etag: str, cache_control: str,
+           build: Callable[[], Response], vary: Optional[str] = None,
+           exists: Optional[Callable[[], bool]] = None) -> Response:
+    """条件请求：ETag匹配时直接返回304，不再生成响应体；否则生成响应并加上缓存头
+
+    If-None-Match: * 只在资源存在时匹配；提供 exists 时先检查，资源不存在则照常生成响应（如404）。
+    """
+    headers = {'ETag': etag, 'Cache-Control': cache_control}
+    if vary:
+        headers['Vary'] = vary
+    wildcard = if_none_match is not None and if_none_match.strip() == '*'
+    if etag_matches(if_none_match, etag) and not (wildcard and exists is not None and not exists()):
+        return Response(status_code=304, headers=headers)
+    response = build()
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
@@ -1,33 +1,93 @@
 import os
+import io
+import json
+import threading
+from datetime import timedelta
+import certifi
+import urllib3
 from minio import Minio
+from minio.commonconfig import CopySource
 from minio.error import S3Error
 import logging
-from typing import Optional
+from typing import Optional, Dict, Any, BinaryIO, Set
 
 logger = logging.getLogger(__name__)
 
+def _http_pool(pool_size: int) -> urllib3.PoolManager:
+    """与Minio默认相同的连接池，但每个主机保留 pool_size 个连接（默认10个，少于I/O线程数时连接会被反复新建）"""
+    timeout = timedelta(minutes=5).seconds
+    return urllib3.PoolManager(
+        timeout=urllib3.Timeout(connect=timeout, read=timeout),
+        maxsize=pool_size,
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+        retries=urllib3.Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+    )
+
 class MinIOClient:
-    """MinIO客户端封装"""
+    """MinIO客户端封装
+
+    实例是线程安全的（底层为urllib3连接池），整个应用共享一个实例，见 app.core.services。
+    已确认存在的存储桶记录在内存中，之后的上传不再逐次检查。
+    """
     
-    def __init__(self):
+    def __init__(self, pool_size: Optional[int] = None):
+        endpoint = os.getenv('MINIO_ENDPOINT', 'localhost:9000')
+        access_key = os.getenv('MINIO_ACCESS_KEY', 'minioadmin')
+        secret_key = os.getenv('MINIO_SECRET_KEY', 'minioadmin')
+        secure = os.getenv('MINIO_SECURE', 'false').lower() == 'true'
         self.client = Minio(
-            endpoint=os.getenv('MINIO_ENDPOINT', 'localhost:9000'),
-            access_key=os.getenv('MINIO_ACCESS_KEY', 'minioadmin'),
-            secret_key=os.getenv('MINIO_SECRET_KEY', 'minioadmin'),
-            secure=os.getenv('MINIO_SECURE', 'false').lower() == 'true'
+            endpoint=endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=_http_pool(pool_size) if pool_size else None
         )
+        self.known_buckets: Set[str] = set()
+        self._bucket_lock = threading.Lock()
+        # 供polars按范围读取对象（s3://bucket/object）的连接参数
+        self.storage_options = {
+            'aws_endpoint_url': f"{'https' if secure else 'http'}://{endpoint}",
+            'aws_access_key_id': access_key,
+            'aws_secret_access_key': secret_key,
+            'aws_region': os.getenv('MINIO_REGION', 'us-east-1'),
+            'aws_allow_http': str(not secure).lower()
+        }
+    
+    def object_uri(self, bucket_name: str, object_name: str) -> str:
+        """对象的s3地址，配合 storage_options 使用"""
+        return f"s3://{bucket_name}/{object_name}"
     
     def ensure_bucket_exists(self, bucket_name: str) -> bool:
-        """确保存储桶存在"""
+        """确保存储桶存在，已确认存在的存储桶不再请求"""
+        if bucket_name in self.known_buckets:
+            return True
         try:
             if not self.client.bucket_exists(bucket_name):
-                self.client.make_bucket(bucket_name)
-                logger.info(f"创建存储桶: {bucket_name}")
+                try:
+                    self.client.make_bucket(bucket_name)
+                    logger.info(f"创建存储桶: {bucket_name}")
+                except S3Error as e:
+                    # 并发请求已创建同名存储桶
+                    if e.code not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+                        raise
+            with self._bucket_lock:
+                self.known_buckets.add(bucket_name)
             return True
         except S3Error as e:
             logger.error(f"创建存储桶失败: {e}")
             return False
     
+    def forget_bucket(self, bucket_name: str) -> None:
+        """从已知存储桶中移除（存储桶被删除，或请求返回NoSuchBucket时）"""
+        with self._bucket_lock:
+            self.known_buckets.discard(bucket_name)
+    
+    def _check_missing_bucket(self, error: S3Error, bucket_name: str) -> None:
+        # 存储桶在外部被删除时，下次上传重新检查并创建
+        if error.code == 'NoSuchBucket':
+            self.forget_bucket(bucket_name)
+    
     def upload_file(self, file_path: str, bucket_name: str, object_name: str) -> bool:
         """上传文件到MinIO"""
         try:
@@ -36,9 +96,37 @@ class MinIOClient:
             logger.info(f"文件上传成功: {object_name}")
             return True
         except S3Error as e:
+            self._check_missing_bucket(e, bucket_name)
             logger.error(f"文件上传失败: {e}")
             return False
     
+    def put_stream(self, bucket_name: str, object_name: str, stream: BinaryIO,
+                   part_size: int = 16 * 1024 * 1024,
+                   content_type: str = "application/octet-stream") -> bool:
+        """从长度未知的流分段上传（multipart），内存占用不超过一个分段"""
+        try:
+            self.ensure_bucket_exists(bucket_name)
+            self.client.put_object(bucket_name, object_name, stream, length=-1,
+                                   part_size=part_size, content_type=content_type)
+            logger.info(f"流式上传成功: {object_name}")
+            return True
+        except S3Error as e:
+            self._check_missing_bucket(e, bucket_name)
+            logger.error(f"流式上传失败: {e}")
+            return False
+    
+    def copy_object(self, source_bucket: str, source_object: str,
+                    bucket_name: str, object_name: str) -> bool:
+        """服务端复制对象，数据不经过本服务（超过5GiB的对象由minio客户端自动改用分段合并复制）"""
+        try:
+            self.ensure_bucket_exists(bucket_name)
+            self.client.copy_object(bucket_name, object_name, CopySource(source_bucket, source_object))
+            return True
+        except S3Error as e:
+            self._check_missing_bucket(e, bucket_name)
+            logger.error(f"对象复制失败: {e}")
+            return False
+    
     def download_file(self, bucket_name: str, object_name: str, file_path: str) -> bool:
         """从MinIO下载文件"""
         try:
@@ -49,6 +137,52 @@ class MinIOClient:
             logger.error(f"文件下载失败: {e}")
             return False
     
+    def put_json(self, bucket_name: str, object_name: str, data: Dict[str, Any]) -> bool:
+        """上传JSON对象（如接入清单）"""
+        try:
+            self.ensure_bucket_exists(bucket_name)
+            body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+            self.client.put_object(bucket_name, object_name, io.BytesIO(body), len(body),
+                                   content_type='application/json')
+            return True
+        except S3Error as e:
+            self._check_missing_bucket(e, bucket_name)
+            logger.error(f"JSON对象上传失败: {e}")
+            return False
+    
+    def get_json(self, bucket_name: str, object_name: str) -> Optional[Dict[str, Any]]:
+        """读取JSON对象，不存在时返回None"""
+        response = None
+        try:
+            response = self.client.get_object(bucket_name, object_name)
+            return json.loads(response.read().decode('utf-8'))
+        except S3Error:
+            return None
+        finally:
+            if response is not None:
+                response.close()
+                response.release_conn()
+    
+    def stat_size(self, bucket_name: str, object_name: str) -> Optional[int]:
+        """对象大小，不存在时返回None"""
+        try:
+            return self.client.stat_object(bucket_name, object_name).size
+        except S3Error:
+            return None
+    
+    def get_range(self, bucket_name: str, object_name: str, offset: int, length: int) -> bytes:
+        """按范围读取对象的一段字节"""
+        response = self.client.get_object(bucket_name, object_name, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+    
+    def open_object(self, bucket_name: str, object_name: str):
+        """打开对象的读取流，调用方读完后 close() 并 release_conn()"""
+        return self.client.get_object(bucket_name, object_name)
+    
     def delete_object(self, bucket_name: str, object_name: str) -> bool:
         """删除对象"""
         try:
@@ -0,0 +1,188 @@
+import struct
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+import logging
+
+from .minio_client import MinIOClient
+
+logger = logging.getLogger(__name__)
+
+# Parquet文件以 <footer> <footer长度:4字节> PAR1 结尾
+MAGIC = b'PAR1'
+# 首次请求的尾部字节数，大多数文件的元数据可以一次读完
+TAIL_BYTES = 64 * 1024
+
+class _CompactReader:
+    """Thrift compact协议的最小解析器，只用于读取Parquet文件元数据
+
+    结构体解析为 {字段ID: 值} 字典，列表解析为Python列表，不需要完整的Thrift定义。
+    """
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def _byte(self) -> int:
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def _varint(self) -> int:
+        shift = result = 0
+        while True:
+            byte = self._byte()
+            result |= (byte & 0x7f) << shift
+            if not byte & 0x80:
+                return result
+            shift += 7
+
+    def _zigzag(self) -> int:
+        n = self._varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def _value(self, ttype: int) -> Any:
+        if ttype == 1:
+            return True
+        if ttype == 2:
+            return False
+        if ttype == 3:
+            return struct.unpack('b', bytes([self._byte()]))[0]
+        if ttype in (4, 5, 6):
+            return self._zigzag()
+        if ttype == 7:
+            value = struct.unpack('<d', self.data[self.pos:self.pos + 8])[0]
+            self.pos += 8
+            return value
+        if ttype == 8:
+            length = self._varint()
+            value = self.data[self.pos:self.pos + length]
+            self.pos += length
+            return value
+        if ttype in (9, 10):
+            header = self._byte()
+            size = header >> 4
+            if size == 15:
+                size = self._varint()
+            elem_type = header & 0x0f
+            if elem_type in (1, 2):
+                # 列表中的布尔值每个占一个字节
+                return [self._byte() == 1 for _ in range(size)]
+            return [self._value(elem_type) for _ in range(size)]
+        if ttype == 11:
+            size = self._varint()
+            if not size:
+                return {}
+            types = self._byte()
+            return {self._value(types >> 4): self._value(types & 0x0f) for _ in range(size)}
+        if ttype == 12:
+            return self.read_struct()
+        raise ValueError(f"无法解析的Thrift类型: {ttype}")
+
+    def read_struct(self) -> Dict[int, Any]:
+        fields: Dict[int, Any] = {}
+        field_id = 0
+        while True:
+            header = self._byte()
+            if header == 0:
+                return fields
+            delta, ttype = header >> 4, header & 0x0f
+            field_id = field_id + delta if delta else self._zigzag()
+            fields[field_id] = self._value(ttype)
+
+class RowGroupIndex:
+    """Parquet对象的行组偏移索引：每个行组的起始行、行数和字节区间
+
+    按行偏移分页时，用二分查找确定覆盖 [offset, offset+limit) 的行组，只读取这些行组。
+    """
+
+    def __init__(self, row_groups: List[Dict[str, int]], size: int):
+        self.row_groups = row_groups
+        self.size = size
+        self.starts = [group['start'] for group in row_groups]
+        self.rows = sum(group['rows'] for group in row_groups)
+
+    @classmethod
+    def from_footer(cls, footer: bytes, size: int) -> "RowGroupIndex":
+        """从文件元数据（FileMetaData）解析行组：字段4为行组列表，行组字段3为行数、字段1为列块"""
+        metadata = _CompactReader(footer).read_struct()
+        row_groups = []
+        start = 0
+        for group in metadata.get(4, []):
+            num_rows = group.get(3, 0)
+            byte_start, byte_end = None, 0
+            for column in group.get(1, []):
+                # 列块元数据：字段7压缩后大小，字段9数据页偏移，字段11字典页偏移
+                meta = column.get(3)
+                if not meta:
+                    continue
+                offset = meta.get(11) or meta.get(9)
+                byte_start = offset if byte_start is None else min(byte_start, offset)
+                byte_end = max(byte_end, offset + meta.get(7, 0))
+            row_groups.append({
+                'start': start,
+                'rows': num_rows,
+                'byte_start': byte_start or 0,
+                'bytes': byte_end - (byte_start or 0)
+            })
+            start += num_rows
+        return cls(row_groups, size)
+
+    def covering(self, offset: int, limit: int) -> Tuple[int, int]:
+        """覆盖 [offset, offset+limit) 的行组序号区间 [first, last]，超出范围时返回 (-1, -1)"""
+        if not self.row_groups or limit <= 0 or offset >= self.rows:
+            return -1, -1
+        first = bisect_right(self.starts, offset) - 1
+        last = bisect_right(self.starts, min(offset + limit, self.rows) - 1) - 1
+        return first, last
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'rows': self.rows, 'size': self.size, 'row_groups': self.row_groups}
+
+def read_row_group_index(minio_client: MinIOClient, bucket_name: str, object_name: str) -> RowGroupIndex:
+    """按范围读取对象尾部的元数据并建立行组索引（通常一次请求，元数据较大时再补一次）"""
+    size = minio_client.stat_size(bucket_name, object_name)
+    if size is None:
+        raise FileNotFoundError(f"对象不存在: {bucket_name}/{object_name}")
+    if size < 12:
+        raise ValueError(f"不是Parquet文件: {object_name}")
+    tail_length = min(size, TAIL_BYTES)
+    tail = minio_client.get_range(bucket_name, object_name, size - tail_length, tail_length)
+    if tail[-4:] != MAGIC:
+        raise ValueError(f"不是Parquet文件: {object_name}")
+    footer_length = struct.unpack('<I', tail[-8:-4])[0]
+    if footer_length + 8 > tail_length:
+        tail = minio_client.get_range(bucket_name, object_name, size - footer_length - 8, footer_length + 8)
+    return RowGroupIndex.from_footer(tail[-footer_length - 8:-8], size)
+
+class RowGroupIndexCache:
+    """行组索引的LRU缓存，键为 (bucket, object)；快照和排序视图写入后不再修改，索引不会过期"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Tuple[str, str], RowGroupIndex]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, minio_client: MinIOClient, bucket_name: str, object_name: str) -> RowGroupIndex:
+        key = (bucket_name, object_name)
+        with self.lock:
+            index = self.entries.get(key)
+            if index is not None:
+                self.entries.move_to_end(key)
+                return index
+        index = read_row_group_index(minio_client, bucket_name, object_name)
+        with self.lock:
+            self.entries[key] = index
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return index
+
+    def discard_prefix(self, bucket_name: str, prefix: str) -> None:
+        """删除对象后移除对应的索引"""
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == bucket_name and key[1].startswith(prefix)]:
+                del self.entries[key]
+
+# 全局行组索引缓存
+row_group_index_cache = RowGroupIndexCache()
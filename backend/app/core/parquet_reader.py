@@ -0,0 +1,46 @@
+from typing import Dict, List, Optional
+import logging
+
+import polars as pl
+
+from .minio_client import MinIOClient
+
+logger = logging.getLogger(__name__)
+
+class ParquetObjectReader:
+    """按范围读取对象存储中的Parquet，不下载整个对象
+
+    polars 先用范围请求读取文件尾部的元数据，再只请求所需行组中所需列的字节区间：
+    schema、行数只读元数据；前几行只读第一个行组；列投影只读对应的列块。
+    """
+
+    def __init__(self, minio_client: MinIOClient):
+        self.minio = minio_client
+
+    def scan(self, bucket_name: str, object_name: str) -> pl.LazyFrame:
+        """对象的扫描计划，投影和切片会下推为范围请求"""
+        return pl.scan_parquet(self.minio.object_uri(bucket_name, object_name),
+                               storage_options=self.minio.storage_options)
+
+    def schema(self, bucket_name: str, object_name: str) -> Dict[str, str]:
+        """从文件元数据读取schema"""
+        return {col: str(dtype) for col, dtype in self.scan(bucket_name, object_name).collect_schema().items()}
+
+    def row_count(self, bucket_name: str, object_name: str) -> int:
+        """从文件元数据读取总行数"""
+        return self.scan(bucket_name, object_name).select(pl.len()).collect().item()
+
+    def read(self, bucket_name: str, object_name: str, columns: Optional[List[str]] = None,
+             offset: int = 0, limit: Optional[int] = None) -> pl.DataFrame:
+        """读取指定列的一段行，只传输覆盖这些行的行组中的这些列"""
+        lf = self.scan(bucket_name, object_name)
+        if columns:
+            lf = lf.select(columns)
+        if offset or limit is not None:
+            lf = lf.slice(offset, limit)
+        return lf.collect()
+
+    def head(self, bucket_name: str, object_name: str, n: int = 5,
+             columns: Optional[List[str]] = None) -> pl.DataFrame:
+        """读取前n行"""
+        return self.read(bucket_name, object_name, columns=columns, limit=n)
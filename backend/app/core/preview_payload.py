@@ -0,0 +1,82 @@
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+import polars as pl
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+PREVIEW_FORMATS = ('rows', 'columnar', 'arrow')
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+def resolve_format(format: str, accept: Optional[str] = None) -> str:
+    """响应格式：format参数优先，未指定时 Accept 为Arrow流则返回arrow"""
+    if format not in PREVIEW_FORMATS:
+        raise HTTPException(status_code=400, detail=f"不支持的格式: {format}，可选 {', '.join(PREVIEW_FORMATS)}")
+    if format == 'rows' and accept and ARROW_MEDIA_TYPE in accept:
+        return 'arrow'
+    return format
+
+def truncate_strings(df: pl.DataFrame, max_chars: Optional[int]) -> Tuple[pl.DataFrame, Dict[str, int]]:
+    """把字符串单元格截断到 max_chars 个字符，返回截断后的数据和各列被截断的单元格数"""
+    if not max_chars or max_chars <= 0:
+        return df, {}
+    string_columns = [col for col, dtype in df.schema.items() if dtype == pl.String]
+    if not string_columns:
+        return df, {}
+    counts = df.select([(pl.col(col).str.len_chars() > max_chars).sum().alias(col) for col in string_columns]).row(0)
+    truncated = {col: count for col, count in zip(string_columns, counts) if count}
+    if truncated:
+        df = df.with_columns([pl.col(col).str.slice(0, max_chars) for col in truncated])
+    return df, truncated
+
+def columnar(df: pl.DataFrame, max_chars: Optional[int] = None) -> Dict[str, Any]:
+    """列式数据：列名、schema和按列排列的值数组，比逐行字典少重复列名"""
+    df, truncated = truncate_strings(df, max_chars)
+    return {
+        'columns': df.columns,
+        'schema': {col: str(dtype) for col, dtype in df.schema.items()},
+        'data': [series.to_list() for series in df.get_columns()],
+        'truncated': truncated
+    }
+
+def rows_frame(rows: List[Dict[str, Any]], columns: Optional[List[str]] = None) -> pl.DataFrame:
+    """把探查结果中缓存的样本行（字典列表）转换为数据表，可选列投影"""
+    df = pl.DataFrame(rows, infer_schema_length=None) if rows else pl.DataFrame()
+    if columns:
+        df = df.select([col for col in columns if col in df.columns])
+    return df
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    """用orjson编码响应，numpy类型直接序列化，无法识别的值转为字符串"""
+    body = orjson.dumps(payload, default=str,
+                        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return Response(content=body, status_code=status_code, media_type="application/json")
+
+def arrow_response(df: pl.DataFrame, metadata: Optional[Dict[str, Any]] = None) -> Response:
+    """Arrow IPC流格式的响应体，分页信息放在 X-Preview-* 响应头中"""
+    buffer = io.BytesIO()
+    # 使用最早的兼容级别（LargeUtf8而不是Utf8View），不压缩，各语言的Arrow库都能直接读取
+    df.write_ipc_stream(buffer, compat_level=pl.CompatLevel.oldest())
+    headers = {f"X-Preview-{key.replace('_', '-').title()}": str(value)
+               for key, value in (metadata or {}).items() if value is not None}
+    return Response(content=buffer.getvalue(), media_type=ARROW_MEDIA_TYPE, headers=headers)
+
+def table_response(df: pl.DataFrame, format: str, metadata: Dict[str, Any],
+                   max_chars: Optional[int] = None, default_max_chars: Optional[int] = None) -> Response:
+    """按格式返回一段数据：rows为逐行字典，columnar为列数组，arrow为IPC流
+
+    max_chars 未指定时，columnar 使用 default_max_chars，rows 和 arrow 不截断。
+    """
+    if format == 'arrow':
+        df, truncated = truncate_strings(df, max_chars)
+        return arrow_response(df, {**metadata, 'truncated_cells': sum(truncated.values()) or None})
+    if format == 'columnar':
+        return json_response({**metadata, 'format': 'columnar',
+                              **columnar(df, max_chars if max_chars is not None else default_max_chars)})
+    df, truncated = truncate_strings(df, max_chars)
+    return json_response({**metadata,
+                          'columns': df.columns,
+                          'dtypes': {col: str(dtype) for col, dtype in df.schema.items()},
+                          'rows': df.to_dicts(),
+                          **({'truncated': truncated} if truncated else {})})
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Dict, Any, List, Optional, Union
+import logging
+
+from .config import settings
+from .executors import io_pool
+
+logger = logging.getLogger(__name__)
+
+SANDBOX_BACKENDS = ('docker', 'local', 'auto')
+
+def stage_input(source: str, job_dir: str) -> str:
+    """把输入文件放入任务目录（同一文件系统上使用硬链接，否则复制），返回文件名"""
+    name = 'input' + os.path.splitext(source)[1]
+    target = os.path.join(job_dir, name)
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+    return name
+
+def output_name(output_file: str) -> str:
+    """任务目录中的输出文件名，扩展名决定输出格式"""
+    return 'output' + os.path.splitext(output_file)[1]
+
+# 任务目录中结果的Arrow副本
+EXCHANGE_NAME = 'exchange.arrow'
+
+class SandboxBackend(ABC):
+    """生成代码的执行后端
+
+    子类实现 _run_job（阻塞调用，在I/O池中执行）、stats 和 shutdown。
+    代码读取 df、生成 result_df；结果移到 output_file，返回统计信息、结果清单和 output_path。
+    """
+
+    name = ''
+    timeout: float = settings.SANDBOX_TIMEOUT
+
+    async def execute_code(self, code: Union[str, List[str]], input_file: str,
+                           output_file: str,
+                           manifest: Optional[Dict[str, Any]] = None,
+                           exchange_file: Optional[str] = None,
+                           limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        在沙箱中执行Python代码
+
+        Args:
+            code: 要执行的Python代码（读取 df，生成 result_df）；为列表时作为流水线的各步骤，
+                  组合为一个惰性查询计划执行
+            input_file: 输入数据文件路径
+            output_file: 输出数据文件路径，相对路径保存在临时目录下
+            manifest: 上传接入清单，CSV按其中的分隔符以UTF-8读取（接入后的快照为Parquet）
+            exchange_file: 结果的Arrow IPC副本保存位置（作为下一次执行的输入），不需要时为None
+            limit: 流水线只计算结果的前几行（校验步骤、生成预览），None 时计算全部
+
+        Returns:
+            执行结果字典
+        """
+        return await io_pool.run(self.run, code, input_file, output_file, manifest, exchange_file, limit)
+
+    def run(self, code: Union[str, List[str]], input_file: str, output_file: str,
+            manifest: Optional[Dict[str, Any]] = None, exchange_file: Optional[str] = None,
+            limit: Optional[int] = None) -> Dict[str, Any]:
+        """execute_code 的阻塞版本，供已在I/O池中执行的调用方使用（如读取时物化版本）"""
+        separator = (manifest or {}).get('delimiter', ',')
+        if not os.path.isabs(output_file):
+            output_file = os.path.join(tempfile.gettempdir(), output_file)
+        if not input_file or not os.path.exists(input_file):
+            return {'success': False, 'error': f'输入文件不存在: {input_file}'}
+
+        try:
+            return self._run_job(code, input_file, output_file, separator, exchange_file, limit)
+        except TimeoutError as e:
+            return {
+                'success': False,
+                'error': f'执行超时: {str(e) or self.timeout}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'执行异常: {str(e)}'
+            }
+
+    @abstractmethod
+    def _run_job(self, code: Union[str, List[str]], input_file: str, output_file: str, separator: str,
+                 exchange_file: Optional[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """执行一个任务（阻塞调用）"""
+
+    @staticmethod
+    def _job_request(code: Union[str, List[str]], input_path: str, output_path: str, separator: str,
+                     exchange_path: Optional[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """运行器的任务请求，路径为沙箱内可见的路径；代码为列表时是流水线任务"""
+        if isinstance(code, list):
+            request = {'steps': code, 'limit': limit}
+        else:
+            request = {'code': code}
+        return {
+            **request,
+            'input_path': input_path,
+            'output_path': output_path,
+            'exchange_path': exchange_path,
+            'separator': separator,
+            'preview_rows': settings.SANDBOX_PREVIEW_ROWS
+        }
+
+    @staticmethod
+    def _job_result(result: Dict[str, Any], output_path: str,
+                    exchange_path: Optional[str] = None) -> Dict[str, Any]:
+        """把运行器的返回值整理为执行结果；清单中的预览行单独返回，其余字段可直接作为版本元信息"""
+        if not result.get('success'):
+            return {
+                'success': False,
+                'error': result.get('error', '执行失败'),
+                'traceback': result.get('traceback', '')
+            }
+        stats = result.get('stats', {})
+        manifest = dict(result.get('manifest') or {})
+        return {
+            'success': True,
+            'stats': stats,
+            'manifest': manifest,
+            'preview': manifest.pop('preview', []),
+            'rows_affected': stats.get('rows_affected', 0),
+            'output_path': output_path,
+            'exchange_path': exchange_path,
+            'pipeline': result.get('pipeline')
+        }
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """排队等待和执行耗时等指标"""
+
+    def shutdown(self) -> None:
+        """释放后端持有的进程、容器和连接"""
+
+    def validate_script(self, script: str) -> bool:
+        """验证脚本安全性"""
+        dangerous_imports = [
+            'os.system', 'subprocess', 'socket', 'urllib', 'requests',
+            '__import__', 'eval', 'exec', 'compile', 'open('
+        ]
+
+        for dangerous in dangerous_imports:
+            if dangerous in script:
+                return False
+
+        return True
+
+def create_sandbox(backend: Optional[str] = None) -> SandboxBackend:
+    """按配置创建执行后端：docker为预热容器池，local为本地forkserver子进程，
+    auto在Docker不可用时（如无法挂载 docker.sock）使用本地进程"""
+    backend = backend or settings.SANDBOX_BACKEND
+    if backend not in SANDBOX_BACKENDS:
+        raise ValueError(f"不支持的沙箱后端: {backend}，可选 {', '.join(SANDBOX_BACKENDS)}")
+    if backend != 'local':
+        try:
+            from .sandbox_executor import SandboxExecutor
+            return SandboxExecutor()
+        except Exception as e:
+            if backend == 'docker':
+                raise
+            logger.warning(f"Docker不可用，使用本地进程沙箱: {e}")
+    from .sandbox_local import LocalProcessExecutor
+    return LocalProcessExecutor()
@@ -0,0 +1,129 @@
+import os
+import shutil
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+import logging
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class ArrowExchange:
+    """沙箱的数据交换目录：每个版本一个未压缩的Arrow IPC文件
+
+    目录位于 SANDBOX_SHARED_DIR 下（默认在tmpfs上），与容器工作目录、本地沙箱临时目录
+    在同一文件系统，放入任务目录时使用硬链接，沙箱内按内存映射读取，不再解析和复制数据。
+    沙箱执行成功后直接把结果的Arrow副本放入目录，作为下一轮对话的输入。
+    文件按最近使用时间（mtime）淘汰，总大小不超过 max_bytes；用 acquire 取得的文件在
+    release 之前不会被淘汰，保证放入任务目录（硬链接）之前文件仍然存在。
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # 路径 -> 正在使用的次数
+        self._pins: Dict[str, int] = {}
+
+    def _makedirs(self) -> None:
+        # 只允许后端用户访问：本地进程沙箱的子进程不能读取其他项目的版本
+        os.makedirs(self.directory, exist_ok=True)
+        os.chmod(self.directory, 0o700)
+
+    def path(self, version_id: str) -> str:
+        return os.path.join(self.directory, f'{version_id}.arrow')
+
+    def pending_path(self) -> str:
+        """尚未确定版本ID的结果副本的位置，版本创建后用 put 放入"""
+        self._makedirs()
+        return os.path.join(self.directory, f'.pending-{uuid.uuid4().hex[:12]}.tmp')
+
+    def discard(self, path: Optional[str]) -> None:
+        """删除没有用到的结果副本"""
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def get(self, version_id: str) -> Optional[str]:
+        """版本的Arrow文件，不存在时返回None"""
+        path = self.path(version_id)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, version_id: str, source: str, pin: bool = False) -> str:
+        """把沙箱生成的Arrow文件移入交换目录，pin为True时同时标记为使用中"""
+        self._makedirs()
+        path = self.path(version_id)
+        with self._lock:
+            shutil.move(source, path)
+            if pin:
+                self._pins[path] = self._pins.get(path, 0) + 1
+        self._evict(keep=path)
+        return path
+
+    def acquire(self, version_id: str, create: Callable[[str], None]) -> str:
+        """取得版本的Arrow文件并标记为使用中，不存在时调用 create(path) 生成（如从快照转换）
+
+        用完后必须调用 release。
+        """
+        path = self.path(version_id)
+        with self._lock:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                pass
+            else:
+                self._pins[path] = self._pins.get(path, 0) + 1
+                return path
+        temp_path = self.pending_path()
+        try:
+            create(temp_path)
+            return self.put(version_id, temp_path, pin=True)
+        finally:
+            self.discard(temp_path)
+
+    def release(self, path: Optional[str]) -> None:
+        """取消 acquire 的使用标记"""
+        if not path:
+            return
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+
+    @contextmanager
+    def using(self, version_id: str, create: Callable[[str], None]) -> Iterator[str]:
+        """acquire/release 的上下文管理器形式"""
+        path = self.acquire(version_id, create)
+        try:
+            yield path
+        finally:
+            self.release(path)
+
+    def _evict(self, keep: str) -> None:
+        """超过容量时从最久未使用的文件开始删除，跳过使用中的文件"""
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.arrow') and entry.path != keep and entry.path not in self._pins:
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries) + os.path.getsize(keep)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+# 全局数据交换目录
+arrow_exchange = ArrowExchange(os.path.join(settings.SANDBOX_SHARED_DIR, 'exchange'),
+                               settings.SANDBOX_EXCHANGE_CACHE_MB * 1024 * 1024)
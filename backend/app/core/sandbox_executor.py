@@ -1,174 +1,91 @@
 import docker
-import tempfile
 import os
+import shutil
+import socket
 import uuid
-import json
-import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Union
 import logging
 
+from .config import settings
+from .sandbox_backend import EXCHANGE_NAME, SandboxBackend, output_name, stage_input
+from .sandbox_pool import SandboxWorker, WarmContainerPool
+
 logger = logging.getLogger(__name__)
 
-class SandboxExecutor:
-    """安全代码执行器，使用Docker容器沙箱"""
-    
+class SandboxExecutor(SandboxBackend):
+    """安全代码执行器，使用预热的Docker容器沙箱"""
+
+    name = 'docker'
+
     def __init__(self):
         self.client = docker.from_env()
-        self.container_timeout = 30  # 容器最大运行时间（秒）
-        self.memory_limit = '2g'    # 内存限制
-        self.cpu_limit = '1'        # CPU限制
-        
-    async def execute_code(self, code: str, input_file: str, 
-                           output_file: str) -> Dict[str, Any]:
-        """
-        在安全的Docker容器中执行Python代码
-        
-        Args:
-            code: 要执行的Python代码
-            input_file: 输入数据文件路径
-            output_file: 输出数据文件路径
-            
-        Returns:
-            执行结果字典
-        """
-        container_name = f"dp-sandbox-{uuid.uuid4().hex[:8]}"
-        
-        # 创建临时目录用于脚本和数据交换
-        with tempfile.TemporaryDirectory() as temp_dir:
-            script_path = os.path.join(temp_dir, "script.py")
-            
-            # 准备完整的执行脚本
-            full_script = f"""
-import sys
-import traceback
-import json
-import polars as pl
-import os
+        self.timeout = settings.SANDBOX_TIMEOUT            # 单个任务最大执行时间（秒）
+        self.image = settings.DOCKER_IMAGE              # 沙箱运行时镜像
+        self.memory_limit = settings.SANDBOX_MEMORY_LIMIT  # 内存限制
+        self.cpu_limit = settings.SANDBOX_CPU_LIMIT        # CPU限制
+        self.pool = WarmContainerPool(
+            self.client,
+            image=self.image,
+            shared_dir=settings.SANDBOX_SHARED_DIR,
+            size=settings.SANDBOX_POOL_SIZE,
+            min_warm=settings.SANDBOX_POOL_MIN_WARM,
+            max_warm=settings.SANDBOX_POOL_MAX_WARM,
+            max_jobs=settings.SANDBOX_WORKER_MAX_JOBS,
+            mem_limit=self.memory_limit,
+            cpu_limit=self.cpu_limit,
+            startup_timeout=settings.SANDBOX_STARTUP_TIMEOUT,
+            container_uid=settings.SANDBOX_CONTAINER_UID
+        )
+        self.pool.start()
 
-# 设置安全限制
-sys.setrecursionlimit(1000)
+    def _run_job(self, code: Union[str, List[str]], input_file: str, output_file: str, separator: str,
+                 exchange_file: Optional[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """在池中的容器里执行一个任务：输入文件放入容器工作目录，结果移到 output_file"""
+        try:
+            with self.pool.lease(timeout=self.timeout) as worker:
+                result = self._run_in_worker(worker, code, input_file, output_file, separator,
+                                             exchange_file, limit)
+        except docker.errors.ImageNotFound:
+            return {
+                'success': False,
+                'error': f'沙箱镜像 {self.image} 未找到，请先构建 backend/sandbox/Dockerfile'
+            }
+        return self._job_result(result, output_file, exchange_file)
 
-# 读取输入数据
-try:
-    if '{input_file}'.endswith('.csv'):
-        df = pl.read_csv('{input_file}')
-    elif '{input_file}'.endswith('.xlsx'):
-        df = pl.read_excel('{input_file}')
-    else:
-        raise ValueError("不支持的文件格式")
-    
-    # 执行用户代码
-{code}
-    
-    # 保存结果
-    result_df.write_csv('{output_file}')
-    
-    # 返回统计信息
-    stats = {{
-        'rows': len(result_df),
-        'columns': len(result_df.columns),
-        'columns_list': result_df.columns,
-        'dtypes': {{col: str(dtype) for col, dtype in result_df.schema.items()}},
-        'rows_affected': len(result_df)
-    }}
-    
-    print(json.dumps(stats))
-    
-except Exception as e:
-    error_info = {{
-        'error': str(e),
-        'traceback': traceback.format_exc()
-    }}
-    print(json.dumps(error_info))
-    sys.exit(1)
-"""
-            
-            with open(script_path, 'w', encoding='utf-8') as f:
-                f.write(full_script)
-            
+    def _run_in_worker(self, worker: SandboxWorker, code: Union[str, List[str]], input_file: str,
+                       output_file: str, separator: str, exchange_file: Optional[str],
+                       limit: Optional[int] = None) -> Dict[str, Any]:
+        """在容器中执行：任务目录位于宿主机和容器共享的工作目录下"""
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = worker.host_path('jobs', job_id)
+        os.makedirs(job_dir)
+        self.pool.grant_dir(job_dir)
+        try:
+            input_name = stage_input(input_file, job_dir)
+            result_name = output_name(output_file)
             try:
-                # 启动Docker容器
-                container = self.client.containers.run(
-                    image='python:3.10-slim',
-                    command=['python', '/sandbox/script.py'],
-                    name=container_name,
-                    volumes={
-                        temp_dir: {'bind': '/sandbox', 'mode': 'rw'},
-                        os.path.dirname(input_data_path): {'bind': '/data', 'mode': 'ro'}
-                    },
-                    working_dir='/sandbox',
-                    mem_limit=self.memory_limit,
-                    cpu_quota=int(self.cpu_limit) * 100000,
-                    network_mode='none',  # 禁用网络访问
-                    read_only=True,       # 只读文件系统
-                    tmpfs={'/tmp': 'size=100m'},  # 临时文件系统
-                    remove=True,          # 容器退出后自动删除
-                    detach=True,
-                    stdout=True,
-                    stderr=True
-                )
-                
-                # 等待容器完成
-                result = container.wait(timeout=self.container_timeout)
-                
-                # 获取输出
-                logs = container.logs().decode('utf-8').strip()
-                
-                if result['StatusCode'] == 0:
-                    # 解析成功结果
-                    try:
-                        stats = json.loads(logs.split('\n')[-1])
-                        return {
-                            'success': True,
-                            'stats': stats,
-                            'output_path': output_data_path
-                        }
-                    except json.JSONDecodeError:
-                        return {
-                            'success': True,
-                            'message': '执行成功',
-                            'raw_output': logs
-                        }
-                else:
-                    # 解析错误信息
-                    try:
-                        error_info = json.loads(logs)
-                        return {
-                            'success': False,
-                            'error': error_info.get('error', '执行失败'),
-                            'traceback': error_info.get('traceback', '')
-                        }
-                    except json.JSONDecodeError:
-                        return {
-                            'success': False,
-                            'error': logs
-                        }
-                        
-            except docker.errors.ContainerError as e:
-                return {
-                    'success': False,
-                    'error': f'容器执行错误: {str(e)}'
-                }
-            except docker.errors.ImageNotFound:
-                return {
-                    'success': False,
-                    'error': 'Python镜像未找到'
-                }
-            except Exception as e:
-                return {
-                    'success': False,
-                    'error': f'执行异常: {str(e)}'
-                }
+                result = self.pool.run(worker, self._job_request(
+                    code,
+                    worker.container_path('jobs', job_id, input_name),
+                    worker.container_path('jobs', job_id, result_name),
+                    separator,
+                    worker.container_path('jobs', job_id, EXCHANGE_NAME) if exchange_file else None,
+                    limit
+                ), timeout=self.timeout)
+            except socket.timeout:
+                raise TimeoutError(f'超过 {self.timeout} 秒')
+            if result.get('success'):
+                shutil.move(os.path.join(job_dir, result_name), output_file)
+                if exchange_file:
+                    shutil.move(os.path.join(job_dir, EXCHANGE_NAME), exchange_file)
+            return result
+        finally:
+            shutil.rmtree(job_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, **self.pool.stats()}
 
-    def validate_script(self, script: str) -> bool:
-        """验证脚本安全性"""
-        dangerous_imports = [
-            'os.system', 'subprocess', 'socket', 'urllib', 'requests',
-            '__import__', 'eval', 'exec', 'compile', 'open('
-        ]
-        
-        for dangerous in dangerous_imports:
-            if dangerous in script:
-                return False
-                
-        return True
\ No newline at end of file
+    def shutdown(self) -> None:
+        """销毁池中的容器并关闭Docker连接"""
+        self.pool.shutdown()
+        self.client.close()
@@ -0,0 +1,272 @@
+import importlib.util
+import json
+import math
+import os
+import shutil
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Union
+import logging
+
+from .config import settings
+from .sandbox_backend import EXCHANGE_NAME, SandboxBackend, output_name, stage_input
+
+logger = logging.getLogger(__name__)
+
+RUNNER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py')
+
+_SIZE_UNITS = {'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+
+# 传给forkserver的环境变量（不传后端的密钥、数据库地址等），以及前缀为 POLARS_ 的变量
+_ENV_KEYS = ('PATH', 'LANG', 'LC_ALL', 'LC_CTYPE', 'TZ')
+
+def parse_size(value: str) -> int:
+    """把Docker风格的内存大小（如 512m、2g）转换为字节数"""
+    value = str(value).strip().lower().rstrip('b')
+    if value and value[-1] in _SIZE_UNITS:
+        return int(float(value[:-1]) * _SIZE_UNITS[value[-1]])
+    return int(value)
+
+def sandbox_env(scratch_dir: str) -> Dict[str, str]:
+    """forkserver的最小环境：语言、PATH和polars的配置，HOME和TMPDIR指向临时目录"""
+    env = {key: value for key, value in os.environ.items()
+           if key in _ENV_KEYS or key.startswith('POLARS_')}
+    env['HOME'] = scratch_dir
+    env['TMPDIR'] = scratch_dir
+    return env
+
+class LocalProcessExecutor(SandboxBackend):
+    """本地进程沙箱：不需要Docker，在forkserver的子进程中执行生成的代码
+
+    forkserver（sandbox_runner.py --fork-server）启动时导入polars，每个任务fork一个子进程，
+    只有fork的开销。子进程进入新的会话和网络命名空间（系统支持时），以临时目录为工作目录，
+    设置CPU时间、地址空间和写入文件大小限制，超过墙钟时间时整个进程组被终止。
+    forkserver只继承最小的环境变量；后端以root运行时，子进程切换到执行槽位对应的用户
+    （SANDBOX_LOCAL_UID 起），只能写入自己的任务目录。
+    与容器相比共享文件系统，隔离较弱，适用于CI和无法挂载 docker.sock 的节点。
+    """
+
+    name = 'local'
+
+    def __init__(self, scratch_dir: Optional[str] = None, timeout: Optional[float] = None,
+                 memory_limit: Optional[str] = None, cpu_limit: Optional[float] = None,
+                 max_concurrency: Optional[int] = None):
+        self.scratch_dir = scratch_dir or os.path.join(settings.SANDBOX_SHARED_DIR, 'local')
+        self.timeout = timeout or settings.SANDBOX_TIMEOUT
+        self.memory_bytes = parse_size(memory_limit or settings.SANDBOX_MEMORY_LIMIT)
+        self.cpu_limit = cpu_limit or settings.SANDBOX_CPU_LIMIT
+        self.file_bytes = settings.SANDBOX_MAX_OUTPUT_MB * 1024 * 1024
+        self.max_concurrency = max(max_concurrency or settings.SANDBOX_POOL_SIZE, 1)
+        self.socket_path = os.path.join(self.scratch_dir, 'forkserver.sock')
+        self._process: Optional[subprocess.Popen] = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        # 空闲的执行槽位，以root运行时每个槽位的子进程使用不同的用户
+        self._free_slots = list(range(self.max_concurrency))
+        self.drop_privileges = os.geteuid() == 0 and _interpreter_shared()
+        self.running = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.network_isolated: Optional[bool] = None
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.exec_seconds = 0.0
+        self.max_exec_seconds = 0.0
+        self.startup_seconds = 0.0
+        self.start()
+
+    def start(self) -> None:
+        """启动forkserver（已在运行时直接返回），等待导入完成"""
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return
+            os.makedirs(self.scratch_dir, exist_ok=True)
+            # 切换用户后的子进程需要进入自己的任务目录，但不能列出其他任务
+            os.chmod(self.scratch_dir, 0o711 if self.drop_privileges else 0o700)
+            started = time.perf_counter()
+            self._process = subprocess.Popen(
+                [sys.executable, RUNNER_PATH, '--fork-server', self.socket_path],
+                stdin=subprocess.DEVNULL,
+                env=sandbox_env(self.scratch_dir),
+                start_new_session=True
+            )
+            deadline = time.monotonic() + settings.SANDBOX_STARTUP_TIMEOUT
+            while True:
+                try:
+                    if self._request({'type': 'ping'}, timeout=5).get('ready'):
+                        break
+                except (OSError, ValueError):
+                    pass
+                if self._process.poll() is not None:
+                    raise RuntimeError(f"沙箱forkserver启动失败，退出码 {self._process.returncode}")
+                if time.monotonic() >= deadline:
+                    self._kill_server()
+                    raise TimeoutError("沙箱forkserver启动超时")
+                time.sleep(0.05)
+            self.startup_seconds = time.perf_counter() - started
+
+    def _request(self, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """发送一个请求；任务请求先收到子进程pid，超时时终止子进程的进程组"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.socket_path)
+            with conn.makefile('rwb') as stream:
+                stream.write(json.dumps(job, ensure_ascii=False).encode('utf-8') + b'\n')
+                stream.flush()
+                line = stream.readline()
+                if not line:
+                    raise ConnectionError("沙箱子进程没有返回结果")
+                reply = json.loads(line)
+                if 'pid' not in reply:
+                    return reply
+                pid = reply['pid']
+                try:
+                    line = stream.readline()
+                except socket.timeout:
+                    _kill_group(pid)
+                    raise TimeoutError(f'超过 {self.timeout} 秒')
+        if not line:
+            # 子进程被资源限制终止（CPU时间、内存）时连接直接关闭
+            return {'success': False, 'error': '沙箱子进程异常退出（可能超过CPU时间或内存限制）'}
+        return json.loads(line)
+
+    def _run_job(self, code: Union[str, List[str]], input_file: str, output_file: str, separator: str,
+                 exchange_file: Optional[str], limit: Optional[int] = None) -> Dict[str, Any]:
+        """在forkserver的子进程中执行一个任务，任务目录在临时目录下"""
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            if not self._slots.acquire(timeout=self.timeout):
+                raise TimeoutError("等待沙箱执行槽位超时")
+        finally:
+            self.waiting -= 1
+        queued = time.perf_counter() - queued_at
+        self.queue_seconds += queued
+        self.max_queue_seconds = max(self.max_queue_seconds, queued)
+        self.running += 1
+        with self._lock:
+            slot = self._free_slots.pop()
+        job_dir = None
+        started = time.perf_counter()
+        try:
+            self.start()
+            job_dir = tempfile.mkdtemp(prefix='job-', dir=self.scratch_dir)
+            input_path = os.path.join(job_dir, stage_input(input_file, job_dir))
+            result_path = os.path.join(job_dir, output_name(output_file))
+            exchange_path = os.path.join(job_dir, EXCHANGE_NAME) if exchange_file else None
+            threads = max(int(math.ceil(self.cpu_limit)), 1)
+            limits = {
+                'cpu_seconds': self.timeout * threads,
+                'memory_bytes': self.memory_bytes,
+                'file_bytes': self.file_bytes,
+                'wall_seconds': self.timeout,
+                'threads': threads,
+                'isolate_network': True
+            }
+            if self.drop_privileges:
+                limits['uid'] = limits['gid'] = settings.SANDBOX_LOCAL_UID + slot
+                _grant_job_dir(job_dir, input_path, input_file, limits['uid'])
+            try:
+                result = self._request({
+                    **self._job_request(code, input_path, result_path, separator, exchange_path, limit),
+                    'workdir': job_dir,
+                    'limits': limits
+                }, timeout=self.timeout)
+            except TimeoutError:
+                self.timeouts += 1
+                raise
+            self.network_isolated = result.get('network_isolated', self.network_isolated)
+            if result.get('success'):
+                shutil.move(result_path, output_file)
+                if exchange_path:
+                    shutil.move(exchange_path, exchange_file)
+                self.completed += 1
+            else:
+                self.failed += 1
+            return self._job_result(result, output_file, exchange_file)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.exec_seconds += elapsed
+            self.max_exec_seconds = max(self.max_exec_seconds, elapsed)
+            self.running -= 1
+            with self._lock:
+                self._free_slots.append(slot)
+            self._slots.release()
+            if job_dir:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            'backend': self.name,
+            'forkserver_pid': self._process.pid if self._process is not None else None,
+            'forkserver_alive': self._process is not None and self._process.poll() is None,
+            'network_isolated': self.network_isolated,
+            'drop_privileges': self.drop_privileges,
+            'max_concurrency': self.max_concurrency,
+            'running': self.running,
+            'waiting': self.waiting,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timeouts': self.timeouts,
+            'avg_queue_ms': round(self.queue_seconds / finished * 1000, 2) if finished else 0.0,
+            'max_queue_ms': round(self.max_queue_seconds * 1000, 2),
+            'avg_exec_ms': round(self.exec_seconds / finished * 1000, 2) if finished else 0.0,
+            'max_exec_ms': round(self.max_exec_seconds * 1000, 2),
+            'startup_ms': round(self.startup_seconds * 1000, 2)
+        }
+
+    def _kill_server(self) -> None:
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+
+    def shutdown(self) -> None:
+        """终止forkserver（正在执行的子进程在各自的进程组中，由墙钟定时器结束）"""
+        with self._lock:
+            self._kill_server()
+            self._process = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+def _interpreter_shared() -> bool:
+    """其他用户能否读取Python标准库和polars（切换用户后子进程还要导入模块）
+
+    Python安装在root的主目录下（如 /root/.pyenv）时不能切换用户，记录警告后以当前用户执行。
+    """
+    spec = importlib.util.find_spec('polars')
+    # 导入路径上的目录（标准库、site-packages）需要可读，上级目录只需要可进入
+    for directory in (os.path.dirname(os.__file__), os.path.dirname(os.path.dirname(spec.origin))):
+        path, required = directory, stat.S_IROTH | stat.S_IXOTH
+        while path != os.path.dirname(path):
+            if os.stat(path).st_mode & required != required:
+                logger.warning(f"其他用户无法访问 {path}，本地进程沙箱不切换用户执行")
+                return False
+            path, required = os.path.dirname(path), stat.S_IXOTH
+    return True
+
+def _grant_job_dir(job_dir: str, input_path: str, source: str, uid: int) -> None:
+    """把任务目录交给子进程的用户；输入是不允许其他用户读取的文件的硬链接时改为复制，不改动原文件的权限"""
+    if not os.stat(input_path).st_mode & stat.S_IROTH:
+        os.remove(input_path)
+        shutil.copyfile(source, input_path)
+        os.chmod(input_path, 0o644)
+    os.chown(job_dir, uid, uid)
+
+def _kill_group(pid: int) -> None:
+    """终止子进程所在的进程组（子进程调用了 setsid，进程组ID与pid相同）"""
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
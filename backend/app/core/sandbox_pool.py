@@ -0,0 +1,363 @@
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 池中容器的标签，服务重启时据此清理上次遗留的容器
+POOL_LABEL = 'dp-agent.sandbox-pool'
+# 运行器在容器内的位置：工作目录挂载到 /sandbox，运行器目录只读挂载到 /runner
+CONTAINER_DIR = '/sandbox'
+RUNNER_DIR = '/runner'
+SOCKET_NAME = 'worker.sock'
+
+class SandboxWorker:
+    """一个预热的沙箱容器：容器内的运行器已导入polars，在工作目录的Unix套接字上等待任务
+
+    工作目录同时挂载在宿主机和容器内，任务的输入输出文件通过该目录交换。
+    运行器为每个任务fork一个子进程，归还时清空工作目录，复用的容器不在任务之间共享状态。
+    """
+
+    def __init__(self, worker_id: str, container: Any, host_dir: str):
+        self.worker_id = worker_id
+        self.container = container
+        self.host_dir = host_dir
+        self.socket_path = os.path.join(host_dir, SOCKET_NAME)
+        self.jobs_done = 0
+        self.failed = False
+        self.created_at = time.time()
+
+    def host_path(self, *parts: str) -> str:
+        return os.path.join(self.host_dir, *parts)
+
+    def container_path(self, *parts: str) -> str:
+        return '/'.join((CONTAINER_DIR,) + parts)
+
+    def call(self, request: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """发送一个请求并等待结果，超时抛出 socket.timeout"""
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.socket_path)
+            with conn.makefile('rwb') as stream:
+                stream.write(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+                stream.flush()
+                line = stream.readline()
+        if not line:
+            raise ConnectionError("沙箱运行器没有返回结果")
+        return json.loads(line)
+
+    def wait_ready(self, timeout: float) -> None:
+        """等待运行器开始监听（容器启动和导入polars的时间）"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self.call({'type': 'ping'}, timeout=max(deadline - time.monotonic(), 0.1)).get('ready'):
+                    return
+            except (OSError, ValueError):
+                pass
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"沙箱容器 {self.worker_id} 启动超时")
+            time.sleep(0.05)
+
+    def reset(self) -> None:
+        """清空工作目录中除套接字外的文件，上一个任务留下的文件不会被下一个任务读到"""
+        for entry in os.scandir(self.host_dir):
+            if entry.name == SOCKET_NAME:
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    shutil.rmtree(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError as e:
+                logger.warning(f"清理沙箱容器 {self.worker_id} 的工作目录失败: {e}")
+                self.failed = True
+
+    def destroy(self) -> None:
+        """强制删除容器（同时终止仍在执行的任务）并清理工作目录"""
+        try:
+            self.container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"删除沙箱容器 {self.worker_id} 失败: {e}")
+        shutil.rmtree(self.host_dir, ignore_errors=True)
+
+class WarmContainerPool:
+    """预热的沙箱容器池
+
+    容器启动后常驻，运行器导入polars后通过Unix套接字逐个执行任务，
+    请求不再承担容器启动和导入的开销。容器禁用网络、根文件系统只读，
+    完成 max_jobs 个任务或超时、连接错误后销毁并补充新容器。
+
+    size 为容器总数上限（同时执行的任务数），空闲容器保持在 [min_warm, max_warm] 之间：
+    低于 min_warm 时在后台补充，归还时超过 max_warm 的容器直接销毁。
+    记录排队等待（获取容器）和执行耗时。
+    """
+
+    def __init__(self, client: Any, image: str, shared_dir: str, size: int = 4,
+                 min_warm: int = 1, max_warm: int = 2, max_jobs: int = 20,
+                 mem_limit: str = '2g', cpu_limit: float = 1.0, startup_timeout: float = 60.0,
+                 container_uid: int = 10001):
+        self.client = client
+        self.image = image
+        self.shared_dir = shared_dir
+        self.size = max(size, 1)
+        self.max_warm = min(max(max_warm, 0), self.size)
+        self.min_warm = min(max(min_warm, 0), self.max_warm)
+        self.max_jobs = max(max_jobs, 1)
+        self.mem_limit = mem_limit
+        self.cpu_limit = cpu_limit
+        self.startup_timeout = startup_timeout
+        self.container_uid = container_uid
+        self.runner_dir = os.path.join(shared_dir, 'runner')
+        self._idle: Deque[SandboxWorker] = deque()
+        self._busy: Dict[str, SandboxWorker] = {}
+        self._starting = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self.started = 0
+        self.recycled = 0
+        self.start_failures = 0
+        self.waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.queue_seconds = 0.0
+        self.max_queue_seconds = 0.0
+        self.exec_seconds = 0.0
+        self.max_exec_seconds = 0.0
+        self.startup_seconds = 0.0
+
+    def start(self) -> None:
+        """准备运行器目录，清理上次遗留的容器，在后台预热 min_warm 个容器"""
+        os.makedirs(self.runner_dir, exist_ok=True)
+        shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_runner.py'),
+                    os.path.join(self.runner_dir, 'sandbox_runner.py'))
+        try:
+            for container in self.client.containers.list(all=True, filters={'label': POOL_LABEL}):
+                container.remove(force=True)
+        except Exception as e:
+            logger.warning(f"清理遗留的沙箱容器失败: {e}")
+        self._replenish()
+
+    def container_user(self) -> str:
+        """容器内运行器的用户：后端以root运行时使用镜像中的sandbox用户及其组，
+        否则主组使用后端的组，通过组权限访问共享目录（后端不能修改目录的属主）"""
+        gid = self.container_uid if os.geteuid() == 0 else os.getgid()
+        return f'{self.container_uid}:{gid}'
+
+    def grant_dir(self, path: str) -> None:
+        """允许容器内的运行器读写共享目录，其他用户不能访问"""
+        if os.geteuid() == 0:
+            os.chown(path, self.container_uid, self.container_uid)
+            os.chmod(path, 0o700)
+        else:
+            os.chmod(path, 0o770)
+
+    def _start_worker(self) -> SandboxWorker:
+        """启动一个容器并等待运行器就绪"""
+        worker_id = uuid.uuid4().hex[:12]
+        host_dir = os.path.join(self.shared_dir, worker_id)
+        os.makedirs(host_dir)
+        # 容器内的用户与后端不同
+        self.grant_dir(host_dir)
+        started = time.perf_counter()
+        container = None
+        try:
+            container = self.client.containers.run(
+                image=self.image,
+                command=['python', '-u', f'{RUNNER_DIR}/sandbox_runner.py',
+                         '--serve', f'{CONTAINER_DIR}/{SOCKET_NAME}', '--scratch', '/tmp'],
+                name=f"dp-sandbox-{worker_id}",
+                labels={POOL_LABEL: '1'},
+                user=self.container_user(),
+                volumes={
+                    host_dir: {'bind': CONTAINER_DIR, 'mode': 'rw'},
+                    self.runner_dir: {'bind': RUNNER_DIR, 'mode': 'ro'}
+                },
+                working_dir=CONTAINER_DIR,
+                mem_limit=self.mem_limit,
+                nano_cpus=int(self.cpu_limit * 1e9),
+                network_mode='none',  # 禁用网络访问
+                read_only=True,       # 只读文件系统
+                tmpfs={'/tmp': 'size=100m'},  # 临时文件系统
+                detach=True
+            )
+            worker = SandboxWorker(worker_id, container, host_dir)
+            worker.wait_ready(self.startup_timeout)
+        except Exception:
+            if container is not None:
+                SandboxWorker(worker_id, container, host_dir).destroy()
+            else:
+                shutil.rmtree(host_dir, ignore_errors=True)
+            raise
+        self.startup_seconds += time.perf_counter() - started
+        self.started += 1
+        return worker
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._busy) + self._starting
+
+    def _replenish(self) -> None:
+        """空闲容器少于 min_warm 时在后台启动新容器"""
+        with self._cond:
+            count = 0
+            while (not self._closed and len(self._idle) + self._starting < self.min_warm
+                   and self._total() < self.size):
+                self._starting += 1
+                count += 1
+        for _ in range(count):
+            threading.Thread(target=self._warm_one, name='sandbox-warm', daemon=True).start()
+
+    def _warm_one(self) -> None:
+        try:
+            worker = self._start_worker()
+        except Exception as e:
+            logger.warning(f"预热沙箱容器失败: {e}")
+            with self._cond:
+                self._starting -= 1
+                self.start_failures += 1
+                self._cond.notify_all()
+            return
+        with self._cond:
+            self._starting -= 1
+            # 启动期间已有容器归还时，空闲数可能已经达到 max_warm
+            surplus = self._closed or len(self._idle) >= self.max_warm
+            if not surplus:
+                self._idle.append(worker)
+                self._cond.notify_all()
+        if surplus:
+            worker.destroy()
+
+    def acquire(self, timeout: Optional[float] = None) -> SandboxWorker:
+        """取得一个空闲容器；没有空闲且未达上限时启动新容器，否则等待归还"""
+        queued_at = time.perf_counter()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("沙箱容器池已关闭")
+                    if self._idle:
+                        worker = self._idle.popleft()
+                        self._busy[worker.worker_id] = worker
+                        break
+                    if self._total() < self.size:
+                        self._starting += 1
+                        worker = None
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise TimeoutError("等待沙箱容器超时")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+        if worker is None:
+            try:
+                worker = self._start_worker()
+            except Exception:
+                with self._cond:
+                    self._starting -= 1
+                    self.start_failures += 1
+                    self._cond.notify_all()
+                raise
+            with self._cond:
+                self._starting -= 1
+                self._busy[worker.worker_id] = worker
+        queued = time.perf_counter() - queued_at
+        self.queue_seconds += queued
+        self.max_queue_seconds = max(self.max_queue_seconds, queued)
+        self._replenish()
+        return worker
+
+    def release(self, worker: SandboxWorker, healthy: bool = True) -> None:
+        """归还容器：失败、超时或达到任务数上限的容器销毁，空闲数超过 max_warm 时也销毁"""
+        worker.jobs_done += 1
+        if healthy and not worker.failed and worker.jobs_done < self.max_jobs:
+            worker.reset()
+        healthy = healthy and not worker.failed
+        with self._cond:
+            self._busy.pop(worker.worker_id, None)
+            keep = (healthy and not self._closed and worker.jobs_done < self.max_jobs
+                    and len(self._idle) < self.max_warm)
+            if keep:
+                self._idle.append(worker)
+            self._cond.notify_all()
+        if not keep:
+            if not healthy or worker.jobs_done >= self.max_jobs:
+                self.recycled += 1
+            worker.destroy()
+            self._replenish()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[SandboxWorker]:
+        """在上下文中使用一个容器，出现异常时按失败归还"""
+        worker = self.acquire(timeout)
+        healthy = False
+        try:
+            yield worker
+            healthy = True
+        finally:
+            self.release(worker, healthy)
+
+    def run(self, worker: SandboxWorker, job: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """在容器中执行一个任务并记录执行耗时；超时或连接错误的容器在归还时销毁"""
+        started = time.perf_counter()
+        try:
+            result = worker.call(job, timeout)
+        except Exception:
+            worker.failed = True
+            self.failed += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.exec_seconds += elapsed
+            self.max_exec_seconds = max(self.max_exec_seconds, elapsed)
+        if not result.get('success'):
+            # 每个任务在单独的子进程中执行，用户代码出错不影响容器的复用
+            self.failed += 1
+        else:
+            self.completed += 1
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """容器数量、回收次数以及排队等待和执行耗时"""
+        finished = self.completed + self.failed
+        return {
+            'image': self.image,
+            'size': self.size,
+            'min_warm': self.min_warm,
+            'max_warm': self.max_warm,
+            'max_jobs': self.max_jobs,
+            'idle': len(self._idle),
+            'busy': len(self._busy),
+            'starting': self._starting,
+            'waiting': self.waiting,
+            'started': self.started,
+            'recycled': self.recycled,
+            'start_failures': self.start_failures,
+            'completed': self.completed,
+            'failed': self.failed,
+            'avg_queue_ms': round(self.queue_seconds / finished * 1000, 2) if finished else 0.0,
+            'max_queue_ms': round(self.max_queue_seconds * 1000, 2),
+            'avg_exec_ms': round(self.exec_seconds / finished * 1000, 2) if finished else 0.0,
+            'max_exec_ms': round(self.max_exec_seconds * 1000, 2),
+            'avg_startup_ms': round(self.startup_seconds / self.started * 1000, 2) if self.started else 0.0
+        }
+
+    def shutdown(self) -> None:
+        """销毁所有容器（执行中的容器归还时销毁）"""
+        with self._cond:
+            self._closed = True
+            workers: List[SandboxWorker] = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for worker in workers:
+            worker.destroy()
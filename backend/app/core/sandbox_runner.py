@@ -0,0 +1,404 @@
+"""沙箱运行器：启动时导入polars，之后逐个执行数据处理任务
+
+只依赖标准库和polars（不导入 app 包，镜像中单独复制此文件）。
+任务通过Unix套接字传入：每个连接一行JSON请求，返回一行JSON结果。两种运行方式：
+
+    # 在沙箱容器中常驻：预先fork一个预热的子进程执行下一个任务，任务之间不共享解释器状态，
+    # 每个任务结束后清空 --scratch 指定的目录
+    python sandbox_runner.py --serve /sandbox/worker.sock --scratch /tmp
+    # 本地进程沙箱的forkserver：每个任务fork一个子进程，子进程设置资源限制后执行，
+    # 先返回一行 {"pid": ...}（超时时由后端终止），再返回结果
+    python sandbox_runner.py --fork-server /tmp/dp-sandbox/local/forkserver.sock
+
+请求: {"code": "...", "input_path": "...", "output_path": "...", "separator": ",",
+       "exchange_path": "...", "preview_rows": 20}
+      输入输出格式由扩展名决定；.arrow 为未压缩的Arrow IPC文件（按内存映射读取），
+      exchange_path 指定时另外写一份Arrow副本。结果中的 manifest 描述输出
+      （行数、schema、空值数、列统计、预览行），后端不需要重新打开输出文件
+      forkserver的请求另有 "workdir" 和 "limits"（cpu_seconds、memory_bytes、file_bytes、
+      wall_seconds、threads、isolate_network，以及子进程切换到的 uid、gid）
+      {"type": "ping"} 用于检查运行器是否就绪
+
+流水线任务用 "steps": ["...", ...] 代替 "code"：输入按惰性扫描读取，各步骤依次以上一步的
+LazyFrame 作为 df 执行，组合为一个查询计划（谓词/投影下推、公共子计划消除），最后一次流式执行。
+需要具体数据的步骤（如 df['col'].quantile）在该处先计算出结果（记为计划的断点）再执行。
+"limit" 指定时只计算结果的前几行，用于校验步骤并生成预览。
+"""
+import argparse
+import ctypes
+import json
+import math
+import os
+import resource
+import shutil
+import signal
+import socket
+import sys
+import time
+import traceback
+
+import polars as pl
+
+try:
+    # 沙箱镜像中预装pyarrow，启动时一并导入（to_pandas、to_arrow等转换会用到）
+    import pyarrow  # noqa: F401
+except ImportError:
+    pass
+
+ARROW_EXTENSIONS = ('.arrow', '.ipc', '.feather')
+
+def load_input(path: str, separator: str = ',') -> pl.DataFrame:
+    """读取输入数据；未压缩的Arrow IPC文件按内存映射读取，保留原有的数据类型"""
+    if path.endswith(ARROW_EXTENSIONS):
+        return pl.read_ipc(path)
+    if path.endswith('.parquet'):
+        return pl.read_parquet(path)
+    if path.endswith(('.csv', '.tsv')):
+        return pl.read_csv(path, separator=separator, encoding='utf8')
+    if path.endswith(('.xlsx', '.xls')):
+        return pl.read_excel(path)
+    raise ValueError("不支持的文件格式")
+
+def scan_input(path: str, separator: str = ',') -> pl.LazyFrame:
+    """按惰性扫描读取输入，过滤条件和所需的列下推到扫描"""
+    if path.endswith(ARROW_EXTENSIONS):
+        return pl.scan_ipc(path)
+    if path.endswith('.parquet'):
+        return pl.scan_parquet(path)
+    if path.endswith(('.csv', '.tsv')):
+        return pl.scan_csv(path, separator=separator, encoding='utf8')
+    return load_input(path, separator).lazy()
+
+def write_output(df: pl.DataFrame, path: str) -> None:
+    """保存结果，Parquet输出与接入快照保持同样的压缩方式，Arrow输出不压缩以便内存映射"""
+    if path.endswith(ARROW_EXTENSIONS):
+        df.write_ipc(path, compression='uncompressed')
+    elif path.endswith('.parquet'):
+        df.write_parquet(path, compression='zstd')
+    else:
+        df.write_csv(path)
+
+def sink_output(lf: pl.LazyFrame, path: str) -> None:
+    """流式执行查询计划并直接写入文件，结果不在内存中物化"""
+    if path.endswith(ARROW_EXTENSIONS):
+        lf.sink_ipc(path, compression='uncompressed')
+    elif path.endswith('.parquet'):
+        lf.sink_parquet(path, compression='zstd')
+    else:
+        lf.sink_csv(path)
+
+def build_manifest(data, preview_rows: int, memory_usage: int = None) -> dict:
+    """结果清单：与版本元信息相同的字段，另有各列的最小值、最大值、均值和预览行
+
+    data 可以是DataFrame，也可以是已写出文件的惰性扫描（统计在一次查询中算出）；
+    后者没有内存中的大小，由调用方传入 memory_usage。
+    """
+    lf = data.lazy()
+    schema = lf.collect_schema()
+    orderable = [col for col, dtype in schema.items()
+                 if dtype.is_numeric() or dtype.is_temporal() or dtype == pl.String or dtype == pl.Boolean]
+    numeric = [col for col, dtype in schema.items() if dtype.is_numeric()]
+    aggregates = lf.select(
+        [pl.len().alias('rows')]
+        + [pl.col(col).null_count().alias(f'null_count:{col}') for col in schema]
+        + [pl.col(col).min().alias(f'min:{col}') for col in orderable]
+        + [pl.col(col).max().alias(f'max:{col}') for col in orderable]
+        + [pl.col(col).mean().alias(f'mean:{col}') for col in numeric]
+    ).collect().row(0, named=True)
+    rows = aggregates.pop('rows')
+    column_stats = {col: {} for col in schema}
+    null_counts = {}
+    for key, value in aggregates.items():
+        stat, col = key.split(':', 1)
+        if stat == 'null_count':
+            null_counts[col] = value
+        elif rows:
+            column_stats[col][stat] = value
+    for col, count in null_counts.items():
+        column_stats[col]['null_count'] = count
+    if memory_usage is None:
+        memory_usage = data.estimated_size()
+    return {
+        'rows': rows,
+        'columns': len(schema),
+        'column_names': schema.names(),
+        'dtypes': {col: str(dtype) for col, dtype in schema.items()},
+        'null_counts': null_counts,
+        'memory_usage': int(memory_usage),
+        'column_stats': column_stats,
+        'preview': lf.head(preview_rows).collect().to_dicts()
+    }
+
+def execute(code: str, df):
+    """在独立的命名空间中执行生成的代码（不保留上一个任务的变量），返回 result_df"""
+    namespace = {'pl': pl, 'df': df}
+    exec(compile(code, '<generated>', 'exec'), namespace)
+    result_df = namespace.get('result_df')
+    if not isinstance(result_df, (pl.DataFrame, pl.LazyFrame)):
+        raise ValueError("代码没有生成 result_df")
+    return result_df
+
+def run_pipeline(steps: list, lf: pl.LazyFrame, limit: int = None):
+    """把各步骤组合为一个查询计划，返回最终的 LazyFrame 和计划信息（由调用方流式执行）"""
+    breakers = []
+    for index, code in enumerate(steps):
+        try:
+            result = execute(code, lf)
+        except (AttributeError, TypeError):
+            # 步骤用到了只有DataFrame才支持的操作，先计算出到这一步的结果；其他错误直接报告
+            breakers.append(index)
+            result = execute(code, lf.collect(engine='streaming'))
+        lf = result.lazy() if isinstance(result, pl.DataFrame) else result
+    if limit is not None:
+        lf = lf.head(limit)
+    plan = lf.explain()
+    return lf, {
+        'steps': len(steps),
+        'breakers': breakers,
+        'partial': limit is not None,
+        'plan': plan if len(plan) <= 4000 else plan[:4000] + '\n...'
+    }
+
+def run_job(job: dict) -> dict:
+    """执行一个任务：读取输入为 df，执行生成的代码（或流水线的各步骤），保存 result_df 并返回统计信息
+
+    流水线任务没有断点、也不限制行数时，查询计划直接流式写入输出文件（sink），
+    Arrow副本和清单再从输出文件扫描得到，整个结果不在内存中物化。
+    """
+    started = time.perf_counter()
+    try:
+        pipeline = None
+        preview_rows = job.get('preview_rows', 20)
+        exchange_path = job.get('exchange_path')
+        if 'steps' in job:
+            result_df, pipeline = run_pipeline(
+                job['steps'], scan_input(job['input_path'], job.get('separator', ',')), job.get('limit')
+            )
+            if not pipeline['breakers'] and not pipeline['partial']:
+                sink_output(result_df, job['output_path'])
+                output = scan_input(job['output_path'])
+                if exchange_path:
+                    sink_output(output, exchange_path)
+                # 未压缩的Arrow文件大小接近内存中的大小
+                manifest = build_manifest(
+                    output, preview_rows, os.path.getsize(exchange_path or job['output_path'])
+                )
+            else:
+                result_df = result_df.collect(engine='streaming')
+        else:
+            result_df = execute(job['code'], load_input(job['input_path'], job.get('separator', ',')))
+            if isinstance(result_df, pl.LazyFrame):
+                result_df = result_df.collect()
+        if isinstance(result_df, pl.DataFrame):
+            write_output(result_df, job['output_path'])
+            if exchange_path:
+                write_output(result_df, exchange_path)
+            manifest = build_manifest(result_df, preview_rows)
+        result = {
+            'success': True,
+            'stats': {
+                'rows': manifest['rows'],
+                'columns': manifest['columns'],
+                'columns_list': manifest['column_names'],
+                'dtypes': manifest['dtypes'],
+                'rows_affected': manifest['rows']
+            },
+            'manifest': manifest,
+            'elapsed': round(time.perf_counter() - started, 6)
+        }
+        if pipeline is not None:
+            result['pipeline'] = pipeline
+        return result
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e) or type(e).__name__,
+            'traceback': traceback.format_exc(),
+            'elapsed': round(time.perf_counter() - started, 6)
+        }
+
+def warm_up() -> None:
+    """执行一次小查询，让polars在第一个任务之前初始化线程池和表达式引擎"""
+    pl.DataFrame({'x': [1, 2]}).lazy().filter(pl.col('x') > 1).select(pl.col('x').sum()).collect()
+
+def serve_one(server: socket.socket) -> None:
+    """serve的子进程：预热后处理一个连接"""
+    sys.setrecursionlimit(1000)
+    warm_up()
+    conn, _ = server.accept()
+    with conn, conn.makefile('rwb') as stream:
+        line = stream.readline()
+        if not line:
+            return
+        job = json.loads(line)
+        result = {'ready': True} if job.get('type') == 'ping' else run_job(job)
+        stream.write(json.dumps(result, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+        stream.flush()
+
+def clear_dir(path: str) -> None:
+    """删除目录下的所有文件和子目录（保留目录本身）"""
+    for entry in os.scandir(path):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+def serve(socket_path: str, scratch_dir: str = None) -> None:
+    """在Unix套接字上逐个处理任务，每个连接由一个新fork的子进程处理
+
+    父进程只导入依赖、不执行查询（polars线程池未创建，fork是安全的）。子进程fork后先预热，
+    再等待下一个连接，处理完即退出：不同项目的任务不共享 sys.modules、对pl的改动和全局变量；
+    子进程退出后清空 scratch_dir（容器内的 /tmp），再fork下一个子进程。
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    # 宿主机上的后端进程可能使用不同的用户
+    os.chmod(socket_path, 0o666)
+    server.listen(1)
+    while True:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                serve_one(server)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        os.waitpid(pid, 0)
+        if scratch_dir:
+            clear_dir(scratch_dir)
+
+# unshare 的标志（linux/sched.h）
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+
+def isolate_network() -> bool:
+    """进入新的网络命名空间（只有回环接口且未启用），不支持时返回False
+
+    有权限（root）时直接创建网络命名空间，否则先创建用户命名空间并映射当前用户。
+    """
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+    except OSError:
+        return False
+    if libc.unshare(CLONE_NEWNET) == 0:
+        return True
+    uid, gid = os.getuid(), os.getgid()
+    if libc.unshare(CLONE_NEWUSER | CLONE_NEWNET) != 0:
+        return False
+    try:
+        # 映射为原来的用户，否则新建文件会失败
+        with open('/proc/self/setgroups', 'w') as f:
+            f.write('deny')
+        with open('/proc/self/uid_map', 'w') as f:
+            f.write(f'{uid} {uid} 1')
+        with open('/proc/self/gid_map', 'w') as f:
+            f.write(f'{gid} {gid} 1')
+    except OSError:
+        pass
+    return True
+
+def apply_limits(limits: dict) -> None:
+    """设置子进程的资源限制：CPU时间、地址空间、写入文件大小，以及墙钟时间的兜底定时器"""
+    for name, key in ((resource.RLIMIT_CPU, 'cpu_seconds'),
+                      (resource.RLIMIT_AS, 'memory_bytes'),
+                      (resource.RLIMIT_FSIZE, 'file_bytes')):
+        value = limits.get(key)
+        if value:
+            value = int(math.ceil(value))
+            resource.setrlimit(name, (value, value))
+    if limits.get('wall_seconds'):
+        # 后端超时会先终止进程组，后端异常退出时由定时器结束子进程
+        signal.alarm(int(math.ceil(limits['wall_seconds'])) + 1)
+    if limits.get('threads'):
+        # polars线程池在子进程第一次计算时才创建
+        os.environ['POLARS_MAX_THREADS'] = str(limits['threads'])
+
+def drop_privileges(uid: int, gid: int) -> None:
+    """切换到指定的用户和组（清空附加组），之后无法再提升资源限制或访问后端的文件"""
+    os.setgroups([])
+    os.setgid(gid)
+    os.setuid(uid)
+
+def run_forked(conn: socket.socket) -> None:
+    """forkserver子进程：隔离并限制资源后执行一个任务"""
+    with conn, conn.makefile('rwb') as stream:
+        line = stream.readline()
+        if not line:
+            return
+        job = json.loads(line)
+        if job.get('type') == 'ping':
+            stream.write(b'{"ready": true}\n')
+            stream.flush()
+            return
+        # 新的会话：超时时后端终止整个进程组，包括生成代码启动的子进程
+        os.setsid()
+        stream.write(json.dumps({'pid': os.getpid()}).encode('utf-8') + b'\n')
+        stream.flush()
+        limits = job.get('limits', {})
+        network_isolated = isolate_network() if limits.get('isolate_network', True) else False
+        apply_limits(limits)
+        # 网络命名空间和资源限制需要在root权限下设置，最后再切换用户
+        if limits.get('uid') is not None:
+            drop_privileges(limits['uid'], limits.get('gid', limits['uid']))
+        if job.get('workdir'):
+            os.chdir(job['workdir'])
+            os.environ['HOME'] = os.environ['TMPDIR'] = job['workdir']
+        result = run_job(job)
+        result['network_isolated'] = network_isolated
+        stream.write(json.dumps(result, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+        stream.flush()
+
+def fork_server(socket_path: str) -> None:
+    """forkserver：只导入依赖，不执行查询（polars线程池未创建，fork是安全的），每个连接fork一个子进程"""
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(64)
+    # 定期检查后端进程是否还在，后端异常退出后forkserver随之退出
+    server.settimeout(1.0)
+    parent = os.getppid()
+    # 子进程退出后自动回收
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while os.getppid() == parent:
+        try:
+            conn, _ = server.accept()
+        except socket.timeout:
+            continue
+        conn.settimeout(None)
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                sys.setrecursionlimit(1000)
+                run_forked(conn)
+            except BaseException:
+                code = 1
+            finally:
+                os._exit(code)
+        conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="沙箱运行器")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--serve', metavar='SOCKET', help='在本进程中逐个执行任务')
+    mode.add_argument('--fork-server', metavar='SOCKET', help='每个任务fork一个受限的子进程执行')
+    parser.add_argument('--scratch', metavar='DIR', help='--serve 模式下每个任务结束后清空的临时目录')
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.scratch)
+    else:
+        fork_server(args.fork_server)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+import threading
+from typing import Any, Callable, Dict
+import logging
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """应用级共享客户端：在服务启动时创建，整个进程复用，关闭时释放
+
+    MinIO客户端（连接池）、智能体编排器、沙箱执行后端和数据探查器都是线程安全的，
+    不再在每个请求中重新创建（每次新建连接池、每次与Docker守护进程握手）。
+    各客户端在首次使用时创建；沙箱后端创建失败（如Docker不可用）时只有用到沙箱的请求失败。
+    """
+
+    def __init__(self):
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory: Callable[[], Any]) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    @property
+    def minio(self):
+        """共享的MinIO客户端，连接池大小与I/O执行池线程数一致"""
+        from .minio_client import MinIOClient
+        return self._get('minio', lambda: MinIOClient(pool_size=settings.MINIO_POOL_SIZE))
+
+    @property
+    def agent(self):
+        """共享的智能体编排器（异步客户端绑定在服务的事件循环上）"""
+        from .agent_orchestrator import AgentOrchestrator
+        return self._get('agent', lambda: AgentOrchestrator(api_key=settings.OPENAI_API_KEY))
+
+    @property
+    def sandbox(self):
+        """共享的沙箱执行后端（按 SANDBOX_BACKEND 创建，Docker后端创建时开始预热容器池）"""
+        from .sandbox_backend import create_sandbox
+        return self._get('sandbox', create_sandbox)
+
+    @property
+    def profiler(self):
+        """共享的数据探查器"""
+        from ..services.data_profiler import DataProfiler
+        return self._get('profiler', DataProfiler)
+
+    def startup(self) -> None:
+        """服务启动时预先创建客户端，失败的（如Docker不可用）留到首次使用时再试"""
+        for name in ('minio', 'profiler', 'sandbox'):
+            try:
+                getattr(self, name)
+            except Exception as e:
+                logger.warning(f"初始化 {name} 失败: {e}")
+
+    def shutdown(self) -> None:
+        """释放连接"""
+        with self._lock:
+            instances, self._instances = self._instances, {}
+        minio_client = instances.get('minio')
+        if minio_client is not None:
+            minio_client.client._http.clear()
+        sandbox = instances.get('sandbox')
+        if sandbox is not None:
+            sandbox.shutdown()
+
+    def loaded(self) -> Dict[str, bool]:
+        """各客户端是否已创建"""
+        return {name: name in self._instances for name in ('minio', 'agent', 'sandbox', 'profiler')}
+
+# 全局共享客户端
+services = ServiceContainer()
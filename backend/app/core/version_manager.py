@@ -2,15 +2,44 @@ import os
 import json
 import hashlib
 import shutil
+import tempfile
+import threading
 from datetime import datetime
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from sqlalchemy.orm import Session as DBSession
 from sqlalchemy import desc
 import polars as pl
 from pathlib import Path
 
 from ..models.data_version import DataVersion, Project
+from ..core.config import settings
 from ..core.minio_client import MinIOClient
+from ..core.parquet_reader import ParquetObjectReader
+from ..core.parquet_index import row_group_index_cache
+from ..core.sandbox_exchange import arrow_exchange
+from ..core.services import services
+from ..services.file_ingest import scan_data
+from ..services.data_profiler import DTYPE_WIDTHS
+from ..services.profile_cache import ProfileCache, profile_cache
+
+# 同一排序视图（或逻辑版本的快照）只生成一次，并发请求等待先到的请求
+_view_locks: Dict[str, threading.Lock] = {}
+_view_locks_guard = threading.Lock()
+
+def _view_lock(view_name: str) -> threading.Lock:
+    with _view_locks_guard:
+        return _view_locks.setdefault(view_name, threading.Lock())
+
+def parse_sort(sort: Optional[str]) -> List[Tuple[str, bool]]:
+    """解析排序参数 "col1,-col2"：前缀 - 表示降序"""
+    if not sort:
+        return []
+    keys = []
+    for item in sort.split(','):
+        item = item.strip()
+        if item:
+            keys.append((item[1:], True) if item.startswith('-') else (item, False))
+    return keys
 
 class VersionManager:
     """数据版本管理器，实现Git-like版本控制"""
@@ -19,6 +48,7 @@ class VersionManager:
         self.db = db_session
         self.minio = minio_client
         self.bucket_name = "data-versions"
+        self.reader = ParquetObjectReader(minio_client)
         
     def create_project(self, name: str, description: str = "") -> Project:
         """创建新项目"""
@@ -28,8 +58,18 @@ class VersionManager:
         return project
     
     def create_version(self, project_id: str, message: str, code: str, 
-                      data_path: str, author: str = "system") -> DataVersion:
-        """创建新版本"""
+                      data_path: str, author: str = "system",
+                      manifest: Optional[Dict[str, Any]] = None,
+                      source_object: Optional[Tuple[str, str]] = None,
+                      metadata: Optional[Dict[str, Any]] = None) -> DataVersion:
+        """创建新版本
+
+        manifest 为上传接入阶段生成的清单（编码、分隔符、schema），
+        读取元信息时直接使用并随版本元信息保存。
+        source_object 为已上传到对象存储的同一内容 (bucket, object)，
+        提供时在服务端复制为快照，不再从本地重新上传。
+        metadata 为已知的数据元信息（如沙箱返回的结果清单），提供时不再重新扫描数据文件。
+        """
         
         # 生成版本ID（Git-like hash）
         version_data = f"{project_id}{message}{code}{datetime.utcnow().isoformat()}"
@@ -37,10 +77,24 @@ class VersionManager:
         
         # 上传数据快照到MinIO
         snapshot_path = f"{project_id}/{version_id}/data.parquet"
-        self.minio.upload_file(data_path, self.bucket_name, snapshot_path)
+        if source_object:
+            self.minio.copy_object(*source_object, self.bucket_name, snapshot_path)
+        elif data_path.endswith('.parquet'):
+            self.minio.upload_file(data_path, self.bucket_name, snapshot_path)
+        else:
+            # 快照统一为zstd压缩的Parquet，下游读取不再解析文本
+            with tempfile.TemporaryDirectory() as temp_dir:
+                parquet_path = os.path.join(temp_dir, 'data.parquet')
+                scan_data(data_path, manifest).sink_parquet(
+                    parquet_path, compression='zstd', statistics=True,
+                    row_group_size=settings.INGEST_ROW_GROUP_SIZE
+                )
+                self.minio.upload_file(parquet_path, self.bucket_name, snapshot_path)
         
         # 获取数据元信息
-        metadata = self._get_data_metadata(data_path)
+        metadata = dict(metadata) if metadata else self._get_data_metadata(data_path, manifest)
+        if manifest:
+            metadata['ingest'] = manifest
         
         # 创建版本记录
         version = DataVersion(
@@ -49,7 +103,7 @@ class VersionManager:
             message=message,
             code=code,
             data_snapshot_path=snapshot_path,
-            metadata=metadata,
+            meta_info=metadata,
             author=author
         )
         
@@ -57,6 +111,99 @@ class VersionManager:
         self.db.commit()
         return version
     
+    def create_pipeline_version(self, project_id: str, message: str, code: str,
+                                parent: DataVersion, author: str = "system",
+                                metadata: Optional[Dict[str, Any]] = None) -> DataVersion:
+        """创建逻辑版本：在 parent 的查询计划后追加一步，不计算也不上传快照
+
+        逻辑版本记录最近的已物化祖先（base）和从它开始的全部步骤，即一个可单独物化的计划节点；
+        快照路径预先确定，首次读取时物化（见 materialize）。
+        metadata 为预览执行得到的元信息（列名、类型），行数等统计在物化后补齐。
+        """
+        pipeline = self.pipeline_of(parent)
+        if pipeline:
+            base_id, steps = pipeline['base'], pipeline['steps'] + [code]
+        else:
+            base_id, steps = parent.id, [code]
+        
+        version_data = f"{project_id}{message}{code}{datetime.utcnow().isoformat()}"
+        version_id = hashlib.sha1(version_data.encode()).hexdigest()[:10]
+        version = DataVersion(
+            id=version_id,
+            project_id=project_id,
+            parent_id=parent.id,
+            message=message,
+            code=code,
+            data_snapshot_path=f"{project_id}/{version_id}/data.parquet",
+            meta_info={**(metadata or {}), 'pipeline': {'base': base_id, 'steps': steps, 'materialized': False}},
+            author=author
+        )
+        
+        self.db.add(version)
+        self.db.commit()
+        return version
+    
+    @staticmethod
+    def pipeline_of(version: DataVersion) -> Optional[Dict[str, Any]]:
+        """未物化的逻辑版本的计划（base 和 steps），已物化的版本返回None"""
+        return VersionManager.pipeline_of_meta(version.meta_info)
+    
+    @staticmethod
+    def pipeline_of_meta(meta_info: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """按版本元信息判断，见 pipeline_of"""
+        pipeline = (meta_info or {}).get('pipeline')
+        if pipeline and not pipeline.get('materialized'):
+            return pipeline
+        return None
+    
+    def materialize(self, version: DataVersion) -> DataVersion:
+        """在沙箱中把逻辑版本的全部步骤作为一个计划流式执行，上传快照并补齐元信息
+
+        输入为 base 版本在交换目录中的Arrow文件，结果的Arrow副本放入交换目录，
+        之后在该版本上继续的计划可直接读取。同一版本只物化一次，并发请求等待先到的请求。
+        """
+        if not self.pipeline_of(version):
+            return version
+        with _view_lock(version.data_snapshot_path):
+            self.db.refresh(version)
+            pipeline = self.pipeline_of(version)
+            if not pipeline:
+                return version
+            
+            base_id = pipeline['base']
+            exchange_file = arrow_exchange.pending_path()
+            try:
+                # 沙箱运行结束前输入文件不会被淘汰
+                with arrow_exchange.using(base_id, lambda path: self.export_arrow(base_id, path)) as input_file, \
+                        tempfile.TemporaryDirectory() as temp_dir:
+                    output_path = os.path.join(temp_dir, 'data.parquet')
+                    result = services.sandbox.run(pipeline['steps'], input_file, output_path,
+                                                  exchange_file=exchange_file)
+                    if not result['success']:
+                        raise RuntimeError(f"版本 {version.id} 物化失败: {result['error']}")
+                    if not self.minio.upload_file(output_path, self.bucket_name, version.data_snapshot_path):
+                        raise IOError("版本快照上传失败")
+                arrow_exchange.put(version.id, exchange_file)
+            finally:
+                arrow_exchange.discard(exchange_file)
+            
+            plan = result.get('pipeline') or {}
+            version.meta_info = {
+                **result['manifest'],
+                'pipeline': {
+                    **pipeline,
+                    'materialized': True,
+                    'breakers': plan.get('breakers', []),
+                    'plan': plan.get('plan')
+                }
+            }
+            self.db.commit()
+        return version
+    
+    def snapshot_path(self, version: DataVersion) -> str:
+        """版本快照的对象路径，逻辑版本先物化"""
+        return self.materialize(version).data_snapshot_path
+    
     def checkout_version(self, version_id: str, output_path: str) -> bool:
         """检出指定版本"""
         version = self.db.query(DataVersion).filter_by(id=version_id).first()
@@ -66,12 +213,20 @@ class VersionManager:
         # 从MinIO下载数据快照
         success = self.minio.download_file(
             self.bucket_name, 
-            version.data_snapshot_path, 
+            self.snapshot_path(version), 
             output_path
         )
         
         return success
     
+    def export_arrow(self, version_id: str, output_path: str) -> None:
+        """把版本快照转换为未压缩的Arrow IPC文件（沙箱输入，按内存映射读取）"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            parquet_path = os.path.join(temp_dir, 'data.parquet')
+            if not self.checkout_version(version_id, parquet_path):
+                raise FileNotFoundError(f"版本快照不存在: {version_id}")
+            pl.scan_parquet(parquet_path).sink_ipc(output_path, compression='uncompressed')
+    
     def get_version_history(self, project_id: str) -> List[Dict[str, Any]]:
         """获取项目版本历史"""
         versions = self.db.query(DataVersion).filter_by(
@@ -85,14 +240,36 @@ class VersionManager:
                 'message': version.message,
                 'author': version.author,
                 'created_at': version.created_at.isoformat(),
-                'metadata': version.metadata,
+                'metadata': version.meta_info,
                 'code': version.code[:200] + '...' if len(version.code) > 200 else version.code
             })
         
         return history
     
+    def get_version(self, version_id: str) -> Optional[DataVersion]:
+        """按ID查找版本"""
+        return self.db.query(DataVersion).filter_by(id=version_id).first()
+    
+    def history_state(self, project_id: str) -> List[str]:
+        """项目各版本的ID和物化状态（按创建时间），用于生成版本历史的ETag
+
+        版本历史在新增、删除版本或逻辑版本物化（元信息被补齐）时变化。
+        """
+        rows = self.db.query(DataVersion.id, DataVersion.meta_info).filter_by(
+            project_id=project_id
+        ).order_by(DataVersion.created_at).all()
+        return [f"{version_id}:{'logical' if self.pipeline_of_meta(meta_info) else 'stored'}"
+                for version_id, meta_info in rows]
+    
     def compare_versions(self, version1_id: str, version2_id: str) -> Dict[str, Any]:
-        """比较两个版本的差异"""
+        """比较两个版本的差异
+
+        版本写入后不再变化，差异结果按版本对缓存（与探查结果共用缓存）。
+        """
+        cache_key = ProfileCache.make_key(f"diff:{version1_id}:{version2_id}")
+        cached_diff = profile_cache.get(cache_key)
+        if cached_diff is not None:
+            return cached_diff
         
         # 获取版本信息
         v1 = self.db.query(DataVersion).filter_by(id=version1_id).first()
@@ -101,33 +278,116 @@ class VersionManager:
         if not v1 or not v2:
             return {'error': '版本不存在'}
         
-        # 下载两个版本的数据
-        with tempfile.NamedTemporaryFile(suffix='.parquet') as f1, \
-             tempfile.NamedTemporaryFile(suffix='.parquet') as f2:
-            
-            self.checkout_version(version1_id, f1.name)
-            self.checkout_version(version2_id, f2.name)
-            
-            # 加载数据
-            df1 = pl.read_parquet(f1.name)
-            df2 = pl.read_parquet(f2.name)
-            
-            # 计算差异
-            diff = self._calculate_data_diff(df1, df2)
-            
-            return {
-                'version1': {
-                    'id': v1.id,
-                    'message': v1.message,
-                    'metadata': v1.metadata
-                },
-                'version2': {
-                    'id': v2.id,
-                    'message': v2.message,
-                    'metadata': v2.metadata
-                },
-                'diff': diff
-            }
+        # 按范围读取两个版本的快照，schema和行数只读元数据，比较时只读取共同列
+        lf1 = self.reader.scan(self.bucket_name, self.snapshot_path(v1))
+        lf2 = self.reader.scan(self.bucket_name, self.snapshot_path(v2))
+        
+        # 计算差异
+        diff = self._calculate_data_diff(lf1, lf2)
+        
+        result = {
+            'version1': {
+                'id': v1.id,
+                'message': v1.message,
+                'metadata': v1.meta_info
+            },
+            'version2': {
+                'id': v2.id,
+                'message': v2.message,
+                'metadata': v2.meta_info
+            },
+            'diff': diff
+        }
+        if 'error' not in diff:
+            profile_cache.put(cache_key, result)
+        return result
+    
+    def read_version(self, version_id: str, columns: Optional[List[str]] = None,
+                     offset: int = 0, limit: Optional[int] = None) -> Optional[pl.DataFrame]:
+        """按范围读取版本快照中指定列的一段行，不下载整个快照"""
+        version = self.db.query(DataVersion).filter_by(id=version_id).first()
+        if not version:
+            return None
+        return self.reader.read(self.bucket_name, self.snapshot_path(version),
+                                columns=columns, offset=offset, limit=limit)
+    
+    def read_rows(self, version_id: str, offset: int = 0, limit: int = 100,
+                  columns: Optional[List[str]] = None,
+                  sort_by: Optional[List[Tuple[str, bool]]] = None) -> Optional[Dict[str, Any]]:
+        """随机访问版本快照的一页行
+
+        用快照的行组偏移索引找到覆盖 [offset, offset+limit) 的行组，只读取这些行组中的所需列。
+        指定 sort_by 时读取排序视图：首次请求把快照排序后写成新的Parquet对象，之后的分页直接复用。
+        """
+        version = self.db.query(DataVersion).filter_by(id=version_id).first()
+        if not version:
+            return None
+        object_name = self._sorted_view(version, sort_by) if sort_by else self.snapshot_path(version)
+        index = row_group_index_cache.get(self.minio, self.bucket_name, object_name)
+        
+        first, last = index.covering(offset, limit)
+        if first < 0:
+            df = self.reader.read(self.bucket_name, object_name, columns=columns, limit=0)
+            groups = []
+        else:
+            groups = index.row_groups[first:last + 1]
+            start = groups[0]['start']
+            end = groups[-1]['start'] + groups[-1]['rows']
+            df = self.reader.read(self.bucket_name, object_name, columns=columns,
+                                  offset=start, limit=end - start).slice(offset - start, limit)
+        return {
+            'data': df,
+            'total_rows': index.rows,
+            'row_groups': {
+                'first': first if groups else None,
+                'last': last if groups else None,
+                'count': len(index.row_groups),
+                'bytes': sum(group['bytes'] for group in groups)
+            },
+            'object': object_name
+        }
+    
+    def _sorted_view(self, version: DataVersion, sort_by: List[Tuple[str, bool]]) -> str:
+        """返回快照按 sort_by 排序后的视图对象，不存在时生成
+
+        视图与快照放在同一目录下（views/），以排序条件的哈希命名，共享同一快照的分支版本复用同一视图。
+        """
+        spec = ','.join(('-' if descending else '') + col for col, descending in sort_by)
+        snapshot_path = self.snapshot_path(version)
+        view_name = (f"{os.path.dirname(snapshot_path)}/views/"
+                     f"{hashlib.sha1(spec.encode()).hexdigest()[:12]}.parquet")
+        try:
+            row_group_index_cache.get(self.minio, self.bucket_name, view_name)
+            return view_name
+        except FileNotFoundError:
+            pass
+        
+        with _view_lock(view_name):
+            if self.minio.stat_size(self.bucket_name, view_name) is None:
+                lf = self.reader.scan(self.bucket_name, snapshot_path).sort(
+                    [col for col, _ in sort_by],
+                    descending=[descending for _, descending in sort_by],
+                    nulls_last=True,
+                    maintain_order=True
+                )
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    view_path = os.path.join(temp_dir, 'view.parquet')
+                    lf.sink_parquet(view_path, compression='zstd', statistics=True,
+                                    row_group_size=settings.VERSION_VIEW_ROW_GROUP_SIZE)
+                    if not self.minio.upload_file(view_path, self.bucket_name, view_name):
+                        raise IOError("排序视图上传失败")
+        return view_name
+    
+    def get_version_schema(self, version_id: str) -> Optional[Dict[str, Any]]:
+        """从快照元数据读取schema和行数"""
+        version = self.db.query(DataVersion).filter_by(id=version_id).first()
+        if not version:
+            return None
+        lf = self.reader.scan(self.bucket_name, self.snapshot_path(version))
+        return {
+            'schema': {col: str(dtype) for col, dtype in lf.collect_schema().items()},
+            'rows': lf.select(pl.len()).collect().item()
+        }
     
     def get_current_data_path(self, project_id: str) -> Optional[str]:
         """获取项目当前版本的数据路径"""
@@ -143,45 +403,61 @@ class VersionManager:
         
         return None
     
-    def _get_data_metadata(self, data_path: str) -> Dict[str, Any]:
+    def _get_data_metadata(self, data_path: str, manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """获取数据元信息"""
         try:
-            if data_path.endswith('.csv'):
-                df = pl.read_csv(data_path)
-            elif data_path.endswith('.xlsx'):
-                df = pl.read_excel(data_path)
-            elif data_path.endswith('.parquet'):
-                df = pl.read_parquet(data_path)
-            else:
+            if not data_path.endswith(('.csv', '.tsv', '.xlsx', '.xls', '.parquet')):
                 return {}
+            # 按扫描计划聚合，不把整个文件读入内存
+            lf = scan_data(data_path, manifest)
+            schema = lf.collect_schema()
+            string_cols = [col for col, dtype in schema.items() if dtype == pl.Utf8]
+            rows_df, null_df, bytes_df = pl.collect_all([
+                lf.select(pl.len()),
+                lf.null_count(),
+                lf.select([pl.col(col).str.len_bytes().sum() for col in string_cols])
+            ])
+            rows = rows_df.item()
+            null_counts = null_df.row(0, named=True)
+            # 与 estimated_size 相同口径：定长列按类型宽度，字符串按字节数
+            memory_usage = sum(v or 0 for v in bytes_df.row(0)) if string_cols else 0
+            for dtype in schema.dtypes():
+                if dtype == pl.Boolean:
+                    memory_usage += (rows + 7) // 8
+                elif dtype not in (pl.Utf8, pl.Null):
+                    memory_usage += rows * DTYPE_WIDTHS.get(dtype.base_type(), 8)
             
             return {
-                'rows': len(df),
-                'columns': len(df.columns),
-                'column_names': df.columns,
-                'dtypes': {col: str(dtype) for col, dtype in df.schema.items()},
-                'null_counts': {col: df[col].null_count() for col in df.columns},
-                'memory_usage': df.estimated_size()
+                'rows': rows,
+                'columns': len(schema),
+                'column_names': schema.names(),
+                'dtypes': {col: str(dtype) for col, dtype in schema.items()},
+                'null_counts': null_counts,
+                'memory_usage': memory_usage
             }
         except Exception as e:
             return {'error': str(e)}
     
-    def _calculate_data_diff(self, df1: pl.DataFrame, df2: pl.DataFrame) -> Dict[str, Any]:
+    def _calculate_data_diff(self, lf1: pl.LazyFrame, lf2: pl.LazyFrame) -> Dict[str, Any]:
         """计算数据差异"""
+        columns1 = lf1.collect_schema().names()
+        columns2 = lf2.collect_schema().names()
+        rows1 = lf1.select(pl.len()).collect().item()
+        rows2 = lf2.select(pl.len()).collect().item()
         
         # 基本统计信息
         diff = {
-            'rows_before': len(df1),
-            'rows_after': len(df2),
-            'rows_change': len(df2) - len(df1),
-            'columns_before': len(df1.columns),
-            'columns_after': len(df2.columns),
-            'columns_change': len(df2.columns) - len(df1.columns)
+            'rows_before': rows1,
+            'rows_after': rows2,
+            'rows_change': rows2 - rows1,
+            'columns_before': len(columns1),
+            'columns_after': len(columns2),
+            'columns_change': len(columns2) - len(columns1)
         }
         
         # 列变化
-        columns_added = list(set(df2.columns) - set(df1.columns))
-        columns_removed = list(set(df1.columns) - set(df2.columns))
+        columns_added = list(set(columns2) - set(columns1))
+        columns_removed = list(set(columns1) - set(columns2))
         
         diff.update({
             'columns_added': columns_added,
@@ -190,13 +466,18 @@ class VersionManager:
         })
         
         # 数据变化统计（如果有相同列）
-        common_columns = list(set(df1.columns) & set(df2.columns))
+        common_columns = list(set(columns1) & set(columns2))
         if common_columns:
-            data_changes = {}
-            for col in common_columns:
-                changes = (df1[col] != df2[col]).sum()
-                data_changes[col] = int(changes)
-            diff['data_changes'] = data_changes
+            # 两边按行位置对齐后逐列比较，行数不同时多出的行不计入
+            after = {col: f"{col}__after" for col in common_columns}
+            aligned_rows = min(rows1, rows2)
+            aligned = pl.concat([lf1.select(common_columns).head(aligned_rows),
+                                 lf2.select(common_columns).rename(after).head(aligned_rows)],
+                                how='horizontal')
+            changes = aligned.select([
+                (pl.col(col) != pl.col(after[col])).sum().alias(col) for col in common_columns
+            ]).collect().row(0, named=True)
+            diff['data_changes'] = {col: int(changes[col]) for col in common_columns}
         
         return diff
     
@@ -217,8 +498,8 @@ class VersionManager:
             parent_id=from_version_id,
             message=f"创建分支: {branch_name}",
             code=from_version.code,
-            data_snapshot_path=from_version.data_snapshot_path,
-            metadata=from_version.metadata,
+            data_snapshot_path=self.snapshot_path(from_version),
+            meta_info=from_version.meta_info,
             author="system"
         )
         
@@ -234,10 +515,20 @@ class VersionManager:
         
         if len(versions) > keep_count:
             old_versions = versions[keep_count:]
+            # 保留的逻辑版本依赖将被删除的快照时先物化
+            old_ids = {version.id for version in old_versions}
+            for version in versions[:keep_count]:
+                pipeline = self.pipeline_of(version)
+                if pipeline and pipeline['base'] in old_ids:
+                    self.materialize(version)
             for version in old_versions:
-                # 从MinIO删除数据快照
+                # 从MinIO删除数据快照和排序视图
                 try:
                     self.minio.delete_object(self.bucket_name, version.data_snapshot_path)
+                    views_prefix = f"{os.path.dirname(version.data_snapshot_path)}/views/"
+                    for view_name in self.minio.list_objects(self.bucket_name, prefix=views_prefix):
+                        self.minio.delete_object(self.bucket_name, view_name)
+                    row_group_index_cache.discard_prefix(self.bucket_name, os.path.dirname(version.data_snapshot_path))
                 except:
                     pass
                 
@@ -1,3 +1,3 @@
-from .data_version import Base, Project, DataVersion, Session, Message
+from .data_version import Base, Project, DataVersion, Session, Message, ProjectFile, Job
 
-__all__ = ["Base", "Project", "DataVersion", "Session", "Message"]
\ No newline at end of file
+__all__ = ["Base", "Project", "DataVersion", "Session", "Message", "ProjectFile", "Job"]
\ No newline at end of file
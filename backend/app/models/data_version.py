@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, JSON, Text, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, JSON, Text, Integer, BigInteger, Float, Boolean, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -18,6 +18,7 @@ class Project(Base):
     # 关联关系
     versions = relationship("DataVersion", back_populates="project")
     sessions = relationship("Session", back_populates="project")
+    files = relationship("ProjectFile", back_populates="project")
 
 class DataVersion(Base):
     __tablename__ = "data_versions"
@@ -65,4 +66,42 @@ class Message(Base):
     
     # 关联关系
     session = relationship("Session", back_populates="messages")
-    version = relationship("DataVersion")
\ No newline at end of file
+    version = relationship("DataVersion")
+
+class ProjectFile(Base):
+    __tablename__ = "project_files"
+    
+    project_id = Column(String(36), ForeignKey("projects.id"), primary_key=True)
+    file_id = Column(String(36), primary_key=True)
+    name = Column(String(255), nullable=False)  # 上传时的原始文件名
+    object_key = Column(String(500), nullable=False)  # 数据对象在项目存储桶中的路径
+    size = Column(BigInteger)
+    content_hash = Column(String(64))
+    format = Column(String(20))  # 数据对象格式（接入后为parquet）
+    source_format = Column(String(20))  # 上传时的原始格式
+    schema = Column(JSON)
+    row_count = Column(BigInteger)
+    manifest = Column(JSON)  # 上传接入清单
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # 关联关系
+    project = relationship("Project", back_populates="files")
+
+class Job(Base):
+    __tablename__ = "jobs"
+    
+    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    kind = Column(String(50), nullable=False)  # profile, chat
+    status = Column(String(20), nullable=False, default="pending")  # pending, running, succeeded, failed, cancelled
+    params = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    progress = Column(Float, default=0.0)  # 0~1
+    message = Column(Text)  # 当前步骤说明
+    cancel_requested = Column(Boolean, default=False)
+    attempts = Column(Integer, default=0)
+    retry_of = Column(String(36))  # 重试时指向原任务
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -1,20 +1,73 @@
 import polars as pl
 import numpy as np
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import logging
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+from ..core.config import settings
+from .file_ingest import csv_read_options, is_utf8
+from .duplicates import row_hash_expr, top_duplicate_groups
+
 logger = logging.getLogger(__name__)
 
+# 数值类型（is_numeric 判断包含无符号整数）
+NUMERIC_DTYPES = [pl.Int8, pl.Int16, pl.Int32, pl.Int64,
+                  pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64,
+                  pl.Float32, pl.Float64]
+
+# 参与统计汇总和异常值检测的数值类型
+SIGNED_NUMERIC_DTYPES = [pl.Float32, pl.Float64, pl.Int8, pl.Int16, pl.Int32, pl.Int64]
+
+TEXT_DTYPES = [pl.Utf8]
+
+CATEGORICAL_DTYPES = [pl.Utf8, pl.Categorical]
+
+# 常见的日期格式，按前缀匹配
+DATETIME_PATTERNS = [
+    r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
+    r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
+    r'\d{2}-\d{2}-\d{4}',  # MM-DD-YYYY
+    r'\d{4}/\d{2}/\d{2}',  # YYYY/MM/DD
+]
+
+# 合并为一个正则，所有文本列的样本一次匹配
+DATETIME_REGEX = '^(?:' + '|'.join(DATETIME_PATTERNS) + ')'
+
+# 定长类型每个值占用的字节数，用于估算内存占用
+DTYPE_WIDTHS = {
+    pl.Int8: 1, pl.Int16: 2, pl.Int32: 4, pl.Int64: 8,
+    pl.UInt8: 1, pl.UInt16: 2, pl.UInt32: 4, pl.UInt64: 8,
+    pl.Float32: 4, pl.Float64: 8,
+    pl.Date: 4, pl.Datetime: 8, pl.Duration: 8, pl.Time: 8
+}
+
+# 列分片聚合的工作线程池，polars在collect期间释放GIL
+column_pool = ThreadPoolExecutor(max_workers=settings.PROFILE_WORKERS, thread_name_prefix="profile-shard")
+
 class DataProfiler:
     """数据探查服务，提供数据质量报告和统计信息"""
     
     def __init__(self):
         pass
     
-    def profile_data(self, file_path: str) -> Dict[str, Any]:
-        """全面探查数据文件"""
+    def profile_data(self, file_path: str, streaming: Optional[bool] = None,
+                     batch_size: Optional[int] = None, approximate: bool = False,
+                     manifest: Optional[Dict[str, Any]] = None,
+                     duplicate_groups: int = 0) -> Dict[str, Any]:
+        """全面探查数据文件
+        
+        Args:
+            file_path: 数据文件路径
+            streaming: 是否按批流式探查；None时超过阈值大小的文件自动启用
+            batch_size: 流式探查每批行数
+            approximate: 使用HyperLogLog/KLL草图估算去重数和分位数（按批执行）
+            manifest: 上传时生成的接入清单，提供时不再检测编码和分隔符
+            duplicate_groups: 报告重复次数最多的前N组重复行，0表示不报告
+        """
         try:
             # 获取文件扩展名（转换为小写）
             file_ext = os.path.splitext(file_path)[1].lower()
@@ -23,123 +76,386 @@ class DataProfiler:
             print(f"处理文件: {file_path}")
             print(f"文件扩展名: {file_ext}")
             
-            # 加载数据
-            if file_ext == '.csv' or file_ext == '.tsv':
-                # 使用chardet检测文件编码并读取CSV文件
-                import chardet
-                
-                # 检测文件编码
-                with open(file_path, 'rb') as f:
-                    raw_data = f.read(10000)  # 读取前10KB用于检测编码
-                    encoding_result = chardet.detect(raw_data)
-                    detected_encoding = encoding_result['encoding'] or 'utf-8'
+            if streaming is None:
+                streaming = os.path.getsize(file_path) > settings.PROFILE_STREAMING_THRESHOLD_MB * 1024 * 1024
+            if streaming or approximate:
+                return self._profile_streaming(file_path, batch_size or settings.PROFILE_BATCH_SIZE,
+                                               approximate, manifest, duplicate_groups)
                 
-                # 设置分隔符
-                separator = '\t' if file_ext == '.tsv' else ','
-                
-                # 使用检测到的编码读取文件
-                try:
-                    # 尝试使用polars的encoding参数
-                    df = pl.read_csv(file_path, separator=separator, encoding=detected_encoding)
-                except TypeError:
-                    # 如果polars版本不支持encoding参数，使用pandas作为后备
-                    import pandas as pd
-                    df = pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding=detected_encoding))
-                except Exception:
-                    # 如果检测失败，尝试常见编码
-                    for encoding in ['utf-8', 'gbk', 'gb18030', 'latin-1']:
-                        try:
-                            try:
-                                df = pl.read_csv(file_path, separator=separator, encoding=encoding)
-                            except TypeError:
-                                import pandas as pd
-                                df = pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding=encoding))
-                            break
-                        except Exception:
-                            continue
-                    else:
-                        # 最后尝试使用替换模式读取
-                        try:
-                            df = pl.read_csv(file_path, separator=separator, encoding='utf-8', encoding_errors='replace')
-                        except TypeError:
-                            import pandas as pd
-                            df = pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding='utf-8', encoding_errors='replace'))
-            elif file_ext in ['.xlsx', '.xls']:
-                df = pl.read_excel(file_path)
-            elif file_ext == '.parquet':
-                df = pl.read_parquet(file_path)
-            else:
-                raise ValueError(f"不支持的文件格式: {file_ext}")
-                
-            print(f"成功加载数据，形状: {df.shape}")
-            
-            return {
-                'basic_info': self._get_basic_info(df),
-                'columns': self._analyze_columns(df),
-                'quality_report': self._generate_quality_report(df),
-                'statistics': self._calculate_statistics(df),
-                'data_types': self._analyze_data_types(df),
-                'sample_data': self._get_sample_data(df)
-            }
+            lf = self._load_data(file_path, manifest)
+            try:
+                if file_ext in ['.csv', '.tsv'] and len(lf.collect_schema()) > settings.PROFILE_COLUMN_SHARD_SIZE:
+                    # 宽表按列分片聚合，CSV不能按列跳读，先读入内存避免每个分片重复解析
+                    lf = lf.collect().lazy()
+                return self.profile_lazy(lf, duplicate_groups)
+            except pl.exceptions.ComputeError as e:
+                if file_ext not in ['.csv', '.tsv'] or manifest:
+                    raise
+                # 未经接入转码的文件按UTF-8扫描失败（编码检测只看了文件开头），回退到逐个编码尝试
+                logger.warning(f"按UTF-8扫描CSV失败，回退到编码重试: {e}")
+                separator = csv_read_options(file_path)['separator']
+                return self.profile_lazy(self._read_csv(file_path, separator, 'utf-8').lazy(), duplicate_groups)
             
         except Exception as e:
             logger.error(f"数据探查失败: {e}")
             raise
     
-    def _get_basic_info(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def profile_lazy(self, lf: pl.LazyFrame, duplicate_groups: int = 0) -> Dict[str, Any]:
+        """在LazyFrame上计算所有列的聚合并生成探查报告"""
+        schema = lf.collect_schema()
+        kinds = self._classify_columns(schema)
+        
+        aggs, head_df, tail_df = self._collect_aggregations(lf, kinds)
+        if duplicate_groups and aggs['__duplicates__']:
+            aggs['__duplicate_groups__'] = top_duplicate_groups(lf, duplicate_groups)
+        
+        print(f"成功加载数据，形状: {(aggs['__rows__'], len(schema))}")
+        
+        return self._build_report(schema, aggs, head_df, tail_df, kinds)
+    
+    def _collect_aggregations(self, lf: pl.LazyFrame, kinds: List[Dict[str, Any]]):
+        """按列分片计算聚合，各分片与head/tail在工作线程池中并行执行
+        
+        单个select中的表达式过多时polars的计划和执行开销随列数超线性增长，
+        宽表按 PROFILE_COLUMN_SHARD_SIZE 列一组拆成独立查询（Parquet扫描只读取分片内的列），
+        再把各分片的结果合并为一个字典。
+        """
+        shard_size = max(settings.PROFILE_COLUMN_SHARD_SIZE, 1)
+        table_exprs = [
+            pl.len().alias('__rows__'),
+            # 按整行哈希计数，不构建去重后的数据
+            (pl.len() - row_hash_expr().n_unique()).alias('__duplicates__')
+        ]
+        
+        if len(kinds) <= shard_size:
+            queries = [lf.select(table_exprs + self._build_aggregations(kinds))]
+        else:
+            queries = [lf.select(table_exprs)]
+            for start in range(0, len(kinds), shard_size):
+                shard = kinds[start:start + shard_size]
+                queries.append(
+                    lf.select([kind['name'] for kind in shard])
+                    .select(self._build_aggregations(shard, start))
+                )
+        
+        results = list(column_pool.map(lambda query: query.collect(), queries + [lf.head(5), lf.tail(5)]))
+        aggs = {}
+        for result in results[:-2]:
+            aggs.update(result.row(0, named=True))
+        return aggs, results[-2], results[-1]
+    
+    def _classify_columns(self, schema: pl.Schema) -> List[Dict[str, Any]]:
+        """对schema做一次类型分类，聚合和报告各阶段复用，避免逐列反复查找类型列表"""
+        flags_by_dtype = {}
+        kinds = []
+        for col, dtype in schema.items():
+            if dtype not in flags_by_dtype:
+                flags_by_dtype[dtype] = {
+                    'numeric': dtype in NUMERIC_DTYPES,
+                    'signed': dtype in SIGNED_NUMERIC_DTYPES,
+                    'categorical': dtype in CATEGORICAL_DTYPES,
+                    'text': dtype in TEXT_DTYPES
+                }
+            kinds.append({'name': col, 'dtype': dtype, **flags_by_dtype[dtype]})
+        return kinds
+    
+    def _profile_streaming(self, file_path: str, batch_size: int, approximate: bool = False,
+                           manifest: Optional[Dict[str, Any]] = None,
+                           duplicate_groups: int = 0) -> Dict[str, Any]:
+        """按批读取文件，用可合并的累加器生成与单次扫描相同结构的报告"""
+        from .streaming_profiler import StreamingProfiler
+        
+        options = self._text_options(file_path, manifest)
+        profiler = StreamingProfiler(batch_size=batch_size, approximate=approximate,
+                                     hll_precision=settings.PROFILE_HLL_PRECISION,
+                                     kll_k=settings.PROFILE_KLL_K,
+                                     duplicate_groups=duplicate_groups,
+                                     max_duplicate_hashes=settings.PROFILE_DUPLICATE_MAX_HASHES,
+                                     max_distinct=settings.PROFILE_EXACT_DISTINCT_MAX,
+                                     distinct_budget=settings.PROFILE_EXACT_DISTINCT_BUDGET)
+        result = profiler.profile_file(file_path, options['encoding'], options['separator'])
+        
+        aggs = {
+            '__rows__': result['rows'],
+            '__duplicates__': result['duplicates'],
+            '__duplicate_groups__': result['duplicate_groups']
+        }
+        for i, stats in enumerate(result['columns']):
+            aggs.update({self._key(i, stat): value for stat, value in stats.items()})
+        
+        logger.info(f"流式探查完成，形状: {(result['rows'], len(result['schema']))}，批次: {result['batches']}")
+        
+        report = self._build_report(result['schema'], aggs, result['head'], result['tail'])
+        approximate_stats = ['median', 'outliers', 'top_values']
+        if not result['distinct_exact']:
+            approximate_stats.append('unique_count')
+        if not result['duplicates_exact']:
+            approximate_stats.append('duplicates')
+        report['streaming'] = {
+            'batches': result['batches'],
+            'batch_size': batch_size,
+            'approximate': approximate_stats
+        }
+        
+        if approximate:
+            report['approximation'] = {
+                'unique_count': {
+                    'method': 'HyperLogLog',
+                    'precision': settings.PROFILE_HLL_PRECISION,
+                    'relative_standard_error': 1.04 / (2 ** settings.PROFILE_HLL_PRECISION) ** 0.5
+                },
+                'quantiles': {
+                    'method': 'KLL',
+                    'k': settings.PROFILE_KLL_K,
+                    'normalized_rank_error': 2.296 / settings.PROFILE_KLL_K ** 0.9723
+                }
+            }
+            report['sketches'] = result['sketches']
+        return report
+    
+    def profile_sample(self, file_path: str, sample_size: Optional[int] = None,
+                       time_budget: Optional[float] = None,
+                       manifest: Optional[Dict[str, Any]] = None,
+                       seed: Optional[int] = None) -> Dict[str, Any]:
+        """在有限时间内对文件随机抽样并探查样本
+        
+        按批读取文件，用随机键对已读行做 bottom-k 抽样；超过时间预算即停止读取。
+        读完整个文件时样本是全部行的简单随机样本，报告的 sampling 部分给出95%置信度下
+        比例类指标（空值率、重复率等）的误差范围；提前停止时样本只来自文件开头
+        （prefix_sample），对有序的文件不具代表性，不给出置信区间。
+        seed 用于复现同一个样本，默认不固定。
+        """
+        from .streaming_profiler import iter_batches
+        
+        sample_size = sample_size or settings.PROFILE_SAMPLE_SIZE
+        time_budget = time_budget if time_budget is not None else settings.PROFILE_SAMPLE_TIME_BUDGET
+        file_ext = os.path.splitext(file_path)[1].lower()
+        options = self._text_options(file_path, manifest)
+        
+        started = time.perf_counter()
+        rng = np.random.default_rng(seed)
+        sample = None
+        head_df = None
+        rows_scanned = 0
+        complete = True
+        
+        batches = iter_batches(file_path, max(sample_size, 10000), options['encoding'], options['separator'])
+        try:
+            for batch in batches:
+                if head_df is None:
+                    head_df = batch.head(5)
+                keyed = batch.with_columns(pl.Series('__sample_key__', rng.random(len(batch))))
+                if sample is not None:
+                    keyed = pl.concat([sample, keyed.cast(dict(sample.schema), strict=False)])
+                sample = keyed.sort('__sample_key__').head(sample_size)
+                rows_scanned += len(batch)
+                if time.perf_counter() - started > time_budget:
+                    complete = False
+                    break
+        finally:
+            batches.close()
+        
+        if sample is None:
+            raise ValueError(f"文件为空: {file_path}")
+        
+        report = self.profile_lazy(sample.drop('__sample_key__').lazy())
+        report['sample_data']['head'] = head_df.to_dicts()
+        
+        # 总行数：扫描完整或Parquet元数据可得时为精确值，否则为已扫描行数（下界）
+        total_rows = rows_scanned
+        if not complete and file_ext == '.parquet':
+            total_rows = pl.scan_parquet(file_path).select(pl.len()).collect().item()
+        total_known = complete or file_ext == '.parquet'
+        
+        n = len(sample)
+        margin_of_error = None
+        if complete:
+            # 有限总体校正：样本占总行数的比例越大误差越小，全部行时为0
+            correction = math.sqrt((total_rows - n) / (total_rows - 1)) if total_rows > 1 else 0.0
+            margin_of_error = round(1.96 * math.sqrt(0.25 / n) * correction, 4)
+        report['sampling'] = {
+            'sample_size': n,
+            'rows_scanned': rows_scanned,
+            'total_rows': total_rows,
+            'total_rows_exact': total_known,
+            'complete_scan': complete,
+            'prefix_sample': not complete,
+            'exact': complete and n == rows_scanned,
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'confidence_level': 0.95 if complete else None,
+            'margin_of_error': margin_of_error
+        }
+        report['basic_info']['total_rows'] = total_rows
+        return report
+    
+    def _build_report(self, schema: pl.Schema, aggs: Dict[str, Any],
+                      head_df: pl.DataFrame, tail_df: pl.DataFrame,
+                      kinds: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """根据聚合结果填充探查报告"""
+        total_rows = aggs['__rows__']
+        kinds = kinds or self._classify_columns(schema)
+        return {
+            'basic_info': self._get_basic_info(kinds, aggs),
+            'columns': self._analyze_columns(kinds, aggs, total_rows),
+            'quality_report': self._generate_quality_report(kinds, aggs, total_rows),
+            'statistics': self._calculate_statistics(kinds, aggs, total_rows),
+            'data_types': self._analyze_data_types(kinds, aggs),
+            'sample_data': self._get_sample_data(head_df, tail_df, total_rows)
+        }
+    
+    def _load_data(self, file_path: str, manifest: Optional[Dict[str, Any]] = None) -> pl.LazyFrame:
+        """加载数据文件，能直接扫描的格式返回扫描计划"""
+        file_ext = os.path.splitext(file_path)[1].lower()
+        
+        if file_ext == '.csv' or file_ext == '.tsv':
+            options = csv_read_options(file_path, manifest)
+            
+            # UTF-8兼容编码可以直接扫描，其他编码需要先解码
+            if is_utf8(options['encoding']):
+                return pl.scan_csv(file_path, separator=options['separator'])
+            return self._read_csv(file_path, options['separator'], options['encoding']).lazy()
+        elif file_ext in ['.xlsx', '.xls']:
+            return pl.read_excel(file_path).lazy()
+        elif file_ext == '.parquet':
+            return pl.scan_parquet(file_path)
+        else:
+            raise ValueError(f"不支持的文件格式: {file_ext}")
+    
+    def _text_options(self, file_path: str, manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """按批读取时使用的编码和分隔符，非文本格式返回默认值"""
+        if os.path.splitext(file_path)[1].lower() in ['.csv', '.tsv']:
+            return csv_read_options(file_path, manifest)
+        return {'encoding': 'utf-8', 'separator': None}
+    
+    def _read_csv(self, file_path: str, separator: str, detected_encoding: str) -> pl.DataFrame:
+        """使用指定编码读取CSV文件，失败时依次尝试常见编码"""
+        try:
+            # 尝试使用polars的encoding参数
+            return pl.read_csv(file_path, separator=separator, encoding=detected_encoding)
+        except TypeError:
+            # 如果polars版本不支持encoding参数，使用pandas作为后备
+            import pandas as pd
+            return pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding=detected_encoding))
+        except Exception:
+            # 如果检测失败，尝试常见编码
+            for encoding in ['utf-8', 'gbk', 'gb18030', 'latin-1']:
+                try:
+                    try:
+                        return pl.read_csv(file_path, separator=separator, encoding=encoding)
+                    except TypeError:
+                        import pandas as pd
+                        return pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding=encoding))
+                except Exception:
+                    continue
+            # 最后尝试使用替换模式读取
+            try:
+                return pl.read_csv(file_path, separator=separator, encoding='utf-8', encoding_errors='replace')
+            except TypeError:
+                import pandas as pd
+                return pl.from_pandas(pd.read_csv(file_path, sep=separator, encoding='utf-8', encoding_errors='replace'))
+    
+    def _key(self, index: int, stat: str) -> str:
+        """聚合结果列名，使用列序号避免与原始列名冲突"""
+        return f"{index}:{stat}"
+    
+    def _build_aggregations(self, kinds: List[Dict[str, Any]], offset: int = 0) -> List[pl.Expr]:
+        """构建一组列的聚合表达式，offset为该组第一列在schema中的序号"""
+        exprs = []
+        
+        for i, kind in enumerate(kinds, start=offset):
+            c = pl.col(kind['name'])
+            exprs += [
+                c.null_count().alias(self._key(i, 'null_count')),
+                c.n_unique().alias(self._key(i, 'unique_count')),
+                self._estimated_size_expr(c, kind).alias(self._key(i, 'size'))
+            ]
+            
+            if kind['numeric']:
+                exprs += [
+                    c.min().cast(pl.Float64).alias(self._key(i, 'min')),
+                    c.max().cast(pl.Float64).alias(self._key(i, 'max')),
+                    c.mean().alias(self._key(i, 'mean')),
+                    c.median().alias(self._key(i, 'median')),
+                    c.std().alias(self._key(i, 'std'))
+                ]
+                if kind['signed']:
+                    # IQR异常值：分位数与越界计数在同一个表达式里完成
+                    q1 = c.quantile(0.25)
+                    q3 = c.quantile(0.75)
+                    lower_bound = q1 - 1.5 * (q3 - q1)
+                    upper_bound = q3 + 1.5 * (q3 - q1)
+                    exprs += [
+                        c.count().alias(self._key(i, 'count')),
+                        ((c < lower_bound) | (c > upper_bound)).sum().alias(self._key(i, 'outliers'))
+                    ]
+            else:
+                exprs.append(
+                    c.drop_nulls().value_counts(sort=True).head(10).implode().alias(self._key(i, 'top_values'))
+                )
+                if kind['categorical']:
+                    exprs.append(c.cast(pl.Utf8).str.len_chars().mean().alias(self._key(i, 'avg_length')))
+                if kind['text']:
+                    exprs.append(c.drop_nulls().head(10).implode().alias(self._key(i, 'sample')))
+        
+        return exprs
+    
+    def _estimated_size_expr(self, c: pl.Expr, kind: Dict[str, Any]) -> pl.Expr:
+        """估算列的内存占用（字节）"""
+        dtype = kind['dtype']
+        if kind['categorical']:
+            return c.cast(pl.Utf8).str.len_bytes().sum().fill_null(0)
+        if dtype == pl.Boolean:
+            return (pl.len() + 7) // 8
+        if dtype == pl.Null:
+            return pl.lit(0)
+        return pl.len() * DTYPE_WIDTHS.get(dtype.base_type(), 8)
+    
+    def _get_basic_info(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any]) -> Dict[str, Any]:
         """获取基本数据信息"""
         return {
-            'total_rows': len(df),
-            'total_columns': len(df.columns),
-            'memory_usage': df.estimated_size(),
-            'column_names': df.columns
+            'total_rows': aggs['__rows__'],
+            'total_columns': len(kinds),
+            'memory_usage': int(sum(aggs[self._key(i, 'size')] for i in range(len(kinds)))),
+            'column_names': [kind['name'] for kind in kinds]
         }
     
-    def _analyze_columns(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def _analyze_columns(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any], total_rows: int) -> Dict[str, Any]:
         """分析每列的详细信息"""
         columns_info = {}
         
-        for col in df.columns:
-            series = df[col]
-            null_count = series.null_count()
-            unique_count = series.n_unique()
+        for i, kind in enumerate(kinds):
+            col = kind['name']
+            null_count = aggs[self._key(i, 'null_count')]
+            unique_count = aggs[self._key(i, 'unique_count')]
             
             col_info = {
                 'name': col,
-                'dtype': str(series.dtype),
+                'dtype': str(kind['dtype']),
                 'null_count': null_count,
-                'null_percentage': (null_count / len(df)) * 100,
+                'null_percentage': (null_count / total_rows) * 100 if total_rows else 0,
                 'unique_count': unique_count,
-                'unique_percentage': (unique_count / len(df)) * 100,
-                'is_numeric': series.dtype in [pl.Int8, pl.Int16, pl.Int32, pl.Int64, 
-                                             pl.UInt8, pl.UInt16, pl.UInt32, pl.UInt64,
-                                             pl.Float32, pl.Float64]
+                'unique_percentage': (unique_count / total_rows) * 100 if total_rows else 0,
+                'is_numeric': kind['numeric']
             }
             
             # 添加数据类型特定的统计
             if col_info['is_numeric']:
+                has_values = null_count < total_rows
                 col_info.update({
-                    'min': float(series.min()) if null_count < len(df) else None,
-                    'max': float(series.max()) if null_count < len(df) else None,
-                    'mean': float(series.mean()) if null_count < len(df) else None,
-                    'median': float(series.median()) if null_count < len(df) else None,
-                    'std': float(series.std()) if null_count < len(df) else None
+                    stat: aggs[self._key(i, stat)] if has_values else None
+                    for stat in ['min', 'max', 'mean', 'median', 'std']
                 })
-            else:
+            elif null_count < total_rows:
                 # 文本数据
-                non_null_values = series.drop_nulls()
-                if len(non_null_values) > 0:
-                    value_counts = non_null_values.value_counts().head(10)
-                    col_info.update({
-                        'top_values': value_counts.to_dicts(),
-                        'avg_length': non_null_values.str.len_chars().mean()
-                    })
+                col_info['top_values'] = aggs[self._key(i, 'top_values')]
+                if kind['categorical']:
+                    col_info['avg_length'] = aggs[self._key(i, 'avg_length')]
             
             columns_info[col] = col_info
         
         return columns_info
     
-    def _generate_quality_report(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def _generate_quality_report(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any], total_rows: int) -> Dict[str, Any]:
         """生成数据质量报告"""
         report = {
             'overall_score': 0,
@@ -148,11 +464,9 @@ class DataProfiler:
         }
         
         # 检查空值
-        null_counts = {col: df[col].null_count() for col in df.columns}
-        total_rows = len(df)
-        
-        for col, null_count in null_counts.items():
-            null_percentage = (null_count / total_rows) * 100
+        for i, col in enumerate(kind['name'] for kind in kinds):
+            null_count = aggs[self._key(i, 'null_count')]
+            null_percentage = (null_count / total_rows) * 100 if total_rows else 0
             if null_percentage > 50:
                 report['issues'].append({
                     'type': 'high_null_rate',
@@ -170,37 +484,34 @@ class DataProfiler:
                 })
         
         # 检查重复行
-        duplicate_count = len(df) - len(df.unique())
-        if duplicate_count > 0:
-            duplicate_percentage = (duplicate_count / len(df)) * 100
-            report['issues'].append({
+        duplicate_count = aggs['__duplicates__']
+        if duplicate_count:
+            duplicate_percentage = (duplicate_count / total_rows) * 100
+            issue = {
                 'type': 'duplicates',
                 'severity': 'medium',
                 'description': f'发现 {duplicate_count} 行重复数据 ({duplicate_percentage:.1f}%)'
-            })
+            }
+            if aggs.get('__duplicate_groups__'):
+                issue['top_groups'] = aggs['__duplicate_groups__']
+            report['issues'].append(issue)
             report['recommendations'].append('建议删除重复行')
         
         # 检查异常值（数值列）
-        for col in df.columns:
-            if df[col].dtype in [pl.Float32, pl.Float64, pl.Int8, pl.Int16, pl.Int32, pl.Int64]:
-                series = df[col].drop_nulls()
-                if len(series) > 0:
-                    q1 = float(series.quantile(0.25))
-                    q3 = float(series.quantile(0.75))
-                    iqr = q3 - q1
-                    lower_bound = q1 - 1.5 * iqr
-                    upper_bound = q3 + 1.5 * iqr
-                    
-                    outliers = series.filter((series < lower_bound) | (series > upper_bound))
-                    if len(outliers) > 0:
-                        outlier_percentage = (len(outliers) / len(series)) * 100
-                        if outlier_percentage > 5:
-                            report['issues'].append({
-                                'type': 'outliers',
-                                'column': col,
-                                'severity': 'medium',
-                                'description': f'列 {col} 发现异常值 ({outlier_percentage:.1f}%)'
-                            })
+        for i, kind in enumerate(kinds):
+            if kind['signed']:
+                col = kind['name']
+                non_null_count = aggs[self._key(i, 'count')]
+                outlier_count = aggs[self._key(i, 'outliers')]
+                if non_null_count > 0 and outlier_count > 0:
+                    outlier_percentage = (outlier_count / non_null_count) * 100
+                    if outlier_percentage > 5:
+                        report['issues'].append({
+                            'type': 'outliers',
+                            'column': col,
+                            'severity': 'medium',
+                            'description': f'列 {col} 发现异常值 ({outlier_percentage:.1f}%)'
+                        })
         
         # 计算总体质量分数
         issue_count = len(report['issues'])
@@ -215,7 +526,7 @@ class DataProfiler:
         
         return report
     
-    def _calculate_statistics(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def _calculate_statistics(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any], total_rows: int) -> Dict[str, Any]:
         """计算综合统计信息"""
         stats = {
             'numeric_summary': {},
@@ -223,86 +534,62 @@ class DataProfiler:
         }
         
         # 数值列统计
-        numeric_cols = [col for col in df.columns 
-                       if df[col].dtype in [pl.Float32, pl.Float64, pl.Int8, pl.Int16, pl.Int32, pl.Int64]]
+        numeric_cols = [(i, kind['name']) for i, kind in enumerate(kinds) if kind['signed']]
         
         if numeric_cols:
-            numeric_df = df.select(numeric_cols)
             stats['numeric_summary'] = {
-                'count': len(numeric_df),
-                'mean': {col: float(numeric_df[col].mean()) for col in numeric_cols},
-                'std': {col: float(numeric_df[col].std()) for col in numeric_cols},
-                'min': {col: float(numeric_df[col].min()) for col in numeric_cols},
-                'max': {col: float(numeric_df[col].max()) for col in numeric_cols}
+                'count': total_rows,
+                'mean': {col: aggs[self._key(i, 'mean')] for i, col in numeric_cols},
+                'std': {col: aggs[self._key(i, 'std')] for i, col in numeric_cols},
+                'min': {col: aggs[self._key(i, 'min')] for i, col in numeric_cols},
+                'max': {col: aggs[self._key(i, 'max')] for i, col in numeric_cols}
             }
         
         # 分类列统计
-        categorical_cols = [col for col in df.columns 
-                          if df[col].dtype in [pl.Utf8, pl.Categorical]]
-        
-        for col in categorical_cols:
-            value_counts = df[col].drop_nulls().value_counts()
-            stats['categorical_summary'][col] = {
-                'unique_count': df[col].n_unique(),
-                'top_values': value_counts.head(5).to_dicts()
-            }
+        for i, kind in enumerate(kinds):
+            if kind['categorical']:
+                stats['categorical_summary'][kind['name']] = {
+                    'unique_count': aggs[self._key(i, 'unique_count')],
+                    'top_values': aggs[self._key(i, 'top_values')][:5]
+                }
         
         return stats
     
-    def _analyze_data_types(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def _analyze_data_types(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any]) -> Dict[str, Any]:
         """分析数据类型分布"""
         type_counts = {}
-        for col in df.columns:
-            dtype = str(df[col].dtype)
-            type_counts[dtype] = type_counts.get(dtype, 0) + 1
+        for kind in kinds:
+            dtype_name = str(kind['dtype'])
+            type_counts[dtype_name] = type_counts.get(dtype_name, 0) + 1
         
         return {
             'type_distribution': type_counts,
-            'datetime_columns': self._detect_datetime_columns(df),
-            'numeric_columns': [col for col in df.columns 
-                              if df[col].dtype in [pl.Float32, pl.Float64, pl.Int8, pl.Int16, pl.Int32, pl.Int64]],
-            'text_columns': [col for col in df.columns 
-                           if df[col].dtype in [pl.Utf8]]
+            'datetime_columns': self._detect_datetime_columns(kinds, aggs),
+            'numeric_columns': [kind['name'] for kind in kinds if kind['signed']],
+            'text_columns': [kind['name'] for kind in kinds if kind['text']]
         }
     
-    def _detect_datetime_columns(self, df: pl.DataFrame) -> List[str]:
-        """检测可能的日期时间列"""
-        datetime_candidates = []
-        
-        for col in df.columns:
-            if df[col].dtype == pl.Utf8:
-                # 尝试解析为日期
-                try:
-                    sample_values = df[col].drop_nulls().head(10)
-                    for val in sample_values:
-                        if val and self._is_datetime_string(str(val)):
-                            datetime_candidates.append(col)
-                            break
-                except:
-                    continue
+    def _detect_datetime_columns(self, kinds: List[Dict[str, Any]], aggs: Dict[str, Any]) -> List[str]:
+        """检测可能的日期时间列：所有文本列的样本值在一次表达式计算中匹配"""
+        text_cols = [(i, kind['name']) for i, kind in enumerate(kinds) if kind['text']]
+        if not text_cols:
+            return []
         
-        return datetime_candidates
-    
-    def _is_datetime_string(self, value: str) -> bool:
-        """判断字符串是否为日期格式"""
-        import re
-        # 常见的日期格式
-        patterns = [
-            r'\d{4}-\d{2}-\d{2}',  # YYYY-MM-DD
-            r'\d{2}/\d{2}/\d{4}',  # MM/DD/YYYY
-            r'\d{2}-\d{2}-\d{4}',  # MM-DD-YYYY
-            r'\d{4}/\d{2}/\d{2}',  # YYYY/MM/DD
-        ]
+        # 样本值已在聚合扫描中取出，每列一行
+        samples = pl.DataFrame(
+            {
+                'column': [col for _, col in text_cols],
+                'sample': [aggs[self._key(i, 'sample')] for i, _ in text_cols]
+            },
+            schema={'column': pl.Utf8, 'sample': pl.List(pl.Utf8)}
+        )
+        is_datetime = pl.col('sample').list.eval(pl.element().str.contains(DATETIME_REGEX)).list.any()
+        return samples.filter(is_datetime)['column'].to_list()
         
-        for pattern in patterns:
-            if re.match(pattern, value):
-                return True
-        return False
-    
-    def _get_sample_data(self, df: pl.DataFrame) -> Dict[str, Any]:
+    def _get_sample_data(self, head_df: pl.DataFrame, tail_df: pl.DataFrame, total_rows: int) -> Dict[str, Any]:
         """获取样本数据用于预览"""
         return {
-            'head': df.head(5).to_dicts(),
-            'tail': df.tail(5).to_dicts(),
-            'shape': df.shape
-        }
\ No newline at end of file
+            'head': head_df.to_dicts(),
+            'tail': tail_df.to_dicts(),
+            'shape': (total_rows, len(head_df.columns))
+        }
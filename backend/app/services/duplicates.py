@@ -0,0 +1,131 @@
+import polars as pl
+from typing import Dict, Any, Iterable, List, Optional
+
+from .sketches import HASH_SEED, HyperLogLog
+
+# 行哈希列名
+ROW_HASH = '__row_hash__'
+
+
+def row_hash_expr() -> pl.Expr:
+    """整行的64位哈希，只生成一列UInt64，不复制原始数据"""
+    return pl.struct(pl.all()).hash(seed=HASH_SEED).alias(ROW_HASH)
+
+
+def top_duplicate_groups(lf: pl.LazyFrame, top_k: int) -> List[Dict[str, Any]]:
+    """重复次数最多的行组：先按行哈希计数，只对前top_k个哈希回读一行示例"""
+    if top_k <= 0:
+        return []
+
+    top = (
+        lf.select(row_hash_expr())
+        .group_by(ROW_HASH)
+        .agg(pl.len().alias('count'))
+        .filter(pl.col('count') > 1)
+        .sort(['count', ROW_HASH], descending=[True, False])
+        .head(top_k)
+        .collect()
+    )
+    if top.is_empty():
+        return []
+
+    examples = (
+        lf.with_columns(row_hash_expr())
+        .filter(pl.col(ROW_HASH).is_in(top[ROW_HASH].implode()))
+        .unique(subset=ROW_HASH, keep='first', maintain_order=True)
+        .collect()
+    )
+    rows = {row.pop(ROW_HASH): row for row in examples.to_dicts()}
+    return [{'count': count, 'row': rows.get(h)} for h, count in top.iter_rows()]
+
+
+class DuplicateCounter:
+    """按行哈希统计重复行，可逐批更新
+
+    保存每个不同行的哈希和出现次数（约16字节/行），不构建去重后的数据副本；
+    64位哈希在千万行规模下发生碰撞的概率可以忽略。同时维护行哈希的HyperLogLog。
+    计数表超过 max_hashes 个哈希后按 Misra-Gries 剪枝（所有计数减去第 max_hashes+1 大的计数），
+    内存不再随不同行数增长：此后重复行数由 总行数 - HyperLogLog去重估计 得到（exact 为False），
+    重复行组的计数为下界，误差不超过 总行数 / (max_hashes + 1)。
+    计数表在待合并的批次计数与其同量级时才合并，摊销合并开销。
+    """
+
+    def __init__(self, top_k: int = 0, max_hashes: int = 2_000_000, hll_precision: int = 14):
+        self.top_k = top_k
+        self.max_hashes = max_hashes
+        self.rows = 0
+        self.exact = True
+        self.counts = pl.DataFrame(schema={ROW_HASH: pl.UInt64, 'count': pl.UInt64})
+        self.pending: List[pl.DataFrame] = []
+        self.pending_rows = 0
+        self.hll = HyperLogLog(hll_precision)
+
+    def update(self, batch: pl.DataFrame) -> None:
+        """加入一批数据"""
+        if batch.is_empty():
+            return
+        hashes = batch.select(row_hash_expr())
+        self.hll.add_hashes(hashes[ROW_HASH].to_numpy())
+        batch_counts = hashes.group_by(ROW_HASH).agg(pl.len().cast(pl.UInt64).alias('count'))
+        self.rows += len(batch)
+        self.pending.append(batch_counts)
+        self.pending_rows += len(batch_counts)
+        if self.pending_rows > max(len(self.counts), min(self.max_hashes, 1_000_000)):
+            self._compact()
+
+    def _compact(self) -> None:
+        """把待合并的批次计数并入总计数，超过上限时剪枝"""
+        if not self.pending:
+            return
+        self.counts = (
+            pl.concat([self.counts, *self.pending])
+            .group_by(ROW_HASH)
+            .agg(pl.col('count').sum())
+        )
+        self.pending = []
+        self.pending_rows = 0
+        if len(self.counts) > self.max_hashes:
+            self.exact = False
+            threshold = self.counts['count'].sort(descending=True)[self.max_hashes]
+            self.counts = (
+                self.counts.filter(pl.col('count') > threshold)
+                .with_columns(pl.col('count') - threshold)
+            )
+
+    def count(self) -> int:
+        """重复行数（总行数 - 不同行数），计数表剪枝后为估计值"""
+        self._compact()
+        if self.exact:
+            return self.rows - len(self.counts)
+        return max(self.rows - self.hll.count(), 0)
+
+    def top_groups(self, top_k: Optional[int] = None,
+                   batches: Optional[Iterable[pl.DataFrame]] = None) -> List[Dict[str, Any]]:
+        """重复次数最多的行组
+
+        示例行从 batches（再次按同样方式读取的数据）中取每组第一次出现的行，
+        只保存前top_k组的示例；不提供 batches 时示例为None。
+        """
+        top_k = self.top_k if top_k is None else top_k
+        if top_k <= 0:
+            return []
+        self._compact()
+        top = (
+            self.counts.filter(pl.col('count') > 1)
+            .sort(['count', ROW_HASH], descending=[True, False])
+            .head(top_k)
+        )
+        examples: Dict[int, Dict[str, Any]] = {}
+        if batches is not None and not top.is_empty():
+            wanted = top[ROW_HASH]
+            for batch in batches:
+                found = (
+                    batch.with_columns(row_hash_expr())
+                    .filter(pl.col(ROW_HASH).is_in(wanted.implode()))
+                    .unique(subset=ROW_HASH, keep='first', maintain_order=True)
+                )
+                for row in found.to_dicts():
+                    examples.setdefault(row.pop(ROW_HASH), row)
+                if len(examples) == len(top):
+                    break
+        return [{'count': count, 'row': examples.get(h)} for h, count in top.iter_rows()]
@@ -0,0 +1,189 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+import logging
+
+from sqlalchemy.orm import Session as DBSession
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.minio_client import MinIOClient
+from ..core.parquet_reader import ParquetObjectReader
+from ..core.services import services
+from ..models.data_version import Project, ProjectFile
+
+logger = logging.getLogger(__name__)
+
+DATA_PREFIX = "data/"
+
+def parse_object_key(object_key: str) -> Optional[Dict[str, str]]:
+    """从数据对象路径 data/{file_id}_{name} 中解析file_id和文件名"""
+    file_name = object_key[len(DATA_PREFIX):] if object_key.startswith(DATA_PREFIX) else None
+    if not file_name or '_' not in file_name:
+        return None
+    file_id, name = file_name.split('_', 1)
+    return {'file_id': file_id, 'name': name}
+
+def meta_object_key(object_key: str) -> str:
+    """数据对象对应的接入清单路径"""
+    return f"meta/{object_key.split('/')[-1]}.json"
+
+class FileCatalog:
+    """项目文件目录，按 (project_id, file_id) 直接查找数据对象，不再列举存储桶"""
+
+    def __init__(self, db_session: DBSession):
+        self.db = db_session
+
+    def register(self, project_id: str, file_id: str, name: str, object_key: str,
+                 size: Optional[int], manifest: Optional[Dict[str, Any]] = None) -> ProjectFile:
+        """登记（或更新）一个已上传的文件"""
+        manifest = manifest or {}
+        record = self.get(project_id, file_id) or ProjectFile(project_id=project_id, file_id=file_id)
+        record.name = name
+        record.object_key = object_key
+        record.size = size
+        record.content_hash = manifest.get('content_hash')
+        record.format = manifest.get('format') or os.path.splitext(object_key)[1].lstrip('.').lower()
+        record.source_format = manifest.get('source_format', record.format)
+        record.schema = manifest.get('schema')
+        record.row_count = manifest.get('rows')
+        record.manifest = manifest or None
+        self.db.add(record)
+        self.db.commit()
+        return record
+
+    def get(self, project_id: str, file_id: str) -> Optional[ProjectFile]:
+        """按主键查找文件"""
+        return self.db.get(ProjectFile, (project_id, file_id))
+
+    def list(self, project_id: str) -> List[ProjectFile]:
+        """列出项目的全部文件，按上传时间排序"""
+        return self.db.query(ProjectFile).filter_by(project_id=project_id).order_by(ProjectFile.created_at).all()
+
+    def remove(self, project_id: str, file_id: str) -> bool:
+        """删除文件记录"""
+        record = self.get(project_id, file_id)
+        if record is None:
+            return False
+        self.db.delete(record)
+        self.db.commit()
+        return True
+
+    def reconcile(self, project_id: str, minio_client: MinIOClient) -> Dict[str, int]:
+        """按存储桶中的实际对象校正目录：补登缺失的对象、删除对象已不存在的记录、更新大小变化的记录"""
+        bucket_name = f"project-{project_id}"
+        objects = {obj['object_name']: obj for obj in minio_client.list_files(bucket_name, prefix=DATA_PREFIX)}
+        records = {record.object_key: record for record in self.list(project_id)}
+        stats = {'added': 0, 'removed': 0, 'updated': 0}
+
+        for object_key, record in records.items():
+            if object_key not in objects:
+                self.db.delete(record)
+                stats['removed'] += 1
+            elif record.size != objects[object_key]['size']:
+                record.size = objects[object_key]['size']
+                stats['updated'] += 1
+
+        for object_key, obj in objects.items():
+            if object_key in records:
+                continue
+            parsed = parse_object_key(object_key)
+            if parsed is None:
+                continue
+            # 接入前上传的旧文件没有清单，Parquet对象的schema和行数按范围读取文件元数据
+            manifest = minio_client.get_json(bucket_name, meta_object_key(object_key)) or {}
+            if not manifest and object_key.endswith('.parquet'):
+                manifest = self._parquet_footer_info(minio_client, bucket_name, object_key)
+            record = self.get(project_id, parsed['file_id'])
+            if record is not None:
+                # 同一file_id的对象被替换
+                self.db.delete(record)
+                self.db.flush()
+            self.db.add(ProjectFile(
+                project_id=project_id,
+                file_id=parsed['file_id'],
+                name=manifest.get('original_name', parsed['name']),
+                object_key=object_key,
+                size=obj['size'],
+                content_hash=manifest.get('content_hash'),
+                format=manifest.get('format') or os.path.splitext(object_key)[1].lstrip('.').lower(),
+                source_format=manifest.get('source_format', manifest.get('format')),
+                schema=manifest.get('schema'),
+                row_count=manifest.get('rows'),
+                manifest=manifest or None
+            ))
+            stats['added'] += 1
+
+        self.db.commit()
+        return stats
+
+    def _parquet_footer_info(self, minio_client: MinIOClient, bucket_name: str,
+                             object_key: str) -> Dict[str, Any]:
+        """从Parquet元数据读取schema和行数，读取失败时返回空"""
+        reader = ParquetObjectReader(minio_client)
+        try:
+            return {
+                'format': 'parquet',
+                'schema': reader.schema(bucket_name, object_key),
+                'rows': reader.row_count(bucket_name, object_key)
+            }
+        except Exception as e:
+            logger.warning(f"读取Parquet元数据失败: {object_key}: {e}")
+            return {}
+
+class CatalogReconciler:
+    """后台定期校正所有项目的文件目录"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        """启动后台线程；间隔不大于0时不启动"""
+        if self.interval <= 0 or (self.thread and self.thread.is_alive()):
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name="catalog-reconcile", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """停止后台线程"""
+        self.stop_event.set()
+
+    def run_once(self, minio_client: Optional[MinIOClient] = None) -> Dict[str, Any]:
+        """校正一遍所有项目，返回汇总结果"""
+        minio_client = minio_client or services.minio
+        totals = {'projects': 0, 'added': 0, 'removed': 0, 'updated': 0, 'errors': 0}
+        db = SessionLocal()
+        try:
+            catalog = FileCatalog(db)
+            for (project_id,) in db.query(Project.id).all():
+                try:
+                    stats = catalog.reconcile(project_id, minio_client)
+                except Exception as e:
+                    db.rollback()
+                    logger.error(f"文件目录校正失败: {project_id}: {e}")
+                    totals['errors'] += 1
+                    continue
+                totals['projects'] += 1
+                for key, value in stats.items():
+                    totals[key] += value
+        finally:
+            db.close()
+        self.last_run = {'finished_at': datetime.utcnow().isoformat(), **totals}
+        return self.last_run
+
+    def _loop(self) -> None:
+        while not self.stop_event.wait(self.interval):
+            try:
+                result = self.run_once()
+                if result['added'] or result['removed'] or result['updated']:
+                    logger.info(f"文件目录校正: {result}")
+            except Exception as e:
+                logger.error(f"文件目录校正失败: {e}")
+
+# 全局文件目录校正任务
+catalog_reconciler = CatalogReconciler(interval=settings.CATALOG_RECONCILE_INTERVAL)
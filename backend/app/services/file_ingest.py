@@ -0,0 +1,228 @@
+import polars as pl
+from typing import Dict, Any, Optional
+import codecs
+import csv
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# 检测编码时读取的字节数
+DETECT_SAMPLE_BYTES = 64 * 1024
+
+# 严格解码失败时依次尝试的编码，latin-1 可以解码任意字节
+FALLBACK_ENCODINGS = ['gb18030', 'latin-1']
+
+# chardet 结果到实际使用编码的映射，GB18030 是 GB2312/GBK 的超集
+ENCODING_ALIASES = {
+    'ascii': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030'
+}
+
+TEXT_FORMATS = ['.csv', '.tsv']
+
+# 接入时转换为Parquet的格式
+CONVERTIBLE_FORMATS = TEXT_FORMATS + ['.xlsx', '.xls']
+
+def is_utf8(encoding: str) -> bool:
+    """判断编码是否可以被polars直接按UTF-8读取"""
+    return encoding.lower().replace('-', '').replace('_', '') in ['utf8', 'utf8sig', 'ascii']
+
+def detect_csv_format(file_path: str) -> Dict[str, Any]:
+    """读取文件开头一次，检测编码和分隔符"""
+    with open(file_path, 'rb') as f:
+        raw_data = f.read(DETECT_SAMPLE_BYTES)
+
+    # 先尝试UTF-8（忽略末尾被截断的多字节字符），失败再用chardet
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(raw_data, final=False)
+        encoding = 'utf-8-sig' if raw_data.startswith(codecs.BOM_UTF8) else 'utf-8'
+    except UnicodeDecodeError:
+        import chardet
+        detected = (chardet.detect(raw_data)['encoding'] or 'gb18030').lower()
+        encoding = ENCODING_ALIASES.get(detected, detected)
+
+    file_ext = os.path.splitext(file_path)[1].lower()
+    delimiter = '\t' if file_ext == '.tsv' else ','
+    if file_ext != '.tsv':
+        text = raw_data.decode(encoding, errors='replace')
+        sample_lines = '\n'.join(text.splitlines()[:20])
+        try:
+            delimiter = csv.Sniffer().sniff(sample_lines, delimiters=',\t;|').delimiter
+        except csv.Error:
+            pass
+
+    return {'encoding': encoding, 'delimiter': delimiter}
+
+def transcode_file(source_path: str, target_path: str, encoding: str,
+                   errors: str = 'strict', chunk_size: int = 1 << 20) -> None:
+    """分块把文本文件转码为UTF-8（无BOM），内存占用与文件大小无关"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors=errors)
+    first = True
+    with open(source_path, 'rb') as src, open(target_path, 'w', encoding='utf-8', newline='') as dst:
+        while True:
+            chunk = src.read(chunk_size)
+            text = decoder.decode(chunk, final=not chunk)
+            if first and text.startswith('\ufeff'):
+                text = text[1:]
+            first = first and not text
+            dst.write(text)
+            if not chunk:
+                break
+
+def transcode_to_utf8(file_path: str, encoding: str) -> str:
+    """把文本文件转码为UTF-8临时文件（无法解码的字节替换），返回临时文件路径"""
+    fd, target = tempfile.mkstemp(suffix=os.path.splitext(file_path)[1])
+    os.close(fd)
+    transcode_file(file_path, target, encoding, errors='replace')
+    return target
+
+def _validate_utf8(file_path: str, chunk_size: int = 1 << 20) -> bool:
+    """流式校验整个文件是否为合法UTF-8"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as f:
+            while True:
+                chunk = f.read(chunk_size)
+                decoder.decode(chunk, final=not chunk)
+                if not chunk:
+                    return True
+    except UnicodeDecodeError:
+        return False
+
+def ingest_file(file_path: str, utf8_valid: Optional[bool] = None) -> Dict[str, Any]:
+    """上传时的数据接入：检测一次编码和分隔符，就地转码为UTF-8，并记录schema
+
+    返回的接入清单（manifest）随文件和版本一起保存，下游读取时直接使用，
+    不再重复检测编码或逐个编码重试。utf8_valid 为接收上传时已校验的结果，
+    提供时不再重新读取整个文件校验。
+    """
+    file_ext = os.path.splitext(file_path)[1].lower()
+    manifest = {'format': file_ext.lstrip('.')}
+
+    if file_ext in TEXT_FORMATS:
+        detected = detect_csv_format(file_path)
+        source_encoding = detected['encoding']
+        transcoded = False
+
+        if utf8_valid is None and source_encoding == 'utf-8':
+            utf8_valid = _validate_utf8(file_path)
+        if source_encoding == 'utf-8' and utf8_valid:
+            pass
+        else:
+            # 文件开头检测到的编码可能不适用于整个文件，严格解码失败时改用后备编码
+            fd, target = tempfile.mkstemp(suffix=file_ext, dir=os.path.dirname(file_path) or '.')
+            os.close(fd)
+            try:
+                for encoding in [source_encoding] + [e for e in FALLBACK_ENCODINGS if e != source_encoding]:
+                    try:
+                        transcode_file(file_path, target, encoding)
+                        source_encoding = encoding
+                        break
+                    except (UnicodeDecodeError, LookupError) as e:
+                        logger.warning(f"使用编码 {encoding} 转码失败: {e}")
+                os.replace(target, file_path)
+                transcoded = True
+            finally:
+                if os.path.exists(target):
+                    os.remove(target)
+
+        manifest.update({
+            'encoding': 'utf-8',
+            'source_encoding': source_encoding,
+            'delimiter': detected['delimiter'],
+            'transcoded': transcoded
+        })
+
+    manifest['schema'] = _read_schema(file_path, manifest)
+    manifest['size'] = os.path.getsize(file_path)
+    if file_ext == '.parquet':
+        # Parquet行数在文件元数据中，不读取数据
+        manifest['rows'] = pl.scan_parquet(file_path).select(pl.len()).collect().item()
+    return manifest
+
+def convert_to_parquet(file_path: str, manifest: Dict[str, Any], target_path: str) -> Dict[str, Any]:
+    """把已接入的CSV/TSV/Excel转换为zstd压缩的Parquet，返回更新后的接入清单
+
+    CSV流式转换（sink_parquet），内存占用与文件大小无关；行组大小按配置设置，
+    每个行组写入列统计信息（最小值、最大值、空值数），便于按行组跳读。
+    """
+    from ..core.config import settings
+
+    write_options = {
+        'compression': 'zstd',
+        'compression_level': settings.INGEST_ZSTD_LEVEL,
+        'statistics': True,
+        'row_group_size': settings.INGEST_ROW_GROUP_SIZE
+    }
+
+    if manifest['format'] in ['csv', 'tsv']:
+        try:
+            pl.scan_csv(file_path, separator=manifest['delimiter'],
+                        infer_schema_length=10000).sink_parquet(target_path, **write_options)
+        except pl.exceptions.ComputeError as e:
+            # 前10000行推断的类型不适用于后面的数据，改为按全部数据推断
+            logger.warning(f"按抽样schema转换失败，改用全量推断: {e}")
+            pl.scan_csv(file_path, separator=manifest['delimiter'],
+                        infer_schema_length=None).sink_parquet(target_path, **write_options)
+    else:
+        pl.read_excel(file_path).write_parquet(target_path, **write_options)
+
+    lf = pl.scan_parquet(target_path)
+    columnar = dict(manifest)
+    columnar.update({
+        'format': 'parquet',
+        'source_format': manifest['format'],
+        'schema': {col: str(dtype) for col, dtype in lf.collect_schema().items()},
+        'rows': lf.select(pl.len()).collect().item(),
+        'compression': 'zstd',
+        'row_group_size': settings.INGEST_ROW_GROUP_SIZE,
+        'size': os.path.getsize(target_path),
+        'source_size': manifest['size']
+    })
+    return columnar
+
+def _read_schema(file_path: str, manifest: Dict[str, Any]) -> Optional[Dict[str, str]]:
+    """读取schema（Excel需要完整解析，不在接入阶段读取）"""
+    try:
+        if manifest['format'] in ['csv', 'tsv']:
+            schema = pl.scan_csv(file_path, separator=manifest['delimiter'],
+                                 infer_schema_length=10000).collect_schema()
+        elif manifest['format'] == 'parquet':
+            schema = pl.read_parquet_schema(file_path)
+        else:
+            return None
+        return {col: str(dtype) for col, dtype in schema.items()}
+    except Exception as e:
+        logger.warning(f"读取schema失败: {e}")
+        return None
+
+def csv_read_options(file_path: str, manifest: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """CSV读取参数：有接入清单时直接使用，否则现场检测一次"""
+    if manifest and manifest.get('delimiter'):
+        return {'separator': manifest['delimiter'], 'encoding': manifest.get('encoding', 'utf-8')}
+    detected = detect_csv_format(file_path)
+    return {'separator': detected['delimiter'], 'encoding': detected['encoding']}
+
+def scan_data(file_path: str, manifest: Optional[Dict[str, Any]] = None) -> pl.LazyFrame:
+    """按接入清单读取数据文件，能扫描的格式返回扫描计划"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext in TEXT_FORMATS:
+        options = csv_read_options(file_path, manifest)
+        if is_utf8(options['encoding']):
+            return pl.scan_csv(file_path, separator=options['separator'], infer_schema_length=10000)
+        return pl.read_csv(file_path, separator=options['separator'], encoding=options['encoding'],
+                           infer_schema_length=10000).lazy()
+    elif file_ext in ['.xlsx', '.xls']:
+        return pl.read_excel(file_path).lazy()
+    elif file_ext == '.parquet':
+        return pl.scan_parquet(file_path)
+    else:
+        raise ValueError(f"不支持的文件格式: {file_ext}")
+
+def read_data(file_path: str, manifest: Optional[Dict[str, Any]] = None) -> pl.DataFrame:
+    """按接入清单读取完整数据"""
+    return scan_data(file_path, manifest).collect()
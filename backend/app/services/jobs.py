@@ -0,0 +1,391 @@
+import asyncio
+import json
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+import logging
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.data_version import Job
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {'succeeded', 'failed', 'cancelled'}
+STOPPED_ERROR = '服务停止，任务执行中断'
+
+class JobCancelled(Exception):
+    """任务被取消"""
+
+class JobContext:
+    """传给任务处理函数的上下文：汇报进度、检查取消"""
+
+    def __init__(self, manager: "JobManager", job_id: str):
+        self.manager = manager
+        self.job_id = job_id
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self.manager.stopping or self.manager.is_cancel_requested(self.job_id)
+
+    def check_cancelled(self) -> None:
+        """已请求取消时抛出 JobCancelled，处理函数在各步骤之间调用"""
+        if self.cancel_requested:
+            raise JobCancelled()
+
+    def progress(self, fraction: float, message: Optional[str] = None) -> None:
+        """记录进度（0~1）并推送进度事件"""
+        self.check_cancelled()
+        self.manager._update(self.job_id, progress=fraction, message=message)
+        self.manager._emit(self.job_id, 'progress', {'progress': fraction, 'message': message})
+
+class JobManager:
+    """本地后台任务：任务记录持久化在数据库，在本进程的工作线程池中执行，不依赖外部消息队列
+
+    进度事件保存在内存中（每个任务最多 max_events 条），供 SSE 推送；
+    服务关闭（stop）时，执行中的任务在下一个检查点停止并标记为失败，未开始的任务保持排队；
+    服务重启后，未开始的任务重新排队，执行中断的任务标记为失败，可以重试。
+    """
+
+    def __init__(self, max_workers: int = 2, max_events: int = 200):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.max_events = max_events
+        self.handlers: Dict[str, Callable[[JobContext, Dict[str, Any]], Any]] = {}
+        self.futures: Dict[str, Future] = {}
+        self.cancel_flags: set = set()
+        self.events: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.sequence: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.started = False
+        self.stopping = False
+
+    def register(self, kind: str, handler: Callable[[JobContext, Dict[str, Any]], Any]) -> None:
+        """注册任务类型的处理函数 handler(ctx, params) -> 结果（可JSON序列化）"""
+        self.handlers[kind] = handler
+
+    def start(self) -> None:
+        """服务启动时恢复任务：中断的任务标记失败，未开始的任务重新排队"""
+        if self.started:
+            return
+        self.started = True
+        db = SessionLocal()
+        try:
+            pending = []
+            for job in db.query(Job).filter(Job.status.in_(['pending', 'running'])).all():
+                if job.status == 'running':
+                    job.status = 'failed'
+                    job.error = '服务重启，任务执行中断'
+                    job.finished_at = datetime.utcnow()
+                elif job.cancel_requested:
+                    job.status = 'cancelled'
+                    job.finished_at = datetime.utcnow()
+                else:
+                    pending.append(job.id)
+            db.commit()
+        finally:
+            db.close()
+        for job_id in pending:
+            self._dispatch(job_id)
+        if pending:
+            logger.info(f"重新排队 {len(pending)} 个后台任务")
+
+    def stop(self, timeout: float = None) -> None:
+        """服务关闭时调用：未开始的任务留在队列中（重启后恢复），执行中的任务在检查点停止，
+        最多等待 timeout 秒，仍未结束的标记为失败"""
+        timeout = settings.JOB_STOP_TIMEOUT if timeout is None else timeout
+        self.stopping = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        with self.lock:
+            futures = {job_id: future for job_id, future in self.futures.items() if not future.done()}
+        if not futures:
+            return
+        _, not_done = wait(futures.values(), timeout=timeout)
+        for job_id, future in futures.items():
+            if future in not_done:
+                self._update(job_id, status='failed', error=STOPPED_ERROR, finished_at=datetime.utcnow())
+        if not_done:
+            logger.warning(f"{len(not_done)} 个后台任务在服务关闭时未能停止")
+
+    def submit(self, kind: str, params: Dict[str, Any], retry_of: Optional[str] = None) -> Dict[str, Any]:
+        """创建任务记录并提交执行"""
+        if kind not in self.handlers:
+            raise ValueError(f"不支持的任务类型: {kind}")
+        if self.stopping:
+            raise RuntimeError("服务正在关闭，不再接受后台任务")
+        db = SessionLocal()
+        try:
+            job = Job(kind=kind, params=params, status='pending', retry_of=retry_of)
+            db.add(job)
+            db.commit()
+            job_id = job.id
+            status = self._status(job)
+        finally:
+            db.close()
+        self._emit(job_id, 'status', {'status': 'pending'})
+        self._dispatch(job_id)
+        return status
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务状态（不含结果）"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            return self._status(job) if job else None
+        finally:
+            db.close()
+
+    def result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """任务状态和结果"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            status = self._status(job)
+            status['result'] = job.result
+            return status
+        finally:
+            db.close()
+
+    def list(self, kind: Optional[str] = None, status: Optional[str] = None,
+             limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的任务"""
+        db = SessionLocal()
+        try:
+            query = db.query(Job)
+            if kind:
+                query = query.filter_by(kind=kind)
+            if status:
+                query = query.filter_by(status=status)
+            return [self._status(job) for job in query.order_by(Job.created_at.desc()).limit(limit)]
+        finally:
+            db.close()
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """取消任务：未开始的直接取消，执行中的在下一个检查点停止"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            if job.status in TERMINAL_STATUSES:
+                return self._status(job)
+            job.cancel_requested = True
+            db.commit()
+        finally:
+            db.close()
+
+        with self.lock:
+            self.cancel_flags.add(job_id)
+            future = self.futures.get(job_id)
+        if future is not None and future.cancel():
+            self._finish(job_id, 'cancelled')
+        return self.get(job_id)
+
+    def retry(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """以相同参数重新提交已结束的任务"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None:
+                return None
+            if job.status not in TERMINAL_STATUSES:
+                raise ValueError("任务尚未结束，不能重试")
+            kind, params = job.kind, job.params or {}
+        finally:
+            db.close()
+        return self.submit(kind, params, retry_of=job_id)
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        return job_id in self.cancel_flags
+
+    def events_since(self, job_id: str, after: int = 0) -> List[Dict[str, Any]]:
+        """序号大于 after 的事件"""
+        with self.lock:
+            return [event for event in self.events.get(job_id, ()) if event['id'] > after]
+
+    def has_events(self, job_id: str) -> bool:
+        with self.lock:
+            return job_id in self.events
+
+    def _dispatch(self, job_id: str) -> None:
+        future = self.executor.submit(self._run, job_id)
+        with self.lock:
+            self.futures[job_id] = future
+        future.add_done_callback(lambda _: self._forget_future(job_id))
+
+    def _forget_future(self, job_id: str) -> None:
+        with self.lock:
+            self.futures.pop(job_id, None)
+
+    def _run(self, job_id: str) -> None:
+        """在工作线程中执行任务"""
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is None or job.status != 'pending':
+                return
+            if job.cancel_requested:
+                job.status = 'cancelled'
+                job.finished_at = datetime.utcnow()
+                db.commit()
+                self._emit(job_id, 'status', {'status': 'cancelled'})
+                return
+            kind, params = job.kind, job.params or {}
+            job.status = 'running'
+            job.started_at = datetime.utcnow()
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+        finally:
+            db.close()
+        self._emit(job_id, 'status', {'status': 'running'})
+
+        ctx = JobContext(self, job_id)
+        try:
+            result = self.handlers[kind](ctx, params)
+        except JobCancelled:
+            if self.stopping and not self.is_cancel_requested(job_id):
+                self._finish(job_id, 'failed', error=STOPPED_ERROR)
+            else:
+                self._finish(job_id, 'cancelled')
+        except Exception as e:
+            logger.error(f"后台任务失败 {kind}/{job_id}: {e}")
+            self._finish(job_id, 'failed', error=str(e))
+        else:
+            self._finish(job_id, 'succeeded', result=result)
+
+    def _finish(self, job_id: str, status: str, result: Any = None,
+                error: Optional[str] = None) -> None:
+        fields = {'status': status, 'finished_at': datetime.utcnow(), 'error': error}
+        if status == 'succeeded':
+            # 结果中可能有numpy、日期等类型，按JSON规范化后保存
+            fields['result'] = json.loads(json.dumps(result, ensure_ascii=False, default=str))
+            fields['progress'] = 1.0
+        self._update(job_id, **fields)
+        with self.lock:
+            self.cancel_flags.discard(job_id)
+        self._emit(job_id, 'status', {'status': status, 'error': error})
+
+    def _update(self, job_id: str, **fields) -> None:
+        db = SessionLocal()
+        try:
+            job = db.get(Job, job_id)
+            if job is not None:
+                for key, value in fields.items():
+                    setattr(job, key, value)
+                db.commit()
+        finally:
+            db.close()
+
+    def _emit(self, job_id: str, event_type: str, data: Dict[str, Any]) -> None:
+        with self.lock:
+            seq = self.sequence.get(job_id, 0) + 1
+            self.sequence[job_id] = seq
+            events = self.events.setdefault(job_id, deque(maxlen=self.max_events))
+            events.append({'id': seq, 'type': event_type, 'data': data,
+                           'time': datetime.utcnow().isoformat()})
+
+    def _status(self, job: Job) -> Dict[str, Any]:
+        return {
+            'job_id': job.id,
+            'kind': job.kind,
+            'status': job.status,
+            'progress': job.progress or 0.0,
+            'message': job.message,
+            'error': job.error,
+            'attempts': job.attempts or 0,
+            'retry_of': job.retry_of,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None
+        }
+
+def run_profile_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """探查项目文件：下载数据对象、完整探查并写入缓存"""
+    from ..core.services import services
+    from .file_catalog import FileCatalog
+    from .profile_cache import ProfileCache, profile_cache, file_content_hash
+
+    project_id, file_id = params['project_id'], params['file_id']
+    duplicate_groups = params.get('duplicate_groups', 0)
+    bucket_name = f"project-{project_id}"
+
+    ctx.progress(0.05, '查找文件')
+    db = SessionLocal()
+    try:
+        record = FileCatalog(db).get(project_id, file_id)
+        if record is None:
+            raise ValueError("文件未找到")
+        object_key, manifest = record.object_key, record.manifest
+    finally:
+        db.close()
+
+    ctx.progress(0.1, '下载文件')
+    file_path = f"/tmp/{file_id}_job_{ctx.job_id}{os.path.splitext(object_key)[1]}"
+    try:
+        if not services.minio.download_file(bucket_name, object_key, file_path):
+            raise IOError("文件下载失败")
+
+        options = {'approximate': False}
+        if duplicate_groups:
+            options['duplicate_groups'] = duplicate_groups
+        content_hash = file_content_hash(file_path)
+        profile_cache.bind(f"{bucket_name}/{file_id}", content_hash)
+        cache_key = ProfileCache.make_key(content_hash, options)
+        profile = profile_cache.get(cache_key)
+        if profile is None:
+            ctx.progress(0.3, '数据探查')
+            profile = services.profiler.profile_data(file_path, manifest=manifest,
+                                                     duplicate_groups=duplicate_groups)
+            ctx.progress(0.9, '写入缓存')
+            profile_cache.put(cache_key, profile)
+        return profile
+    finally:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+# 后台任务线程的事件循环：每个线程一个，在任务之间复用，不为每个任务新建事件循环
+_thread_loops = threading.local()
+
+def _thread_loop() -> asyncio.AbstractEventLoop:
+    loop = getattr(_thread_loops, 'loop', None)
+    if loop is None or loop.is_closed():
+        loop = _thread_loops.loop = asyncio.new_event_loop()
+    return loop
+
+def run_chat_job(ctx: JobContext, params: Dict[str, Any]) -> Dict[str, Any]:
+    """处理一条对话消息（意图理解、沙箱执行、创建版本），取消时中止正在等待的步骤"""
+    from ..core.agent_orchestrator import AgentOrchestrator
+    from .session_manager import SessionManager
+
+    ctx.progress(0.05, '处理消息')
+    db = SessionLocal()
+    try:
+        # 在本线程的事件循环中执行，异步客户端不能与服务的事件循环共享
+        manager = SessionManager(db, agent=AgentOrchestrator(api_key=settings.OPENAI_API_KEY))
+
+        async def run() -> Dict[str, Any]:
+            task = asyncio.ensure_future(manager.process_user_input(
+                session_id=params['session_id'],
+                user_input=params['message'],
+                pipeline=params.get('pipeline')
+            ))
+            while not task.done():
+                if ctx.cancel_requested:
+                    task.cancel()
+                await asyncio.wait({task}, timeout=0.2)
+            if task.cancelled():
+                raise JobCancelled()
+            return task.result()
+
+        return _thread_loop().run_until_complete(run())
+    finally:
+        db.close()
+
+# 全局后台任务管理
+job_manager = JobManager(max_workers=settings.JOB_WORKERS, max_events=settings.JOB_MAX_EVENTS)
+job_manager.register('profile', run_profile_job)
+job_manager.register('chat', run_chat_job)
@@ -0,0 +1,240 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+
+import orjson
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def file_content_hash(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """分块计算文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ProfileCache:
+    """探查结果缓存，以内容哈希+探查参数为键
+
+    上传文件和版本快照写入后不再变化，因此同一内容的探查结果可以长期复用。
+    缓存分两层：内存LRU（按条目数限制）和磁盘层（JSON文件，按总字节数限制，LRU淘汰），
+    磁盘读写在锁外进行。另外记录对象引用（如 bucket/file_id）到内容哈希的映射，命中时无需访问对象存储；
+    引用按LRU保留最多 max_refs 个，追加写入的引用日志在启动时和记录数过多时压缩。
+    """
+
+    def __init__(self, cache_dir: str, memory_entries: int = 128, disk_bytes: int = 512 * 1024 * 1024,
+                 max_refs: int = 100_000):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self.disk_bytes = disk_bytes
+        self.max_refs = max_refs
+        self.memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.disk_index: "OrderedDict[str, int]" = OrderedDict()
+        self.refs: "OrderedDict[str, str]" = OrderedDict()
+        self._ref_log_lines = 0
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0}
+        self._load_index()
+
+    @staticmethod
+    def make_key(content_hash: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """由内容哈希和探查参数生成缓存键"""
+        options_json = json.dumps(options or {}, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}:{options_json}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，先查内存再查磁盘"""
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                return self.memory[key]
+            on_disk = key in self.disk_index
+
+        if on_disk:
+            try:
+                with open(self._entry_path(key), 'rb') as f:
+                    profile = orjson.loads(f.read())
+                os.utime(self._entry_path(key))
+            except (OSError, orjson.JSONDecodeError) as e:
+                logger.warning(f"读取探查缓存失败: {e}")
+                with self.lock:
+                    self.disk_index.pop(key, None)
+            else:
+                with self.lock:
+                    if key in self.disk_index:
+                        self.disk_index.move_to_end(key)
+                    self.counters['disk_hits'] += 1
+                    self._remember(key, profile)
+                return profile
+
+        with self.lock:
+            self.counters['misses'] += 1
+        return None
+
+    def put(self, key: str, profile: Dict[str, Any]) -> None:
+        """写入缓存（内存和磁盘两层），序列化和写文件在锁外进行"""
+        with self.lock:
+            self._remember(key, profile)
+        try:
+            data = orjson.dumps(profile, default=str,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+            if len(data) > self.disk_bytes:
+                return
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self._entry_path(key)}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._entry_path(key))
+        except (OSError, TypeError) as e:
+            logger.warning(f"写入探查缓存失败: {e}")
+            return
+        with self.lock:
+            self.disk_index[key] = len(data)
+            self.disk_index.move_to_end(key)
+            self._evict_disk()
+
+    def resolve(self, ref: str) -> Optional[str]:
+        """查找对象引用对应的内容哈希"""
+        with self.lock:
+            content_hash = self.refs.get(ref)
+            if content_hash is not None:
+                self.refs.move_to_end(ref)
+            return content_hash
+
+    def bind(self, ref: str, content_hash: str) -> None:
+        """记录对象引用对应的内容哈希"""
+        with self.lock:
+            self.refs[ref] = content_hash
+            self.refs.move_to_end(ref)
+            self._trim_refs()
+            self._append_ref(ref, content_hash)
+
+    def forget(self, ref: str) -> None:
+        """删除对象引用（对象被删除时调用）"""
+        with self.lock:
+            if self.refs.pop(ref, None) is not None:
+                self._append_ref(ref, None)
+
+    def _append_ref(self, ref: str, content_hash: Optional[str]) -> None:
+        """追加引用映射记录，哈希为None表示删除；日志记录数超过现有引用数较多时压缩"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(self._refs_path(), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'ref': ref, 'hash': content_hash}) + '\n')
+        except OSError as e:
+            logger.warning(f"写入缓存引用失败: {e}")
+            return
+        self._ref_log_lines += 1
+        if self._ref_log_lines > 2 * len(self.refs) + 1000:
+            self._compact_refs()
+
+    def _trim_refs(self) -> None:
+        """超过 max_refs 时删除最久未使用的引用（日志在压缩时同步）"""
+        while len(self.refs) > self.max_refs:
+            self.refs.popitem(last=False)
+
+    def _compact_refs(self) -> None:
+        """用现有的引用重写引用日志"""
+        tmp_path = f"{self._refs_path()}.{uuid.uuid4().hex[:8]}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for ref, content_hash in self.refs.items():
+                    f.write(json.dumps({'ref': ref, 'hash': content_hash}) + '\n')
+            os.replace(tmp_path, self._refs_path())
+        except OSError as e:
+            logger.warning(f"压缩缓存引用日志失败: {e}")
+            return
+        self._ref_log_lines = len(self.refs)
+
+    def _refs_path(self) -> str:
+        return os.path.join(self.cache_dir, 'refs.jsonl')
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中计数和容量信息"""
+        with self.lock:
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            lookups = hits + self.counters['misses']
+            return {
+                **self.counters,
+                'hits': hits,
+                'hit_rate': hits / lookups if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'disk_entries': len(self.disk_index),
+                'disk_bytes': sum(self.disk_index.values()),
+                'disk_limit_bytes': self.disk_bytes
+            }
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _remember(self, key: str, profile: Dict[str, Any]) -> None:
+        """放入内存层并按条目数淘汰"""
+        self.memory[key] = profile
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """磁盘层超出容量时删除最久未访问的条目"""
+        total = sum(self.disk_index.values())
+        while total > self.disk_bytes and self.disk_index:
+            key, size = self.disk_index.popitem(last=False)
+            total -= size
+            self.counters['evictions'] += 1
+            try:
+                os.remove(self._entry_path(key))
+            except OSError:
+                pass
+
+    def _load_index(self) -> None:
+        """启动时按访问时间恢复磁盘层索引和引用映射"""
+        if not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.json'):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, name[:-len('.json')], stat.st_size))
+            elif name.endswith(('.pkl', '.tmp')):
+                # 旧版本的pickle条目不再读取，与中断写入留下的临时文件一起删除
+                os.remove(path)
+        for _, key, size in sorted(entries):
+            self.disk_index[key] = size
+
+        refs_path = self._refs_path()
+        if os.path.exists(refs_path):
+            lines = 0
+            with open(refs_path, encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('hash'):
+                        self.refs[entry['ref']] = entry['hash']
+                        self.refs.move_to_end(entry['ref'])
+                    else:
+                        self.refs.pop(entry.get('ref'), None)
+            self._trim_refs()
+            self._ref_log_lines = lines
+            if lines > len(self.refs):
+                self._compact_refs()
+
+profile_cache = ProfileCache(
+    settings.PROFILE_CACHE_DIR,
+    memory_entries=settings.PROFILE_CACHE_MEMORY_ENTRIES,
+    disk_bytes=settings.PROFILE_CACHE_DISK_MB * 1024 * 1024,
+    max_refs=settings.PROFILE_CACHE_MAX_REFS
+)
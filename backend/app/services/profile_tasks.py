@@ -0,0 +1,111 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable, Tuple
+import logging
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ProfileTaskManager:
+    """后台完整探查任务管理，渐进式预览先返回抽样结果，完整结果在此异步计算"""
+
+    def __init__(self, max_workers: int = 2, max_tasks: int = 256):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="profile")
+        self.max_tasks = max_tasks
+        self.tasks: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, task_id: str, profile_fn: Callable[[], Dict[str, Any]],
+               cleanup_path: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """提交完整探查任务，返回任务状态和是否提交了新任务
+
+        同一任务正在执行或已完成时不提交，直接返回其状态；cleanup_path 只在提交了新任务时
+        由该任务结束后删除，否则仍归调用方所有。
+        """
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task and task['status'] in ['pending', 'running', 'completed']:
+                return self._status(task_id, task), False
+
+            task = {
+                'status': 'pending',
+                'submitted_at': datetime.utcnow().isoformat(),
+                'result': None,
+                'error': None
+            }
+            self.tasks[task_id] = task
+            self._evict()
+
+        self.executor.submit(self._run, task, profile_fn, cleanup_path)
+        return self._status(task_id, task), True
+
+    def complete(self, task_id: str, result: Dict[str, Any]) -> None:
+        """直接登记已完成的结果（例如抽样已覆盖全部数据）"""
+        with self.lock:
+            self.tasks[task_id] = {
+                'status': 'completed',
+                'submitted_at': datetime.utcnow().isoformat(),
+                'completed_at': datetime.utcnow().isoformat(),
+                'result': result,
+                'error': None
+            }
+            self._evict()
+
+    def get(self, task_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务状态，完成时包含结果"""
+        with self.lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                return None
+            self.tasks.move_to_end(task_id)
+            status = self._status(task_id, task)
+            if task['status'] == 'completed':
+                status['result'] = task['result']
+            return status
+
+    def _run(self, task: Dict[str, Any], profile_fn: Callable[[], Dict[str, Any]],
+             cleanup_path: Optional[str]) -> None:
+        """执行探查并记录结果"""
+        task['status'] = 'running'
+        status = 'failed'
+        try:
+            task['result'] = profile_fn()
+            status = 'completed'
+        except Exception as e:
+            logger.error(f"后台探查失败: {e}")
+            task['error'] = str(e)
+        finally:
+            # 先删除临时文件再更新状态，任务结束时临时文件已不存在
+            if cleanup_path and os.path.exists(cleanup_path):
+                try:
+                    os.remove(cleanup_path)
+                except OSError as e:
+                    logger.warning(f"删除探查临时文件失败: {e}")
+            task['completed_at'] = datetime.utcnow().isoformat()
+            task['status'] = status
+
+    def _status(self, task_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+        """任务状态摘要（不含结果）"""
+        return {
+            'task_id': task_id,
+            'status': task['status'],
+            'submitted_at': task['submitted_at'],
+            'completed_at': task.get('completed_at'),
+            'error': task['error']
+        }
+
+    def _evict(self) -> None:
+        """超出上限时淘汰最早的已结束任务"""
+        while len(self.tasks) > self.max_tasks:
+            for task_id, task in self.tasks.items():
+                if task['status'] in ['completed', 'failed']:
+                    del self.tasks[task_id]
+                    break
+            else:
+                break
+
+profile_task_manager = ProfileTaskManager(max_workers=settings.PROFILE_BACKGROUND_WORKERS)
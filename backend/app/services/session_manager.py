@@ -1,3 +1,4 @@
+import os
 import uuid
 from datetime import datetime
 from typing import List, Dict, Any, Optional
@@ -5,24 +6,36 @@ from sqlalchemy.orm import Session
 from sqlalchemy import desc
 import logging
 
-from ..models.data_version import Session as SessionModel, Message, Project
+from ..models.data_version import Session as SessionModel, Message, Project, DataVersion
 from ..core.agent_orchestrator import AgentOrchestrator
+from ..core.config import settings
 from ..core.version_manager import VersionManager
-from ..core.sandbox_executor import SandboxExecutor
+from ..core.sandbox_backend import SandboxBackend
+from ..core.sandbox_exchange import arrow_exchange
+from ..core.executors import io_pool
+from ..core.services import services
 
 logger = logging.getLogger(__name__)
 
+def _remove_file(path: str) -> None:
+    """删除已上传为快照的临时文件"""
+    if path and os.path.exists(path):
+        os.remove(path)
+
 class SessionManager:
     """会话管理服务，管理多轮对话的上下文和状态"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, agent: Optional[AgentOrchestrator] = None):
+        """共享应用级客户端；agent 用于在其他事件循环中执行时传入独立的编排器"""
         self.db = db
-        from ..core.config import settings
-        from ..core.minio_client import MinIOClient
-        self.agent = AgentOrchestrator(api_key=settings.OPENAI_API_KEY)
-        self.minio_client = MinIOClient()
+        self.agent = agent or services.agent
+        self.minio_client = services.minio
         self.version_manager = VersionManager(db, self.minio_client)
-        self.sandbox = SandboxExecutor()
+    
+    @property
+    def sandbox(self) -> SandboxBackend:
+        """首次执行代码时才创建沙箱后端（Docker后端需要Docker）"""
+        return services.sandbox
     
     def create_session(self, project_id: str, title: str = "新对话", initial_message: str = None) -> str:
         """创建新会话"""
@@ -112,23 +125,27 @@ class SessionManager:
         ]
     
     async def process_user_input(self, session_id: str, user_input: str, 
-                                file_path: str = None) -> Dict[str, Any]:
-        """处理用户输入并返回响应"""
+                                file_path: str = None, pipeline: Optional[bool] = None) -> Dict[str, Any]:
+        """处理用户输入并返回响应
+
+        pipeline（未指定时使用 PIPELINE_MODE）为True时，本轮代码追加到当前版本的查询计划，
+        沙箱只计算整个计划结果的前几行（校验并生成预览），新版本为逻辑版本，读取时才物化。
+        """
+        pipeline = settings.PIPELINE_MODE if pipeline is None else pipeline
+        # 交换目录中的输入文件在本轮处理结束前保持使用中，不被淘汰
+        pinned_file = None
         try:
             # 添加用户消息
-            self.add_message(session_id, "user", user_input)
+            await io_pool.run(self.add_message, session_id, "user", user_input)
             
             # 获取会话和项目信息
-            session = self.db.query(SessionModel).filter_by(id=session_id).first()
-            if not session:
-                raise ValueError("会话不存在")
-            
-            project = self.db.query(Project).filter_by(id=session.project_id).first()
-            if not project:
-                raise ValueError("项目不存在")
+            session, project = await io_pool.run(self._get_session_project, session_id)
             
             # 获取当前数据文件路径
-            current_file = file_path or self._get_current_data_file(session)
+            if file_path:
+                current_file = file_path
+            else:
+                current_file = pinned_file = await io_pool.run(self._get_current_data_file, session, pipeline)
             if not current_file:
                 return {
                     'status': 'error',
@@ -137,7 +154,7 @@ class SessionManager:
                 }
             
             # 获取对话上下文
-            context = self.get_conversation_context(session_id)
+            context = await io_pool.run(self.get_conversation_context, session_id)
             
             # 使用Agent处理输入
             result = await self.agent.process_intent(
@@ -147,37 +164,73 @@ class SessionManager:
             )
             
             if result['status'] == 'success':
-                # 执行生成的代码
-                execution_result = await self.sandbox.execute_code(
-                    code=result['generated_code'],
-                    input_file=current_file,
-                    output_file=f"temp_{session_id}.csv"
-                )
+                exchange_file = None
+                lazy = pipeline and not file_path
+                if lazy:
+                    # 计划的输入是起点版本的数据，只计算前几行
+                    parent = await io_pool.run(self._get_current_version, session)
+                    plan = self.version_manager.pipeline_of(parent)
+                    execution_result = await self.sandbox.execute_code(
+                        code=(plan['steps'] if plan else []) + [result['generated_code']],
+                        input_file=current_file,
+                        output_file=f"temp_{session_id}.parquet",
+                        limit=settings.SANDBOX_PREVIEW_ROWS
+                    )
+                else:
+                    # 执行生成的代码：输出Parquet快照，同时保留一份Arrow副本作为下一轮的输入
+                    exchange_file = arrow_exchange.pending_path()
+                    execution_result = await self.sandbox.execute_code(
+                        code=result['generated_code'],
+                        input_file=current_file,
+                        output_file=f"temp_{session_id}.parquet",
+                        exchange_file=exchange_file
+                    )
                 
-                if execution_result['success']:
-                    # 创建新版本
-                    new_version = await self.version_manager.create_version(
+                if execution_result['success'] and lazy:
+                    # 逻辑版本只记录计划，列名和类型取自预览，行数在物化后才知道
+                    await io_pool.run(_remove_file, execution_result['output_path'])
+                    manifest = execution_result['manifest']
+                    new_version = await io_pool.run(
+                        self.version_manager.create_pipeline_version,
                         project_id=project.id,
-                        data_file=execution_result['output_file'],
+                        message=user_input,
                         code=result['generated_code'],
-                        description=user_input,
-                        parent_version_id=session.current_version_id
+                        parent=parent,
+                        metadata={key: manifest[key] for key in ('columns', 'column_names', 'dtypes')}
                     )
-                    
+                    execution_result['rows_affected'] = None
+                elif execution_result['success']:
+                    # 创建新版本，元信息使用沙箱返回的结果清单，不再重新扫描输出文件
+                    try:
+                        new_version = await io_pool.run(
+                            self.version_manager.create_version,
+                            project_id=project.id,
+                            message=user_input,
+                            code=result['generated_code'],
+                            data_path=execution_result['output_path'],
+                            metadata=execution_result.get('manifest') or None
+                        )
+                        await io_pool.run(arrow_exchange.put, new_version.id, exchange_file)
+                    finally:
+                        arrow_exchange.discard(exchange_file)
+                        await io_pool.run(_remove_file, execution_result['output_path'])
+                
+                if execution_result['success']:
                     # 更新会话当前版本
-                    session.current_version_id = new_version['version_id']
+                    session.current_version_id = new_version.id
                     session.updated_at = datetime.utcnow()
-                    self.db.commit()
+                    await io_pool.run(self.db.commit)
                     
                     # 添加助手回复
-                    self.add_message(
+                    await io_pool.run(
+                        self.add_message,
                         session_id, 
                         "assistant", 
                         result['response'],
                         {
                             'action': result['action'],
                             'code': result['generated_code'],
-                            'version_id': new_version['version_id'],
+                            'version_id': new_version.id,
                             'rows_affected': execution_result.get('rows_affected', 0)
                         }
                     )
@@ -186,13 +239,14 @@ class SessionManager:
                         'status': 'success',
                         'message': result['response'],
                         'data_preview': execution_result.get('preview', []),
-                        'version_id': new_version['version_id'],
+                        'version_id': new_version.id,
                         'rows_affected': execution_result.get('rows_affected', 0)
                     }
                 else:
+                    arrow_exchange.discard(exchange_file)
                     # 执行失败
                     error_msg = f"代码执行失败: {execution_result['error']}"
-                    self.add_message(session_id, "assistant", error_msg)
+                    await io_pool.run(self.add_message, session_id, "assistant", error_msg)
                     
                     return {
                         'status': 'error',
@@ -201,17 +255,30 @@ class SessionManager:
                     }
             else:
                 # 意图理解失败
-                self.add_message(session_id, "assistant", result['message'])
+                await io_pool.run(self.add_message, session_id, "assistant", result['message'])
                 return result
                 
         except Exception as e:
             logger.error(f"处理用户输入时出错: {e}")
             error_msg = f"处理请求时出错: {str(e)}"
-            self.add_message(session_id, "assistant", error_msg)
+            await io_pool.run(self.add_message, session_id, "assistant", error_msg)
             return {
                 'status': 'error',
                 'message': error_msg
             }
+        finally:
+            arrow_exchange.release(pinned_file)
+    
+    def _get_session_project(self, session_id: str):
+        """查询会话及其项目，不存在时抛出异常"""
+        session = self.db.query(SessionModel).filter_by(id=session_id).first()
+        if not session:
+            raise ValueError("会话不存在")
+        
+        project = self.db.query(Project).filter_by(id=session.project_id).first()
+        if not project:
+            raise ValueError("项目不存在")
+        return session, project
     
     def get_active_sessions(self, project_id: str) -> List[Dict[str, Any]]:
         """获取项目的活跃会话"""
@@ -269,20 +336,34 @@ class SessionManager:
                 'message': str(e)
             }
     
-    def _get_current_data_file(self, session: SessionModel) -> Optional[str]:
-        """获取当前会话的数据文件路径"""
+    def _get_current_version(self, session: SessionModel) -> Optional[DataVersion]:
+        """会话的当前版本，未设置时为项目的最新版本"""
         if session.current_version_id:
             version = self.version_manager.get_version(session.current_version_id)
             if version:
-                return version['data_file_path']
-        
-        # 获取项目的最新版本
-        project = self.db.query(Project).filter_by(id=session.project_id).first()
-        if project and project.versions:
-            latest_version = project.versions[-1]
-            return latest_version.data_file_path
-        
-        return None
+                return version
+        return self.db.query(DataVersion).filter_by(
+            project_id=session.project_id
+        ).order_by(desc(DataVersion.created_at)).first()
+    
+    def _get_current_data_file(self, session: SessionModel, pipeline: bool = False) -> Optional[str]:
+        """当前版本在交换目录中的Arrow文件（沙箱输入），不存在时从快照转换
+
+        返回的文件已标记为使用中（arrow_exchange.acquire），调用方用完后需要 release。
+        当前版本是逻辑版本时，流水线模式下返回计划起点（base）的文件，新的步骤追加在计划之后；
+        否则（或计划已达到 PIPELINE_MAX_STEPS 步）先物化当前版本。
+        """
+        version = self._get_current_version(session)
+        if not version:
+            return None
+        plan = self.version_manager.pipeline_of(version)
+        if plan and pipeline and len(plan['steps']) < settings.PIPELINE_MAX_STEPS:
+            version = self.version_manager.get_version(plan['base'])
+        elif plan:
+            self.version_manager.materialize(version)
+        return arrow_exchange.acquire(
+            version.id, lambda path: self.version_manager.export_arrow(version.id, path)
+        )
     
     def close_session(self, session_id: str) -> bool:
         """关闭会话"""
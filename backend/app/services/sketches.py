@@ -0,0 +1,181 @@
+import polars as pl
+import numpy as np
+from typing import Dict, Any, List, Optional
+import base64
+import math
+import zlib
+
+# 固定哈希种子，保证同一polars版本下不同批次、不同进程生成的草图可以合并
+HASH_SEED = 0x5EED
+
+
+def _encode_array(array: np.ndarray) -> str:
+    """压缩并编码numpy数组，便于存入JSON"""
+    return base64.b64encode(zlib.compress(array.tobytes())).decode('ascii')
+
+
+def _decode_array(data: str, dtype) -> np.ndarray:
+    """解码 _encode_array 生成的字符串"""
+    return np.frombuffer(zlib.decompress(base64.b64decode(data)), dtype=dtype).copy()
+
+
+class HyperLogLog:
+    """HyperLogLog 去重计数草图
+
+    使用 2^p 个寄存器，相对标准误差约为 1.04 / sqrt(2^p)；p=12 时约 1.6%。
+    寄存器按位取最大值即可合并，合并结果与在全量数据上构建的草图一致。
+    """
+
+    def __init__(self, p: int = 12, registers: Optional[np.ndarray] = None):
+        if not 4 <= p <= 18:
+            raise ValueError(f"HyperLogLog精度必须在4到18之间: {p}")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    @property
+    def relative_error(self) -> float:
+        """相对标准误差"""
+        return 1.04 / math.sqrt(self.m)
+
+    def update(self, series: pl.Series) -> None:
+        """加入一批非空值"""
+        if len(series):
+            self.add_hashes(series.hash(seed=HASH_SEED).to_numpy())
+
+    def add_hashes(self, hashes: np.ndarray) -> None:
+        """加入64位哈希值"""
+        tail_bits = 64 - self.p
+        index = (hashes >> np.uint64(tail_bits)).astype(np.intp)
+        rest = hashes & np.uint64((1 << tail_bits) - 1)
+        # rho = 剩余位中首个1的位置（从高位数起）
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rho = (tail_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rho)
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        """合并另一个同精度草图"""
+        if other.p != self.p:
+            raise ValueError("只能合并相同精度的HyperLogLog")
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self) -> int:
+        """估算去重数量"""
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m * self.m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            # 小基数时使用线性计数
+            estimate = self.m * math.log(self.m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为JSON兼容的字典"""
+        return {
+            'type': 'hll',
+            'p': self.p,
+            'hash': f'polars-{pl.__version__}/{HASH_SEED}',
+            'registers': _encode_array(self.registers)
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HyperLogLog':
+        """从 to_dict 的结果恢复草图"""
+        return cls(data['p'], _decode_array(data['registers'], np.uint8))
+
+
+class KLLSketch:
+    """KLL 分位数草图
+
+    按层保存样本，第h层每个样本代表 2^h 个原始值。归一化秩误差约为
+    2.296 / k^0.9723（99%置信，k=200 时约 1.3%），与数据量无关。
+    """
+
+    def __init__(self, k: int = 200, seed: int = 0):
+        self.k = k
+        self.n = 0
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def rank_error(self) -> float:
+        """归一化秩误差"""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level: int) -> int:
+        """第level层的容量，越低的层容量越小"""
+        depth = len(self.levels) - level - 1
+        return max(int(math.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def update(self, values: np.ndarray) -> None:
+        """加入一批数值"""
+        if len(values):
+            self.levels[0] = np.concatenate([self.levels[0], np.asarray(values, dtype=np.float64)])
+            self.n += len(values)
+            self._compress()
+
+    def merge(self, other: 'KLLSketch') -> None:
+        """合并另一个草图"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._compress()
+
+    def _compress(self) -> None:
+        """超出容量的层排序后随机保留奇数位或偶数位，提升到上一层"""
+        h = 0
+        while h < len(self.levels):
+            if len(self.levels[h]) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                buffer = np.sort(self.levels[h])
+                # 奇数个样本时最后一个留在本层
+                leftover = buffer[-1:] if len(buffer) % 2 else buffer[:0]
+                paired = buffer[:len(buffer) - len(leftover)]
+                promoted = paired[self._rng.integers(2)::2]
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+                self.levels[h] = leftover
+            h += 1
+
+    def _weighted(self):
+        """返回按值排序的样本及其权重"""
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(level), 1 << h, dtype=np.int64)
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values, kind='stable')
+        return values[order], weights[order]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """估算分位数"""
+        if self.n == 0:
+            return None
+        values, weights = self._weighted()
+        cumulative = np.cumsum(weights)
+        index = int(np.searchsorted(cumulative, q * cumulative[-1], side='left'))
+        return float(values[min(index, len(values) - 1)])
+
+    def rank(self, value: float) -> float:
+        """估算小于value的值所占比例"""
+        if self.n == 0:
+            return 0.0
+        values, weights = self._weighted()
+        return float(weights[values < value].sum() / weights.sum())
+
+    def to_dict(self) -> Dict[str, Any]:
+        """序列化为JSON兼容的字典"""
+        return {
+            'type': 'kll',
+            'k': self.k,
+            'n': self.n,
+            'levels': [_encode_array(level) for level in self.levels]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'KLLSketch':
+        """从 to_dict 的结果恢复草图"""
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.levels = [_decode_array(level, np.float64) for level in data['levels']]
+        return sketch
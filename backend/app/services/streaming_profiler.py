@@ -0,0 +1,378 @@
+import polars as pl
+import numpy as np
+from typing import Dict, Any, List, Iterator, Optional
+import logging
+import math
+import os
+
+from .data_profiler import NUMERIC_DTYPES, SIGNED_NUMERIC_DTYPES, TEXT_DTYPES, CATEGORICAL_DTYPES
+from .sketches import HyperLogLog, KLLSketch
+from .duplicates import DuplicateCounter
+from .file_ingest import is_utf8, transcode_to_utf8
+
+logger = logging.getLogger(__name__)
+
+class ColumnAccumulator:
+    """单列的可合并统计累加器
+
+    计数、空值、最值、Welford均值/方差都可以精确合并；去重计数在超过
+    max_distinct（默认较小，宽表上由 StreamingProfiler 按列数分摊）后停止精确跟踪，
+    改为报告同时维护的 HyperLogLog 估计值；top-k 使用 Misra-Gries 摘要，计数误差
+    不超过 已见非空值数 / (capacity + 1)；中位数和IQR异常值基于固定大小的
+    bottom-k 随机样本估计。
+
+    approximate=True 时去重计数改用 HyperLogLog，中位数和分位数改用
+    KLL 草图，两者都可序列化保存并与其他批次的草图合并。
+    """
+
+    def __init__(self, name: str, dtype: pl.DataType, top_k: int = 10,
+                 max_distinct: int = 10_000, reservoir_size: int = 10_000,
+                 approximate: bool = False, hll_precision: int = 12, kll_k: int = 200):
+        self.name = name
+        self.dtype = dtype
+        self.top_k = top_k
+        self.max_distinct = max_distinct
+        self.reservoir_size = reservoir_size
+        self.approximate = approximate
+        self.hll_precision = hll_precision
+        self.kll_k = kll_k
+        self.capacity = max(top_k * 100, 1000)
+
+        self.is_numeric = dtype in NUMERIC_DTYPES
+        self.rows = 0
+        self.count = 0
+        self.null_count = 0
+        self.size = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.length_sum = 0
+        self.distinct = set()
+        self.distinct_exact = not approximate and max_distinct > 0
+        self.counters = {}
+        self.reservoir_keys = np.empty(0)
+        self.reservoir_values = np.empty(0)
+        self.sample = []
+        self.hll = HyperLogLog(hll_precision)
+        self.kll = KLLSketch(kll_k) if approximate and self.is_numeric else None
+
+    def update(self, series: pl.Series, rng: np.random.Generator) -> None:
+        """用一批数据更新累加器"""
+        partial = ColumnAccumulator(self.name, self.dtype, self.top_k,
+                                    self.max_distinct, self.reservoir_size,
+                                    self.approximate, self.hll_precision, self.kll_k)
+        # 已经停止精确跟踪时，单批数据也不再建立去重集合
+        partial.distinct_exact = self.distinct_exact
+        partial._consume(series, rng)
+        self.merge(partial)
+
+    def _consume(self, series: pl.Series, rng: np.random.Generator) -> None:
+        """计算单批数据的统计量"""
+        non_null = series.drop_nulls()
+        self.rows = len(series)
+        self.count = len(non_null)
+        self.null_count = self.rows - self.count
+        self.size = series.estimated_size()
+        if self.count == 0:
+            return
+
+        self.hll.update(non_null)
+
+        if self.is_numeric:
+            values = non_null.cast(pl.Float64)
+            self.min = values.min()
+            self.max = values.max()
+            self.mean = values.mean()
+            self.m2 = values.var(ddof=0) * self.count
+
+            if self.approximate:
+                self.kll.update(values.to_numpy())
+            else:
+                self._track_distinct(non_null.unique())
+                # bottom-k 采样：每个值分配随机键，保留键最小的k个，可直接合并
+                keys = rng.random(self.count)
+                keep = np.argsort(keys)[:self.reservoir_size]
+                self.reservoir_keys = keys[keep]
+                self.reservoir_values = values.to_numpy()[keep]
+        else:
+            value_counts = non_null.value_counts()
+            values = value_counts[value_counts.columns[0]].to_list()
+            counts = value_counts[value_counts.columns[1]].to_list()
+            self.counters = dict(zip(values, counts))
+            self._track_distinct(value_counts[value_counts.columns[0]])
+            self._prune_counters()
+            if self.dtype in CATEGORICAL_DTYPES:
+                self.length_sum = non_null.cast(pl.Utf8).str.len_chars().sum()
+            if self.dtype in TEXT_DTYPES:
+                self.sample = non_null.head(10).to_list()
+
+    def _track_distinct(self, unique: pl.Series) -> None:
+        """记录单批数据的去重值；超过 max_distinct 时不转换为Python对象，直接停止精确跟踪"""
+        if not self.distinct_exact:
+            return
+        if len(unique) > self.max_distinct:
+            self.distinct_exact = False
+            return
+        self.distinct = set(unique.to_list())
+
+    def merge(self, other: 'ColumnAccumulator') -> None:
+        """合并另一个累加器（同一列的另一部分数据）"""
+        total = self.count + other.count
+        if other.count:
+            # Chan等人的并行方差合并公式
+            delta = other.mean - self.mean
+            self.mean += delta * other.count / total
+            self.m2 += other.m2 + delta * delta * self.count * other.count / total
+            if other.min is not None:
+                self.min = other.min if self.min is None else min(self.min, other.min)
+                self.max = other.max if self.max is None else max(self.max, other.max)
+
+        self.rows += other.rows
+        self.count = total
+        self.null_count += other.null_count
+        self.size += other.size
+        self.length_sum += other.length_sum
+
+        self.hll.merge(other.hll)
+        if self.kll is not None:
+            self.kll.merge(other.kll)
+        if self.distinct_exact and other.distinct_exact:
+            self.distinct |= other.distinct
+            if len(self.distinct) > self.max_distinct:
+                self.distinct = set()
+                self.distinct_exact = False
+        else:
+            self.distinct = set()
+            self.distinct_exact = False
+
+        for value, count in other.counters.items():
+            self.counters[value] = self.counters.get(value, 0) + count
+        self._prune_counters()
+
+        if len(other.reservoir_keys):
+            keys = np.concatenate([self.reservoir_keys, other.reservoir_keys])
+            values = np.concatenate([self.reservoir_values, other.reservoir_values])
+            keep = np.argsort(keys)[:self.reservoir_size]
+            self.reservoir_keys = keys[keep]
+            self.reservoir_values = values[keep]
+
+        self.sample = (self.sample + other.sample)[:10]
+
+    def _prune_counters(self) -> None:
+        """Misra-Gries 剪枝：超过容量时所有计数减去第 capacity+1 大的计数"""
+        if len(self.counters) <= self.capacity:
+            return
+        threshold = sorted(self.counters.values(), reverse=True)[self.capacity]
+        self.counters = {
+            value: count - threshold
+            for value, count in self.counters.items()
+            if count > threshold
+        }
+
+    def _unique_count(self) -> int:
+        """去重数量，空值与 n_unique 一样计为一个值；不再精确跟踪时为HyperLogLog估计值"""
+        if self.distinct_exact:
+            distinct = len(self.distinct)
+        else:
+            distinct = self.hll.count()
+        return distinct + (1 if self.null_count else 0)
+
+    def result(self) -> Dict[str, Any]:
+        """输出与单次扫描聚合同名的统计量"""
+        stats = {
+            'null_count': self.null_count,
+            'unique_count': self._unique_count(),
+            'size': self.size
+        }
+
+        if self.is_numeric:
+            std = math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None
+            sample = pl.Series(self.reservoir_values)
+            if self.approximate:
+                median = self.kll.quantile(0.5)
+            else:
+                median = sample.median() if len(sample) else None
+            stats.update({
+                'min': self.min,
+                'max': self.max,
+                'mean': self.mean if self.count else None,
+                'median': median,
+                'std': std
+            })
+            if self.dtype in SIGNED_NUMERIC_DTYPES:
+                outliers = 0
+                if self.approximate and self.count:
+                    q1 = self.kll.quantile(0.25)
+                    q3 = self.kll.quantile(0.75)
+                    lower_bound = q1 - 1.5 * (q3 - q1)
+                    upper_bound = q3 + 1.5 * (q3 - q1)
+                    # 低于下界的比例 + 高于上界的比例（由秩估计）
+                    outlier_rate = self.kll.rank(lower_bound) + 1 - self.kll.rank(np.nextafter(upper_bound, np.inf))
+                    outliers = int(round(outlier_rate * self.count))
+                elif len(sample):
+                    q1 = sample.quantile(0.25)
+                    q3 = sample.quantile(0.75)
+                    lower_bound = q1 - 1.5 * (q3 - q1)
+                    upper_bound = q3 + 1.5 * (q3 - q1)
+                    outlier_rate = ((sample < lower_bound) | (sample > upper_bound)).mean()
+                    outliers = int(round(outlier_rate * self.count))
+                stats.update({'count': self.count, 'outliers': outliers})
+        else:
+            top = sorted(self.counters.items(), key=lambda item: item[1], reverse=True)[:self.top_k]
+            stats['top_values'] = [{self.name: value, 'count': count} for value, count in top]
+            if self.dtype in CATEGORICAL_DTYPES:
+                stats['avg_length'] = self.length_sum / self.count if self.count else None
+            if self.dtype in TEXT_DTYPES:
+                stats['sample'] = self.sample
+
+        return stats
+
+    def sketches(self) -> Dict[str, Any]:
+        """序列化的草图，可随版本保存后再合并"""
+        result = {'distinct': self.hll.to_dict()}
+        if self.kll is not None:
+            result['quantiles'] = self.kll.to_dict()
+        return result
+
+
+class StreamingProfiler:
+    """流式数据探查：按批读取文件并合并每批的统计量，内存占用与文件大小无关"""
+
+    def __init__(self, batch_size: int = 100_000, top_k: int = 10,
+                 max_distinct: int = 10_000, reservoir_size: int = 10_000, seed: int = 0,
+                 approximate: bool = False, hll_precision: int = 12, kll_k: int = 200,
+                 duplicate_groups: int = 0, max_duplicate_hashes: int = 2_000_000,
+                 distinct_budget: int = 1_000_000):
+        self.batch_size = batch_size
+        self.top_k = top_k
+        self.max_distinct = max_distinct
+        self.reservoir_size = reservoir_size
+        self.seed = seed
+        self.approximate = approximate
+        self.hll_precision = hll_precision
+        self.kll_k = kll_k
+        self.duplicate_groups = duplicate_groups
+        self.max_duplicate_hashes = max_duplicate_hashes
+        self.distinct_budget = distinct_budget
+
+    def profile_file(self, file_path: str, encoding: str = 'utf-8', separator: Optional[str] = None) -> Dict[str, Any]:
+        """流式读取文件，返回schema、各列统计量和首尾样本"""
+        rng = np.random.default_rng(self.seed)
+        schema = None
+        accumulators: List[ColumnAccumulator] = []
+        duplicates = DuplicateCounter(top_k=self.duplicate_groups, max_hashes=self.max_duplicate_hashes)
+        head_df = None
+        tail_df = None
+        rows = 0
+        batches = 0
+
+        for batch in iter_batches(file_path, self.batch_size, encoding, separator):
+            if schema is None:
+                schema = batch.schema
+                # 所有列精确去重集合的总大小不超过 distinct_budget，列数多时每列的上限相应降低
+                max_distinct = min(self.max_distinct, self.distinct_budget // max(len(schema), 1))
+                accumulators = [
+                    ColumnAccumulator(col, dtype, self.top_k, max_distinct, self.reservoir_size,
+                                      self.approximate, self.hll_precision, self.kll_k)
+                    for col, dtype in schema.items()
+                ]
+                head_df = batch.head(5)
+            elif batch.schema != schema:
+                # 后续批次推断出的类型可能不同，统一到首批schema
+                batch = batch.cast(dict(schema), strict=False)
+
+            for acc in accumulators:
+                acc.update(batch[acc.name], rng)
+            duplicates.update(batch)
+
+            tail_df = batch.tail(5) if tail_df is None else pl.concat([tail_df, batch.tail(5)]).tail(5)
+            rows += len(batch)
+            batches += 1
+
+        if schema is None:
+            raise ValueError(f"文件为空: {file_path}")
+
+        def reread() -> Iterator[pl.DataFrame]:
+            # 重复行组的示例行在第二遍读取中查找（只在需要报告重复行组时）
+            for batch in iter_batches(file_path, self.batch_size, encoding, separator):
+                yield batch if batch.schema == schema else batch.cast(dict(schema), strict=False)
+
+        return {
+            'schema': pl.Schema(schema),
+            'rows': rows,
+            'columns': [acc.result() for acc in accumulators],
+            'distinct_exact': all(acc.distinct_exact for acc in accumulators),
+            'duplicates': duplicates.count(),
+            'duplicates_exact': duplicates.exact,
+            'duplicate_groups': duplicates.top_groups(batches=reread()),
+            'sketches': {acc.name: acc.sketches() for acc in accumulators} if self.approximate else {},
+            'head': head_df,
+            'tail': tail_df,
+            'batches': batches
+        }
+
+
+def iter_batches(file_path: str, batch_size: int, encoding: str = 'utf-8',
+                 separator: Optional[str] = None) -> Iterator[pl.DataFrame]:
+    """按批读取CSV/TSV/Parquet/Excel文件"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+
+    if file_ext in ['.csv', '.tsv']:
+        separator = separator or ('\t' if file_ext == '.tsv' else ',')
+        transcoded = None
+        if not is_utf8(encoding):
+            transcoded = transcode_to_utf8(file_path, encoding)
+            file_path = transcoded
+        try:
+            if hasattr(pl.LazyFrame, 'collect_batches'):
+                lf = pl.scan_csv(file_path, separator=separator, infer_schema_length=10000)
+                yield from lf.collect_batches(chunk_size=batch_size)
+            else:
+                reader = pl.read_csv_batched(file_path, separator=separator,
+                                             batch_size=batch_size, infer_schema_length=10000)
+                while True:
+                    chunk = reader.next_batches(1)
+                    if not chunk:
+                        break
+                    yield chunk[0]
+        finally:
+            if transcoded:
+                os.remove(transcoded)
+    elif file_ext == '.parquet':
+        lf = pl.scan_parquet(file_path)
+        if hasattr(pl.LazyFrame, 'collect_batches'):
+            yield from lf.collect_batches(chunk_size=batch_size)
+        else:
+            # 切片会下推到Parquet读取器，只解码覆盖该范围的行组
+            total_rows = lf.select(pl.len()).collect().item()
+            for offset in range(0, total_rows, batch_size):
+                yield lf.slice(offset, batch_size).collect()
+    elif file_ext in ['.xlsx', '.xls']:
+        yield from _iter_excel_batches(file_path, batch_size)
+    else:
+        raise ValueError(f"不支持的文件格式: {file_ext}")
+
+
+def _iter_excel_batches(file_path: str, batch_size: int) -> Iterator[pl.DataFrame]:
+    """使用openpyxl只读模式逐行读取首个工作表"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(col) if col is not None else f"column_{i}" for i, col in enumerate(header)]
+
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= batch_size:
+                yield pl.DataFrame(buffer, schema=columns, orient='row', infer_schema_length=None)
+                buffer = []
+        if buffer:
+            yield pl.DataFrame(buffer, schema=columns, orient='row', infer_schema_length=None)
+    finally:
+        workbook.close()
@@ -0,0 +1,188 @@
+import asyncio
+import codecs
+import hashlib
+import queue
+import threading
+from typing import Any, BinaryIO, Dict, Optional
+import logging
+
+from fastapi import UploadFile
+
+from ..core.config import settings
+from ..core.minio_client import MinIOClient
+
+logger = logging.getLogger(__name__)
+
+class UploadAborted(IOError):
+    """对象存储上传已结束（失败），无法继续写入"""
+
+
+class ChunkPipe:
+    """有界的字节管道：请求处理协程写入分块，上传线程按分段读取
+
+    队列满时写入方在事件循环上等待（不占用线程），读取方每取出一个分块唤醒写入方；
+    内存占用不超过 max_chunks 个分块加一个上传分段。指定 sink 时读取方把取出的分块
+    同时写入该文件，磁盘写入也不在事件循环上进行。
+    """
+
+    def __init__(self, max_chunks: int = 16, sink: Optional[BinaryIO] = None):
+        self.queue: "queue.Queue[Optional[bytes]]" = queue.Queue(maxsize=max_chunks)
+        self.sink = sink
+        self.buffer = bytearray()
+        self.eof = False
+        self.reader_done = False
+        self.error: Optional[BaseException] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._space: Optional[asyncio.Event] = None
+
+    async def write(self, chunk: Optional[bytes]) -> None:
+        """写入一个分块（None表示结束）；读取方已结束（上传失败）时抛出异常"""
+        if self._space is None:
+            self._loop = asyncio.get_running_loop()
+            self._space = asyncio.Event()
+        while True:
+            # 先清除再尝试：之后读取方取出分块时的唤醒不会丢失
+            self._space.clear()
+            if self.reader_done:
+                raise UploadAborted("对象存储上传已中止")
+            try:
+                self.queue.put_nowait(chunk)
+                return
+            except queue.Full:
+                await self._space.wait()
+
+    async def close(self) -> None:
+        """写入结束"""
+        await self.write(None)
+
+    def abort(self, error: BaseException) -> None:
+        """写入方出错，让读取方以异常结束上传"""
+        self.error = error
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def _wake_writer(self) -> None:
+        """在读取线程中唤醒等待队列空位的写入方"""
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._space.set)
+            except RuntimeError:
+                # 事件循环已关闭（请求已结束）
+                pass
+
+    def read(self, size: int = -1) -> bytes:
+        """读取最多size个字节，结束时返回b''"""
+        while not self.eof and (size < 0 or len(self.buffer) < size):
+            chunk = self.queue.get()
+            self._wake_writer()
+            if self.error is not None:
+                raise IOError(f"上传数据读取中止: {self.error}")
+            if chunk is None:
+                self.eof = True
+            else:
+                if self.sink is not None:
+                    self.sink.write(chunk)
+                self.buffer += chunk
+        if size < 0 or size > len(self.buffer):
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def finish_reading(self) -> None:
+        """读取方结束（成功或失败），之后的写入不再等待"""
+        self.reader_done = True
+        self._wake_writer()
+
+
+async def receive_upload(upload: UploadFile, file_path: str, minio_client: MinIOClient,
+                         bucket_name: str, object_name: Optional[str]) -> Dict[str, Any]:
+    """分块读取上传内容，一遍完成：写入本地文件、计算SHA-256、校验UTF-8、分段上传对象存储
+
+    本地文件供后续接入（编码检测、schema）使用。每个上传使用一个专用的上传线程，
+    从管道读取分块、写入本地文件并上传对象存储，与请求内容的读取并发进行；
+    不占用事件循环的默认执行器和I/O池，并发上传多时也不会互相阻塞。
+    object_name 为None时只接收到本地，不上传。
+    """
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+    utf8_valid = True
+    size = 0
+    upload_task = loop.create_future()
+    sink = open(file_path, 'wb')
+    pipe = ChunkPipe(settings.UPLOAD_QUEUE_CHUNKS, sink=sink)
+
+    def put_object() -> bool:
+        if object_name is None:
+            # 不上传时只把管道中的数据写入本地文件
+            while pipe.read(settings.UPLOAD_CHUNK_BYTES):
+                pass
+            return True
+        return minio_client.put_stream(bucket_name, object_name, pipe,
+                                       part_size=settings.UPLOAD_PART_SIZE_MB * 1024 * 1024)
+
+    def upload_thread() -> None:
+        try:
+            result, error = put_object(), None
+        except BaseException as e:
+            result, error = None, e
+        finally:
+            pipe.finish_reading()
+            sink.close()
+        try:
+            loop.call_soon_threadsafe(_settle, upload_task, result, error)
+        except RuntimeError:
+            pass
+
+    threading.Thread(target=upload_thread, name='upload-stream', daemon=True).start()
+    try:
+        while True:
+            chunk = await upload.read(settings.UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            digest.update(chunk)
+            if utf8_valid:
+                try:
+                    utf8_decoder.decode(chunk)
+                except UnicodeDecodeError:
+                    utf8_valid = False
+            size += len(chunk)
+            await pipe.write(chunk)
+        if utf8_valid:
+            try:
+                utf8_decoder.decode(b'', final=True)
+            except UnicodeDecodeError:
+                utf8_valid = False
+        await pipe.close()
+    except UploadAborted:
+        # 上传线程已失败退出，结果以其返回值为准
+        pass
+    except BaseException as e:
+        pipe.abort(e)
+        await asyncio.gather(upload_task, return_exceptions=True)
+        raise
+
+    try:
+        uploaded = await upload_task
+    except Exception as e:
+        logger.error(f"流式上传失败: {e}")
+        uploaded = False
+
+    return {
+        'content_hash': digest.hexdigest(),
+        'size': size,
+        'utf8_valid': utf8_valid,
+        'uploaded': uploaded
+    }
+
+def _settle(future: asyncio.Future, result: Any, error: Optional[BaseException]) -> None:
+    """在事件循环上设置上传线程的结果（请求已取消时忽略）"""
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
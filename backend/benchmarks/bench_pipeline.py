@@ -0,0 +1,135 @@
+"""多步转换的执行方式：逐步物化 vs 流水线模式的单个惰性计划（app.core.sandbox_runner）
+
+- stepwise: 每一步作为一个任务执行，读取上一步的Arrow文件，写出Parquet快照和Arrow副本（非流水线模式的每轮对话）
+- preview:  流水线模式每轮的预览：整个计划只计算前 preview_rows 行，不写快照（按步数累计）
+- fused:    所有步骤组合为一个计划，一次流式执行，只写最终的快照和Arrow副本（物化最后一个逻辑版本）
+
+在本进程中调用运行器的 run_job，不包含沙箱进程的开销。结果以JSON Lines追加写入结果文件。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_pipeline
+    python -m benchmarks.bench_pipeline --rows 5000000 --iterations 5
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import polars as pl
+
+from app.core.sandbox_runner import run_job
+from benchmarks.bench_profiler import git_commit
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'pipeline.jsonl')
+
+# 一次清洗对话的六步（与 AgentOrchestrator.generate_polars_code 生成的代码形式相同）
+STEPS = [
+    "result_df = df.filter(pl.col('amount').is_not_null())",
+    "result_df = df.with_columns(pl.col('amount').fill_null(0))",
+    "result_df = df.with_columns(pl.col('city').str.to_uppercase().alias('city_upper'))",
+    "result_df = df.filter(pl.col('amount') > 100)",
+    "result_df = df.drop(['note'])",
+    "result_df = df.sort('amount', descending=True)"
+]
+
+
+def summarize(durations: List[float]) -> Dict[str, Any]:
+    return {
+        'iterations': len(durations),
+        'mean_ms': round(statistics.mean(durations), 2),
+        'p50_ms': round(statistics.median(durations), 2),
+        'max_ms': round(max(durations), 2)
+    }
+
+
+def checked(job: Dict[str, Any]) -> Dict[str, Any]:
+    result = run_job(job)
+    if not result.get('success'):
+        raise RuntimeError(result.get('error'))
+    return result
+
+
+def stepwise(input_path: str, work_dir: str) -> None:
+    current = input_path
+    for index, code in enumerate(STEPS):
+        exchange_path = os.path.join(work_dir, f'step{index}.arrow')
+        checked({'code': code, 'input_path': current,
+                 'output_path': os.path.join(work_dir, f'step{index}.parquet'),
+                 'exchange_path': exchange_path})
+        current = exchange_path
+
+
+def preview(input_path: str, work_dir: str, rows: int) -> None:
+    for count in range(1, len(STEPS) + 1):
+        checked({'steps': STEPS[:count], 'input_path': input_path, 'limit': rows,
+                 'output_path': os.path.join(work_dir, 'preview.parquet')})
+
+
+def fused(input_path: str, work_dir: str) -> Dict[str, Any]:
+    return checked({'steps': STEPS, 'input_path': input_path,
+                    'output_path': os.path.join(work_dir, 'fused.parquet'),
+                    'exchange_path': os.path.join(work_dir, 'fused.arrow')})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000, help='输入数据的行数')
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--preview-rows', type=int, default=20)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-pipeline-')
+    try:
+        input_path = os.path.join(work_dir, 'input.arrow')
+        pl.DataFrame({
+            'id': range(args.rows),
+            'city': [f'city{i % 300}' for i in range(args.rows)],
+            'amount': [None if i % 13 == 0 else (i * 7919 % 1000) / 2 for i in range(args.rows)],
+            'note': [f'note {i % 1000}' for i in range(args.rows)]
+        }).write_ipc(input_path, compression='uncompressed')
+
+        timings: Dict[str, List[float]] = {'stepwise': [], 'preview': [], 'fused': []}
+        for _ in range(args.iterations):
+            for name, run in (('stepwise', lambda: stepwise(input_path, work_dir)),
+                              ('preview', lambda: preview(input_path, work_dir, args.preview_rows)),
+                              ('fused', lambda: fused(input_path, work_dir))):
+                started = time.perf_counter()
+                run()
+                timings[name].append((time.perf_counter() - started) * 1000)
+
+        # 两种方式的结果应一致
+        result = fused(input_path, work_dir)
+        same = pl.read_parquet(os.path.join(work_dir, 'fused.parquet')).equals(
+            pl.read_parquet(os.path.join(work_dir, f'step{len(STEPS) - 1}.parquet')))
+        record = {
+            'commit': git_commit(),
+            'time': datetime.utcnow().isoformat(),
+            'rows': args.rows,
+            'steps': len(STEPS),
+            'polars': pl.__version__,
+            'results_equal': same,
+            'breakers': result['pipeline']['breakers'],
+            **{name: summarize(durations) for name, durations in timings.items()}
+        }
+        record['speedup'] = round(record['stepwise']['mean_ms'] / record['fused']['mean_ms'], 1)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
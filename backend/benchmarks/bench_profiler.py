@@ -0,0 +1,328 @@
+"""DataProfiler 和 VersionManager._get_data_metadata 的基准测试
+
+每个用例（数据规模 x 格式 x 目标函数）在独立子进程中运行，记录墙钟时间、
+峰值RSS和吞吐量（行/秒、MB/秒），结果以JSON Lines追加写入结果文件，
+每条记录带有当前git提交，便于比较不同提交之间的性能。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_profiler                         # quick 预设
+    python -m benchmarks.bench_profiler --preset full
+    python -m benchmarks.bench_profiler --rows 1000,100000 --columns 5,500 \\
+        --formats csv,parquet --targets profile,streaming --null-rate 0.2
+    python -m benchmarks.bench_profiler --compare abc1234 def5678
+
+生成的数据缓存在 --data-dir 中，参数相同的用例重复运行时不再重新生成。
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 基准测试不需要数据库连接
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+from benchmarks import datagen
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'profiler.jsonl')
+DEFAULT_DATA_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'data')
+
+TARGETS = ['profile', 'streaming', 'approximate', 'sample', 'metadata']
+
+# 预设用例：(行数, 列数)
+PRESETS = {
+    'quick': {
+        'shapes': [(1_000, 5), (100_000, 5), (100_000, 50), (10_000, 500)],
+        'formats': ['csv', 'gbk_csv', 'xlsx', 'parquet'],
+        'targets': ['profile', 'metadata']
+    },
+    'full': {
+        'shapes': [(1_000, 5), (100_000, 20), (1_000_000, 20), (10_000_000, 5),
+                   (100_000_000, 5), (10_000, 500), (10_000, 5_000)],
+        'formats': ['csv', 'gbk_csv', 'xlsx', 'parquet'],
+        'targets': ['profile', 'streaming', 'approximate', 'sample', 'metadata']
+    }
+}
+
+# 各格式生成数据时的单元格数上限，超出的组合跳过（xlsx写出很慢且有行数上限）
+MAX_CELLS = {
+    'xlsx': 2_000_000
+}
+
+
+def git_commit() -> Optional[str]:
+    """当前git提交（工作区有改动时加 -dirty 后缀）"""
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                                         stderr=subprocess.DEVNULL, text=True).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD', '--', 'app'], cwd=BACKEND_DIR,
+                                stderr=subprocess.DEVNULL)
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def dataset_path(data_dir: str, case: Dict[str, Any]) -> str:
+    """按生成参数确定缓存的数据文件路径"""
+    name = (f"{case['format']}_r{case['rows']}_c{case['columns']}_n{case['null_rate']}"
+            f"_k{case['cardinality']}_{case['dtype_mix'].replace(':', '').replace(',', '-')}_s{case['seed']}")
+    return os.path.join(data_dir, name + datagen.FORMATS[case['format']])
+
+
+def ensure_dataset(data_dir: str, case: Dict[str, Any]) -> str:
+    """生成（或复用已缓存的）数据文件"""
+    path = dataset_path(data_dir, case)
+    if not os.path.exists(path):
+        os.makedirs(data_dir, exist_ok=True)
+        tmp_path = path + '.tmp' + datagen.FORMATS[case['format']]
+        datagen.write_dataset(tmp_path, case['format'], case['rows'], case['columns'],
+                              dtype_mix=case['dtype_mix'], null_rate=case['null_rate'],
+                              cardinality=case['cardinality'], seed=case['seed'])
+        os.replace(tmp_path, path)
+    return path
+
+
+def run_target(target: str, file_path: str) -> None:
+    """在当前进程中执行一次目标函数"""
+    if target == 'metadata':
+        from app.core.version_manager import VersionManager
+        # _get_data_metadata 不使用数据库和对象存储
+        metadata = VersionManager.__new__(VersionManager)._get_data_metadata(file_path)
+        if 'error' in metadata:
+            raise RuntimeError(metadata['error'])
+        return
+
+    from app.services.data_profiler import DataProfiler
+    profiler = DataProfiler()
+    if target == 'profile':
+        profiler.profile_data(file_path)
+    elif target == 'streaming':
+        profiler.profile_data(file_path, streaming=True)
+    elif target == 'approximate':
+        profiler.profile_data(file_path, approximate=True)
+    elif target == 'sample':
+        profiler.profile_sample(file_path)
+    else:
+        raise ValueError(f"未知目标: {target}")
+
+
+def peak_rss_kb() -> int:
+    """当前进程的峰值RSS（KB）
+
+    Linux下 ru_maxrss 会跨 exec 继承父进程的峰值，优先读取 /proc 中按进程地址空间统计的 VmHWM。
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def worker(target: str, file_path: str) -> None:
+    """子进程入口：导入完成后计时执行目标函数，最后一行输出JSON结果"""
+    import polars  # noqa: F401  导入开销不计入
+    import app.services.data_profiler  # noqa: F401
+
+    baseline_rss = peak_rss_kb()
+    started = time.perf_counter()
+    error = None
+    try:
+        # 探查过程中的调试输出不混入结果
+        with open(os.devnull, 'w') as devnull:
+            stdout, sys.stdout = sys.stdout, devnull
+            try:
+                run_target(target, file_path)
+            finally:
+                sys.stdout = stdout
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        'seconds': elapsed,
+        'peak_rss_kb': peak_rss_kb(),
+        'baseline_rss_kb': baseline_rss,
+        'error': error
+    }))
+
+
+def run_case(case: Dict[str, Any], file_path: str, timeout: Optional[float]) -> Dict[str, Any]:
+    """在独立子进程中运行用例，峰值RSS不受其他用例影响"""
+    try:
+        proc = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_profiler', '--worker', case['target'], file_path],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        return {'error': f'超时（{timeout}秒）'}
+
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        return {'error': (proc.stderr.strip().splitlines() or ['子进程异常退出'])[-1]}
+    return json.loads(lines[-1])
+
+
+def build_cases(args) -> List[Dict[str, Any]]:
+    """根据预设或命令行参数展开用例"""
+    preset = PRESETS[args.preset]
+    if args.rows or args.columns:
+        rows = [int(float(x)) for x in (args.rows or '1000').split(',')]
+        columns = [int(x) for x in (args.columns or '5').split(',')]
+        shapes = list(itertools.product(rows, columns))
+    else:
+        shapes = preset['shapes']
+    formats = args.formats.split(',') if args.formats else preset['formats']
+    targets = args.targets.split(',') if args.targets else preset['targets']
+
+    for name in formats:
+        if name not in datagen.FORMATS:
+            raise SystemExit(f"不支持的格式: {name}")
+    for name in targets:
+        if name not in TARGETS:
+            raise SystemExit(f"未知目标: {name}")
+
+    cases = []
+    for (rows, columns), fmt, target in itertools.product(shapes, formats, targets):
+        cases.append({
+            'target': target,
+            'format': fmt,
+            'rows': rows,
+            'columns': columns,
+            'dtype_mix': args.dtype_mix,
+            'null_rate': args.null_rate,
+            'cardinality': args.cardinality,
+            'seed': args.seed
+        })
+    return cases
+
+
+def skip_reason(case: Dict[str, Any]) -> Optional[str]:
+    """无法运行的用例组合"""
+    if case['format'] == 'xlsx' and case['rows'] > datagen.XLSX_MAX_ROWS:
+        return 'xlsx行数超出上限'
+    limit = MAX_CELLS.get(case['format'])
+    if limit and case['rows'] * case['columns'] > limit:
+        return f"单元格数超过 {limit}"
+    return None
+
+
+def run_suite(args) -> None:
+    cases = build_cases(args)
+    commit = git_commit()
+    environment = {
+        'commit': commit,
+        'python': platform.python_version(),
+        'polars': __import__('polars').__version__,
+        'cpu_count': os.cpu_count(),
+        'platform': platform.platform()
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+
+    print(f"{'目标':<12} {'格式':<8} {'行数':>11} {'列数':>5} {'耗时(s)':>9} {'峰值RSS(MB)':>12} "
+          f"{'行/秒':>12} {'MB/秒':>8}")
+    for case in cases:
+        record = {'timestamp': datetime.utcnow().isoformat(), **environment, **case}
+        reason = skip_reason(case)
+        if reason:
+            record.update({'status': 'skipped', 'error': reason})
+        else:
+            file_path = ensure_dataset(args.data_dir, case)
+            file_mb = os.path.getsize(file_path) / (1024 * 1024)
+            best = None
+            for _ in range(args.repeat):
+                result = run_case(case, file_path, args.timeout)
+                if result.get('error'):
+                    best = result
+                    break
+                if best is None or result['seconds'] < best['seconds']:
+                    best = result
+            record['file_mb'] = round(file_mb, 3)
+            if best.get('error'):
+                record.update({'status': 'failed', 'error': best['error']})
+            else:
+                seconds = best['seconds']
+                record.update({
+                    'status': 'ok',
+                    'seconds': round(seconds, 4),
+                    'peak_rss_mb': round(best['peak_rss_kb'] / 1024, 1),
+                    'baseline_rss_mb': round(best['baseline_rss_kb'] / 1024, 1),
+                    'rows_per_sec': round(case['rows'] / seconds, 1),
+                    'mb_per_sec': round(file_mb / seconds, 2)
+                })
+
+        with open(args.output, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+        if record['status'] == 'ok':
+            print(f"{case['target']:<12} {case['format']:<8} {case['rows']:>11} {case['columns']:>5} "
+                  f"{record['seconds']:>9.3f} {record['peak_rss_mb']:>12.1f} "
+                  f"{record['rows_per_sec']:>12.0f} {record['mb_per_sec']:>8.2f}")
+        else:
+            print(f"{case['target']:<12} {case['format']:<8} {case['rows']:>11} {case['columns']:>5} "
+                  f"{record['status']}: {record['error']}")
+
+
+def compare(results_path: str, base: str, head: str) -> None:
+    """比较两个提交在相同用例上的耗时和峰值RSS（取各自最近一次结果）"""
+    latest: Dict[str, Dict[tuple, Dict[str, Any]]] = {base: {}, head: {}}
+    with open(results_path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get('status') != 'ok':
+                continue
+            commit = (record.get('commit') or '').replace('-dirty', '')
+            for wanted in latest:
+                if commit and commit.startswith(wanted):
+                    key = tuple(record[k] for k in ['target', 'format', 'rows', 'columns', 'dtype_mix',
+                                                    'null_rate', 'cardinality', 'seed'])
+                    latest[wanted][key] = record
+
+    print(f"{'目标':<12} {'格式':<8} {'行数':>11} {'列数':>5} {'耗时比':>8} {'RSS比':>8}")
+    for key in sorted(set(latest[base]) & set(latest[head])):
+        old, new = latest[base][key], latest[head][key]
+        print(f"{key[0]:<12} {key[1]:<8} {key[2]:>11} {key[3]:>5} "
+              f"{new['seconds'] / old['seconds']:>8.2f} {new['peak_rss_mb'] / old['peak_rss_mb']:>8.2f}")
+
+
+def main():
+    if len(sys.argv) == 4 and sys.argv[1] == '--worker':
+        worker(sys.argv[2], sys.argv[3])
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='quick')
+    parser.add_argument('--rows', help='逗号分隔的行数，如 1e3,1e6')
+    parser.add_argument('--columns', help='逗号分隔的列数')
+    parser.add_argument('--formats', help=f"逗号分隔，可选 {','.join(datagen.FORMATS)}")
+    parser.add_argument('--targets', help=f"逗号分隔，可选 {','.join(TARGETS)}")
+    parser.add_argument('--dtype-mix', default=datagen.DEFAULT_DTYPE_MIX)
+    parser.add_argument('--null-rate', type=float, default=0.05)
+    parser.add_argument('--cardinality', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=1, help='每个用例运行次数，记录最短耗时')
+    parser.add_argument('--timeout', type=float, default=None, help='单个用例的超时时间（秒）')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'HEAD'), help='比较两个提交的结果')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(args.output, *args.compare)
+    else:
+        run_suite(args)
+
+
+if __name__ == '__main__':
+    main()
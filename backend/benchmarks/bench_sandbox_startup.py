@@ -0,0 +1,179 @@
+"""沙箱运行器启动延迟：冷启动（每个任务新起解释器）vs 预热运行器（app.core.sandbox_runner）
+
+- import:    新起解释器并导入polars/pyarrow的耗时（每个任务新建容器时必须承担的部分）
+- startup:   启动运行器到就绪（导入、预热、开始监听）的耗时
+- cold_job:  启动运行器、执行一个任务再退出的总耗时（旧的每个请求一个容器的方式，不含容器本身开销）
+- warm_job:  在已就绪的运行器上执行一个任务的耗时
+- container: 指定 --image 且Docker可用时，启动沙箱容器到运行器就绪的耗时（app.core.sandbox_pool）
+
+结果以JSON Lines追加写入结果文件。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_sandbox_startup
+    python -m benchmarks.bench_sandbox_startup --iterations 10 --rows 100000 --image dp-agent-sandbox:latest
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import polars as pl
+
+from benchmarks.bench_profiler import git_commit
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'sandbox_startup.jsonl')
+RUNNER = os.path.join(BACKEND_DIR, 'app', 'core', 'sandbox_runner.py')
+CODE = "result_df = df.filter(pl.col('value') > 0.5).group_by('key').agg(pl.col('value').mean())"
+
+
+def summarize(durations: List[float]) -> Dict[str, Any]:
+    return {
+        'iterations': len(durations),
+        'mean_ms': round(statistics.mean(durations), 2),
+        'p50_ms': round(statistics.median(durations), 2),
+        'max_ms': round(max(durations), 2)
+    }
+
+
+def timed(fn: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """执行 iterations 次，返回每次耗时的统计（毫秒）；失败时记录错误"""
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+        durations.append((time.perf_counter() - started) * 1000)
+    return summarize(durations)
+
+
+class LocalRunner:
+    """在子进程中启动运行器，复用 SandboxWorker 的套接字协议"""
+
+    def __init__(self, python: str, work_dir: str):
+        from app.core.sandbox_pool import SandboxWorker
+        self.dir = tempfile.mkdtemp(dir=work_dir)
+        self.worker = SandboxWorker('bench', None, self.dir)
+        self.process = subprocess.Popen([python, RUNNER, '--serve', self.worker.socket_path])
+
+    def wait_ready(self) -> None:
+        self.worker.wait_ready(timeout=120)
+
+    def run(self, input_path: str) -> None:
+        result = self.worker.call({'code': CODE, 'input_path': input_path,
+                                   'output_path': os.path.join(self.dir, 'output.parquet')}, timeout=120)
+        if not result.get('success'):
+            raise RuntimeError(result.get('error'))
+
+    def close(self) -> None:
+        self.process.kill()
+        self.process.wait()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def bench_local(python: str, iterations: int, input_path: str, work_dir: str) -> Dict[str, Any]:
+    imports = "import polars\ntry:\n    import pyarrow\nexcept ImportError:\n    pass"
+    record = {'import': timed(lambda: subprocess.run([python, '-c', imports], check=True), iterations)}
+
+    def startup():
+        runner = LocalRunner(python, work_dir)
+        try:
+            runner.wait_ready()
+        finally:
+            runner.close()
+
+    def cold_job():
+        runner = LocalRunner(python, work_dir)
+        try:
+            runner.wait_ready()
+            runner.run(input_path)
+        finally:
+            runner.close()
+
+    record['startup'] = timed(startup, iterations)
+    record['cold_job'] = timed(cold_job, iterations)
+
+    runner = LocalRunner(python, work_dir)
+    try:
+        runner.wait_ready()
+        runner.run(input_path)
+        record['warm_job'] = timed(lambda: runner.run(input_path), iterations * 5)
+    finally:
+        runner.close()
+    if 'mean_ms' in record['cold_job'] and 'mean_ms' in record['warm_job']:
+        record['speedup'] = round(record['cold_job']['mean_ms'] / record['warm_job']['mean_ms'], 1)
+    return record
+
+
+def bench_container(image: str, iterations: int, work_dir: str) -> Dict[str, Any]:
+    """启动沙箱容器到运行器就绪的耗时"""
+    try:
+        import docker
+        client = docker.from_env()
+        client.ping()
+    except Exception as e:
+        return {'skipped': f'Docker不可用: {e}'}
+    from app.core.sandbox_pool import WarmContainerPool
+    pool = WarmContainerPool(client, image=image, shared_dir=os.path.join(work_dir, 'pool'),
+                             size=1, min_warm=0, max_warm=0)
+    # 不调用 pool.start()：它会清理正在运行的服务的池容器
+    os.makedirs(pool.runner_dir)
+    shutil.copy(RUNNER, pool.runner_dir)
+
+    def start_container():
+        pool._start_worker().destroy()
+
+    try:
+        return timed(start_container, iterations)
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=5, help='每种启动方式的次数（预热任务执行5倍次数）')
+    parser.add_argument('--rows', type=int, default=10000, help='任务输入数据的行数')
+    parser.add_argument('--python', default=sys.executable, help='运行器使用的解释器')
+    parser.add_argument('--image', default=None, help='沙箱镜像，指定时测量容器启动耗时')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='bench-sandbox-')
+    try:
+        input_path = os.path.join(work_dir, 'input.parquet')
+        pl.DataFrame({
+            'key': [f'k{i % 100}' for i in range(args.rows)],
+            'value': [(i * 7919 % 1000) / 1000 for i in range(args.rows)]
+        }).write_parquet(input_path)
+
+        record = {
+            'commit': git_commit(),
+            'time': datetime.utcnow().isoformat(),
+            'rows': args.rows,
+            'polars': pl.__version__,
+            'local': bench_local(args.python, args.iterations, input_path, work_dir)
+        }
+        if args.image:
+            record['container'] = bench_container(args.image, args.iterations, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
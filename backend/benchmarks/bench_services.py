@@ -0,0 +1,182 @@
+"""每个请求的依赖构造开销：按请求新建客户端 vs 共享应用级客户端（app.core.services）
+
+before: 每个请求新建 SessionManager 所需的全部客户端（MinIO连接池、智能体编排器、
+        Docker客户端握手）和路由使用的 MinIOClient，每次上传前检查存储桶是否存在；
+after:  复用 services 中的共享客户端，已知存储桶不再检查。
+
+配置了可访问的MinIO（MINIO_ENDPOINT 等环境变量）时，另外模拟 --requests 个上传请求，
+统计每个请求的HTTP请求数、新建TCP连接数和耗时。结果以JSON Lines追加写入结果文件。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_services
+    python -m benchmarks.bench_services --iterations 200 --requests 100 --bucket bench-services
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# 基准测试不需要数据库连接
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
+
+import urllib3
+
+from benchmarks.bench_profiler import git_commit
+
+DEFAULT_OUTPUT = os.path.join(BACKEND_DIR, 'benchmarks', 'results', 'services.jsonl')
+
+
+class HttpCounter:
+    """统计urllib3发出的HTTP请求数和新建的TCP连接数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self._urlopen = urllib3.PoolManager.urlopen
+        self._new_conn = urllib3.connectionpool.HTTPConnectionPool._new_conn
+
+    def __enter__(self):
+        counter = self
+        urlopen, new_conn = self._urlopen, self._new_conn
+
+        def counted_urlopen(pool, *args, **kwargs):
+            counter.requests += 1
+            return urlopen(pool, *args, **kwargs)
+
+        def counted_new_conn(pool):
+            counter.connections += 1
+            return new_conn(pool)
+
+        urllib3.PoolManager.urlopen = counted_urlopen
+        urllib3.connectionpool.HTTPConnectionPool._new_conn = counted_new_conn
+        return self
+
+    def __exit__(self, *exc):
+        urllib3.PoolManager.urlopen = self._urlopen
+        urllib3.connectionpool.HTTPConnectionPool._new_conn = self._new_conn
+
+
+def timed(fn: Callable[[], Any], iterations: int) -> Dict[str, Any]:
+    """执行 iterations 次，返回每次耗时的统计（毫秒）；失败时记录错误"""
+    durations = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        try:
+            fn()
+        except Exception as e:
+            return {'error': f"{type(e).__name__}: {e}"}
+        durations.append((time.perf_counter() - started) * 1000)
+    return {
+        'iterations': iterations,
+        'mean_ms': round(statistics.mean(durations), 4),
+        'p50_ms': round(statistics.median(durations), 4),
+        'max_ms': round(max(durations), 4)
+    }
+
+
+def bench_construction(iterations: int) -> Dict[str, Any]:
+    """依赖构造耗时"""
+    import docker
+    from app.core.config import settings
+    from app.core.minio_client import MinIOClient
+    from app.core.agent_orchestrator import AgentOrchestrator
+    from app.core.services import ServiceContainer
+
+    container = ServiceContainer()
+    container.minio, container.agent, container.profiler
+    try:
+        container.sandbox
+    except Exception:
+        pass
+
+    record = {
+        'before': {
+            'minio_client': timed(MinIOClient, iterations),
+            'agent': timed(lambda: AgentOrchestrator(api_key=settings.OPENAI_API_KEY), iterations),
+            # 旧的 SandboxExecutor 每次构造只与Docker守护进程握手（现在的后端构造时会启动容器池或forkserver）
+            'sandbox': timed(lambda: docker.from_env().close(), iterations)
+        },
+        'after': {
+            'minio_client': timed(lambda: container.minio, iterations),
+            'agent': timed(lambda: container.agent, iterations),
+            'sandbox': timed(lambda: container.sandbox, iterations)
+        }
+    }
+    container.shutdown()
+    return record
+
+
+def bench_requests(requests: int, bucket: str) -> Dict[str, Any]:
+    """模拟上传请求：每个请求写一个小对象（上传路由中的接入清单）"""
+    from app.core.minio_client import MinIOClient
+    from app.core.config import settings
+
+    def run(client_for_request: Callable[[], MinIOClient]) -> Dict[str, Any]:
+        durations: List[float] = []
+        with HttpCounter() as counter:
+            for i in range(requests):
+                started = time.perf_counter()
+                client = client_for_request()
+                if not client.put_json(bucket, f"bench/{i}.json", {'i': i}):
+                    raise RuntimeError("上传失败，检查MinIO配置")
+                durations.append((time.perf_counter() - started) * 1000)
+        return {
+            'requests': requests,
+            'http_requests_per_request': round(counter.requests / requests, 3),
+            'new_connections': counter.connections,
+            'mean_ms': round(statistics.mean(durations), 4),
+            'p50_ms': round(statistics.median(durations), 4)
+        }
+
+    shared = MinIOClient(pool_size=settings.MINIO_POOL_SIZE)
+    result = {'before': run(MinIOClient), 'after': run(lambda: shared)}
+    for i in range(requests):
+        shared.delete_object(bucket, f"bench/{i}.json")
+    return result
+
+
+def minio_available() -> bool:
+    from app.core.minio_client import MinIOClient
+    client = MinIOClient()
+    client.client._http.connection_pool_kw['retries'] = urllib3.Retry(total=0)
+    client.client._http.connection_pool_kw['timeout'] = urllib3.Timeout(connect=1, read=2)
+    try:
+        client.client.list_buckets()
+        return True
+    except Exception:
+        return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=100, help='每种依赖构造的次数')
+    parser.add_argument('--requests', type=int, default=50, help='模拟的上传请求数（需要MinIO）')
+    parser.add_argument('--bucket', default='bench-services')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    record = {
+        'commit': git_commit(),
+        'time': datetime.utcnow().isoformat(),
+        'construction': bench_construction(args.iterations)
+    }
+    if minio_available():
+        record['requests'] = bench_requests(args.requests, args.bucket)
+    else:
+        record['requests'] = {'skipped': 'MinIO不可用'}
+
+    print(json.dumps(record, ensure_ascii=False, indent=2))
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""宽表探查基准：列数从10增加到5000时，按列分片并行聚合与单个select的耗时对比
+
+用法（在 backend 目录下）:
+    python -m benchmarks.bench_wide_columns
+    python -m benchmarks.bench_wide_columns --columns 10,100,1000 --rows 50000 --workers 1,4
+    python -m benchmarks.bench_wide_columns --output wide_columns.json
+
+单个select的基线耗时随列数超线性增长，默认只跑到 --baseline-max-columns 列。
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import polars as pl
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services import data_profiler
+from app.services.data_profiler import DataProfiler
+
+
+def make_wide_frame(rows: int, columns: int, seed: int = 0) -> pl.DataFrame:
+    """生成宽表：浮点、整数、低基数文本列轮流出现，约5%空值"""
+    rng = np.random.default_rng(seed)
+    data = {}
+    for j in range(columns):
+        kind = j % 3
+        if kind == 0:
+            values = pl.Series(rng.normal(size=rows))
+        elif kind == 1:
+            values = pl.Series(rng.integers(0, 1000, rows))
+        else:
+            values = pl.Series(rng.choice(['alpha', 'beta', 'gamma', '2024-01-01'], rows))
+        data[f'c{j}'] = values.scatter(rng.choice(rows, rows // 20, replace=False), None)
+    return pl.DataFrame(data)
+
+
+def time_profile(file_path: str, shard_size: int, workers: int, repeat: int) -> float:
+    """使用给定分片大小和线程数探查文件，返回最短耗时（秒）"""
+    settings.PROFILE_COLUMN_SHARD_SIZE = shard_size
+    data_profiler.column_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="profile-shard")
+    profiler = DataProfiler()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        profiler.profile_data(file_path)
+        timings.append(time.perf_counter() - started)
+    data_profiler.column_pool.shutdown()
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--columns', default='10,100,500,1000,2000,5000', help='逗号分隔的列数')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--workers', default=f'1,{os.cpu_count() or 4}', help='逗号分隔的线程数')
+    parser.add_argument('--shard-size', type=int, default=settings.PROFILE_COLUMN_SHARD_SIZE)
+    parser.add_argument('--baseline-max-columns', type=int, default=500,
+                        help='单个select基线只在列数不超过此值时运行')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help='结果写入的JSON文件')
+    args = parser.parse_args()
+
+    column_counts = [int(x) for x in args.columns.split(',')]
+    worker_counts = sorted({int(x) for x in args.workers.split(',')})
+    results = []
+
+    print(f"{'列数':>6} {'模式':<12} {'线程':>4} {'耗时(s)':>9} {'列/秒':>9}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for columns in column_counts:
+            file_path = os.path.join(temp_dir, f'wide_{columns}.parquet')
+            make_wide_frame(args.rows, columns).write_parquet(file_path)
+
+            runs = [('sharded', args.shard_size, workers) for workers in worker_counts]
+            if columns <= args.baseline_max_columns:
+                runs.insert(0, ('single_select', columns, 1))
+
+            for mode, shard_size, workers in runs:
+                elapsed = time_profile(file_path, shard_size, workers, args.repeat)
+                results.append({
+                    'columns': columns,
+                    'rows': args.rows,
+                    'mode': mode,
+                    'shard_size': shard_size,
+                    'workers': workers,
+                    'seconds': round(elapsed, 4),
+                    'columns_per_second': round(columns / elapsed, 1)
+                })
+                print(f"{columns:>6} {mode:<12} {workers:>4} {elapsed:>9.3f} {columns / elapsed:>9.1f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'polars': pl.__version__, 'cpu_count': os.cpu_count(), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
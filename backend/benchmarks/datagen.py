@@ -0,0 +1,126 @@
+"""确定性的合成数据生成器，供基准测试使用
+
+同样的参数和种子总是生成同样的数据。支持的维度：
+    rows         行数（1e3 ~ 1e8，按块生成和写出，内存占用与行数无关）
+    columns      列数（5 ~ 5000）
+    dtype_mix    各类型列的比例，如 "float:2,int:2,str:1,date:1"
+    null_rate    空值比例
+    cardinality  整数/文本列的不同值个数
+    fmt          csv / gbk_csv / xlsx / parquet
+"""
+import os
+import shutil
+import tempfile
+from typing import Dict, Iterator, List
+
+import numpy as np
+import polars as pl
+
+FORMATS = {
+    'csv': '.csv',
+    'gbk_csv': '.csv',
+    'xlsx': '.xlsx',
+    'parquet': '.parquet'
+}
+
+DTYPES = ['float', 'int', 'str', 'date', 'bool']
+
+DEFAULT_DTYPE_MIX = 'float:2,int:2,str:2,date:1,bool:1'
+
+# Excel单个工作表的行数上限（不含表头）
+XLSX_MAX_ROWS = 1_048_575
+
+# 每块生成的行数
+CHUNK_ROWS = 1_000_000
+
+# 文本列的词表，包含中文以便GBK编码有意义
+_WORDS = ['北京', '上海', '广州', '深圳', '杭州', '成都', 'alpha', 'beta', 'gamma', 'delta']
+
+
+def parse_dtype_mix(dtype_mix: str) -> Dict[str, int]:
+    """解析 "float:2,int:1" 形式的类型比例"""
+    weights = {}
+    for part in dtype_mix.split(','):
+        name, _, weight = part.partition(':')
+        name = name.strip()
+        if name not in DTYPES:
+            raise ValueError(f"不支持的列类型: {name}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def column_types(columns: int, dtype_mix: str = DEFAULT_DTYPE_MIX) -> List[str]:
+    """按比例轮流分配每列的类型"""
+    cycle = [name for name, weight in parse_dtype_mix(dtype_mix).items() for _ in range(weight)]
+    return [cycle[j % len(cycle)] for j in range(columns)]
+
+
+def _column(kind: str, rows: int, cardinality: int, rng: np.random.Generator) -> pl.Series:
+    """生成一列（不含空值）"""
+    if kind == 'float':
+        return pl.Series(rng.normal(100, 25, rows).round(4))
+    if kind == 'int':
+        return pl.Series(rng.integers(0, cardinality, rows))
+    if kind == 'str':
+        words = np.array(_WORDS)
+        codes = rng.integers(0, cardinality, rows)
+        return pl.Series(words[codes % len(words)]) + '_' + pl.Series(codes).cast(pl.Utf8)
+    if kind == 'date':
+        # 2020-01-01 起的日期字符串，用于覆盖日期识别
+        days = rng.integers(0, min(cardinality, 3650), rows) + 18262
+        return pl.Series(days, dtype=pl.Int32).cast(pl.Date).dt.strftime('%Y-%m-%d')
+    if kind == 'bool':
+        return pl.Series(rng.random(rows) < 0.5)
+    raise ValueError(f"不支持的列类型: {kind}")
+
+
+def iter_chunks(rows: int, columns: int, dtype_mix: str = DEFAULT_DTYPE_MIX,
+                null_rate: float = 0.05, cardinality: int = 1000, seed: int = 0,
+                chunk_rows: int = CHUNK_ROWS) -> Iterator[pl.DataFrame]:
+    """按块生成数据，每块使用由种子和块序号确定的随机数"""
+    types = column_types(columns, dtype_mix)
+    for chunk_index, start in enumerate(range(0, rows, chunk_rows)):
+        n = min(chunk_rows, rows - start)
+        rng = np.random.default_rng([seed, chunk_index])
+        data = {}
+        for j, kind in enumerate(types):
+            series = _column(kind, n, cardinality, rng)
+            if null_rate > 0:
+                series = series.scatter(np.flatnonzero(rng.random(n) < null_rate), None)
+            data[f'{kind}_{j}'] = series
+        yield pl.DataFrame(data)
+
+
+def generate_frame(rows: int, columns: int, **kwargs) -> pl.DataFrame:
+    """在内存中生成完整数据（适合小数据量）"""
+    return pl.concat(list(iter_chunks(rows, columns, **kwargs)))
+
+
+def write_dataset(path: str, fmt: str, rows: int, columns: int, **kwargs) -> str:
+    """生成数据并按格式写出，返回文件路径（扩展名由格式决定）"""
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    path = os.path.splitext(path)[0] + FORMATS[fmt]
+
+    if fmt == 'xlsx':
+        if rows > XLSX_MAX_ROWS:
+            raise ValueError(f"xlsx最多 {XLSX_MAX_ROWS} 行: {rows}")
+        generate_frame(rows, columns, **kwargs).write_excel(path)
+    elif fmt == 'parquet':
+        # 逐块写出分片，再流式合并为一个文件
+        parts_dir = tempfile.mkdtemp(dir=os.path.dirname(path) or '.')
+        try:
+            parts = []
+            for i, chunk in enumerate(iter_chunks(rows, columns, **kwargs)):
+                part = os.path.join(parts_dir, f'part-{i:05d}.parquet')
+                chunk.write_parquet(part)
+                parts.append(part)
+            pl.scan_parquet(parts).sink_parquet(path, compression='zstd')
+        finally:
+            shutil.rmtree(parts_dir, ignore_errors=True)
+    else:
+        encoding = 'gbk' if fmt == 'gbk_csv' else 'utf-8'
+        with open(path, 'w', encoding=encoding, newline='') as f:
+            for i, chunk in enumerate(iter_chunks(rows, columns, **kwargs)):
+                f.write(chunk.write_csv(include_header=i == 0))
+    return path
@@ -9,7 +9,7 @@ import sys
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app.core.database import engine
-from app.models.data_version import Base, Project, DataVersion, Session, Message
+from app.models.data_version import Base, Project, DataVersion, Session, Message, ProjectFile, Job
 
 def init_database():
     """初始化数据库表"""
@@ -4,23 +4,46 @@ import sys
 # 添加app目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router as api_router
 from app.core.database import engine
 from app.models import Base
 from app.core.config import settings
+from app.services.file_catalog import catalog_reconciler
+from app.services.jobs import job_manager
+from app.core.services import services
+from app.core.executors import io_pool, cpu_pool
 
 # 创建数据库表
 Base.metadata.create_all(bind=engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时创建共享客户端、恢复后台任务、启动目录校正，关闭时依次释放"""
+    services.startup()
+    app.state.services = services
+    # 恢复重启前未完成的后台任务
+    job_manager.start()
+    # 后台定期校正文件目录与存储桶
+    catalog_reconciler.start()
+    yield
+    catalog_reconciler.stop()
+    # 先停止后台任务，任务中仍在使用共享客户端
+    job_manager.stop()
+    services.shutdown()
+    io_pool.shutdown()
+    cpu_pool.shutdown()
+
 # FastAPI应用
 app = FastAPI(
     title="DP Agent - 数据处理智能体系统",
     description="基于自然语言的数据处理和分析平台",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 测试从 backend 目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 测试不连接数据库，需要数据库的测试各自创建SQLite会话
+os.environ.setdefault('DATABASE_URL', 'sqlite://')
@@ -0,0 +1,59 @@
+import json
+import sys
+
+import polars as pl
+import pytest
+
+from benchmarks import bench_profiler, datagen
+
+
+def test_generator_is_deterministic():
+    first = datagen.generate_frame(2000, 8, seed=3, chunk_rows=700)
+    second = datagen.generate_frame(2000, 8, seed=3, chunk_rows=700)
+    assert first.equals(second)
+    assert not first.equals(datagen.generate_frame(2000, 8, seed=4, chunk_rows=700))
+
+
+def test_generator_dimensions():
+    frame = datagen.generate_frame(10_000, 6, dtype_mix='float:1,int:1,str:1', null_rate=0.2, cardinality=50)
+    assert frame.shape == (10_000, 6)
+    assert [col.split('_')[0] for col in frame.columns] == ['float', 'int', 'str'] * 2
+    assert frame['int_1'].drop_nulls().n_unique() <= 50
+    assert frame['float_0'].null_count() / len(frame) == pytest.approx(0.2, abs=0.02)
+    with pytest.raises(ValueError):
+        datagen.parse_dtype_mix('float:1,decimal:1')
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'gbk_csv', 'parquet'])
+def test_write_dataset_round_trip(tmp_path, fmt):
+    path = datagen.write_dataset(str(tmp_path / 'data'), fmt, 2500, 5, chunk_rows=1000, null_rate=0)
+    expected = datagen.generate_frame(2500, 5, chunk_rows=1000, null_rate=0)
+    if fmt == 'parquet':
+        assert pl.read_parquet(path).equals(expected)
+    else:
+        with open(path, encoding='gbk' if fmt == 'gbk_csv' else 'utf-8') as f:
+            frame = pl.read_csv(f.read().encode('utf-8'))
+        assert frame.shape == expected.shape
+        assert frame['str_4'].to_list() == expected['str_4'].to_list()
+
+
+def test_cases_and_skips():
+    args = type('Args', (), {
+        'preset': 'quick', 'rows': '1e3,2000000', 'columns': '5', 'formats': 'xlsx,parquet',
+        'targets': 'profile', 'dtype_mix': datagen.DEFAULT_DTYPE_MIX, 'null_rate': 0.05,
+        'cardinality': 1000, 'seed': 0
+    })()
+    cases = bench_profiler.build_cases(args)
+    assert [(c['rows'], c['format']) for c in cases] == [
+        (1000, 'xlsx'), (1000, 'parquet'), (2_000_000, 'xlsx'), (2_000_000, 'parquet')
+    ]
+    assert [bench_profiler.skip_reason(c) is not None for c in cases] == [False, False, True, False]
+
+
+def test_worker_reports_timing(tmp_path, capsys, monkeypatch):
+    path = datagen.write_dataset(str(tmp_path / 'data'), 'parquet', 500, 5)
+    monkeypatch.setattr(sys, 'argv', ['bench_profiler', '--worker', 'profile', path])
+    bench_profiler.main()
+    result = json.loads(capsys.readouterr().out.strip().splitlines()[-1])
+    assert result['error'] is None
+    assert result['seconds'] > 0 and result['peak_rss_kb'] >= result['baseline_rss_kb']
@@ -0,0 +1,118 @@
+import polars as pl
+import pytest
+
+from app.services.data_profiler import DataProfiler
+
+
+@pytest.fixture
+def frame():
+    rows = 2000
+    return pl.DataFrame({
+        'id': [i % 1900 for i in range(rows)],
+        'amount': [float(i % 97) if i % 13 else None for i in range(rows)],
+        'category': [f'c{i % 5}' if i % 7 else None for i in range(rows)],
+        'day': [f'2024-01-{i % 28 + 1:02d}' for i in range(rows)],
+        'flag': [i % 3 == 0 for i in range(rows)],
+    })
+
+
+def test_profile_lazy_matches_direct_computation(frame):
+    report = DataProfiler().profile_lazy(frame.lazy())
+    assert report['basic_info']['total_rows'] == len(frame)
+    assert report['basic_info']['column_names'] == frame.columns
+
+    for col in frame.columns:
+        info = report['columns'][col]
+        assert info['null_count'] == frame[col].null_count()
+        assert info['unique_count'] == frame[col].n_unique()
+
+    amount = report['columns']['amount']
+    series = frame['amount']
+    assert amount['min'] == series.min()
+    assert amount['max'] == series.max()
+    assert amount['mean'] == pytest.approx(series.mean())
+    assert amount['median'] == pytest.approx(series.median())
+    assert amount['std'] == pytest.approx(series.std())
+
+    top = report['columns']['category']['top_values']
+    expected = frame['category'].drop_nulls().value_counts(sort=True)
+    assert [value['category'] for value in top] == expected['category'].to_list()[:10]
+
+
+def test_duplicates_and_samples(frame):
+    frame = pl.concat([frame, frame.head(30)])
+    report = DataProfiler().profile_lazy(frame.lazy())
+    issues = [issue for issue in report['quality_report']['issues'] if issue['type'] == 'duplicates']
+    assert '发现 30 行重复数据' in issues[0]['description']
+    assert report['sample_data']['head'] == frame.head(5).to_dicts()
+    assert report['sample_data']['tail'] == frame.tail(5).to_dicts()
+    assert report['sample_data']['shape'] == (len(frame), frame.width)
+
+
+def test_profile_data_csv_and_parquet_agree(frame, tmp_path):
+    csv_path, parquet_path = tmp_path / 'data.csv', tmp_path / 'data.parquet'
+    frame.write_csv(csv_path)
+    frame.write_parquet(parquet_path)
+    profiler = DataProfiler()
+    from_csv = profiler.profile_data(str(csv_path), streaming=False)
+    from_parquet = profiler.profile_data(str(parquet_path), streaming=False)
+    assert from_csv['basic_info']['total_rows'] == from_parquet['basic_info']['total_rows'] == len(frame)
+    for col in ('id', 'amount', 'category'):
+        for stat in ('null_count', 'unique_count'):
+            assert from_csv['columns'][col][stat] == from_parquet['columns'][col][stat]
+
+
+def test_empty_frame():
+    frame = pl.DataFrame({'a': pl.Series([], dtype=pl.Int64), 'b': pl.Series([], dtype=pl.Utf8)})
+    report = DataProfiler().profile_lazy(frame.lazy())
+    assert report['basic_info']['total_rows'] == 0
+    assert report['columns']['a']['min'] is None
+    assert report['columns']['a']['null_percentage'] == 0
+
+
+def test_outliers_match_iqr_rule():
+    values = [float(i % 50) for i in range(1000)] + [500.0] * 60 + [-400.0] * 10
+    frame = pl.DataFrame({'value': values, 'other': list(range(len(values)))})
+    report = DataProfiler().profile_lazy(frame.lazy())
+
+    series = frame['value']
+    q1, q3 = series.quantile(0.25), series.quantile(0.75)
+    expected = ((series < q1 - 1.5 * (q3 - q1)) | (series > q3 + 1.5 * (q3 - q1))).sum()
+    issues = {issue['column']: issue for issue in report['quality_report']['issues'] if issue['type'] == 'outliers'}
+    assert expected == 70
+    assert f'{expected / len(series) * 100:.1f}%' in issues['value']['description']
+    assert 'other' not in issues
+
+
+def test_datetime_columns_detected_in_one_pass():
+    frame = pl.DataFrame({
+        'iso': ['2024-01-31', '2024-02-01'],
+        'us': ['01/31/2024', None],
+        'slashed': ['2024/01/31', '2024/02/01'],
+        'text': ['hello', 'world'],
+        'number_text': ['123', '456'],
+        'empty': pl.Series([None, None], dtype=pl.Utf8),
+    })
+    report = DataProfiler().profile_lazy(frame.lazy())
+    assert report['data_types']['datetime_columns'] == ['iso', 'us', 'slashed']
+    assert report['data_types']['text_columns'] == frame.columns
+
+
+def test_sharded_profile_matches_single_query(monkeypatch, tmp_path):
+    from app.core.config import settings
+
+    frame = pl.DataFrame({
+        f'c{i}': ([j * i for j in range(300)] if i % 3 else [f'v{j % (i + 2)}' for j in range(300)])
+        for i in range(23)
+    })
+    profiler = DataProfiler()
+    single = profiler.profile_lazy(frame.lazy())
+    monkeypatch.setattr(settings, 'PROFILE_COLUMN_SHARD_SIZE', 5)
+    sharded = profiler.profile_lazy(frame.lazy())
+    assert sharded == single
+
+    # 宽CSV按列分片前先读入内存
+    path = tmp_path / 'wide.csv'
+    frame.write_csv(path)
+    from_csv = profiler.profile_data(str(path), streaming=False)
+    assert from_csv['columns'] == single['columns']
@@ -0,0 +1,63 @@
+import polars as pl
+import pytest
+
+from app.services.duplicates import DuplicateCounter, top_duplicate_groups
+
+
+@pytest.fixture
+def frame():
+    base = pl.DataFrame({'a': list(range(1000)), 'b': [f'x{i % 10}' for i in range(1000)]})
+    # 第0行出现4次，第1行出现3次，第2行出现2次
+    return pl.concat([base, base.head(3), base.head(2), base.head(1)])
+
+
+def expected_duplicates(frame):
+    return len(frame) - frame.unique().height
+
+
+def test_top_groups_lazy(frame):
+    groups = top_duplicate_groups(frame.lazy(), 2)
+    assert groups == [
+        {'count': 4, 'row': {'a': 0, 'b': 'x0'}},
+        {'count': 3, 'row': {'a': 1, 'b': 'x1'}},
+    ]
+    assert top_duplicate_groups(frame.unique().lazy(), 2) == []
+    assert top_duplicate_groups(frame.lazy(), 0) == []
+
+
+def test_counter_matches_unique(frame):
+    counter = DuplicateCounter(top_k=3)
+    for batch in frame.iter_slices(97):
+        counter.update(batch)
+    assert counter.exact
+    assert counter.count() == expected_duplicates(frame) == 6
+    groups = counter.top_groups(batches=frame.iter_slices(97))
+    assert [group['count'] for group in groups] == [4, 3, 2]
+    assert groups[2]['row'] == {'a': 2, 'b': 'x2'}
+    assert counter.top_groups(top_k=1)[0]['row'] is None
+
+
+def test_counter_bounded_after_pruning():
+    frame = pl.DataFrame({'a': list(range(20_000)) + [7] * 500})
+    counter = DuplicateCounter(top_k=1, max_hashes=1000)
+    for batch in frame.iter_slices(1000):
+        counter.update(batch)
+    assert counter.count() == pytest.approx(expected_duplicates(frame), abs=0.05 * len(frame))
+    assert not counter.exact
+    assert len(counter.counts) <= 1000
+    # 计数为下界，误差不超过 总行数 / (max_hashes + 1)
+    group = counter.top_groups()[0]
+    assert 501 - len(frame) / 1001 <= group['count'] <= 501
+
+
+def test_profile_reports_groups(tmp_path, frame):
+    from app.services.data_profiler import DataProfiler
+
+    path = tmp_path / 'data.parquet'
+    frame.write_parquet(path)
+    profiler = DataProfiler()
+    for streaming in (False, True):
+        report = profiler.profile_data(str(path), streaming=streaming, batch_size=300, duplicate_groups=2)
+        issue = next(i for i in report['quality_report']['issues'] if i['type'] == 'duplicates')
+        assert '发现 6 行重复数据' in issue['description']
+        assert [group['count'] for group in issue['top_groups']] == [4, 3]
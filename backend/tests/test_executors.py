@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.executors import BoundedPool, offload
+
+
+def slow_add(a, b, delay=0.01):
+    time.sleep(delay)
+    return a + b
+
+
+def fail():
+    raise RuntimeError('boom')
+
+
+@pytest.fixture
+def pool():
+    pool = BoundedPool('test', max_workers=2, max_pending=2)
+    yield pool
+    pool.shutdown()
+
+
+def test_run_and_counters(pool):
+    async def main():
+        return await asyncio.gather(*[pool.run(slow_add, i, 1) for i in range(6)])
+
+    assert asyncio.run(main()) == [i + 1 for i in range(6)]
+    stats = pool.stats()
+    assert stats['submitted'] == stats['completed'] == 6
+    assert stats['failed'] == 0
+    assert stats['running'] == stats['queued'] == stats['waiting'] == 0
+    # 同时提交的任务数不超过 max_pending
+    assert stats['peak_in_flight'] == 2
+
+
+def test_failure_counted(pool):
+    with pytest.raises(RuntimeError):
+        asyncio.run(pool.run(fail))
+    assert pool.stats()['failed'] == 1
+    assert pool.stats()['running'] == 0
+
+
+def test_counters_with_loops_in_several_threads(pool):
+    # 后台任务线程各有自己的事件循环，共用同一个池
+    def worker():
+        async def main():
+            await asyncio.gather(*[pool.run(slow_add, 1, 1, delay=0) for _ in range(50)])
+        asyncio.run(main())
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = pool.stats()
+    assert stats['submitted'] == stats['completed'] == 200
+    assert stats['running'] == stats['waiting'] == 0
+
+
+def test_offload_keeps_signature(pool):
+    @offload(pool)
+    def handler(a: int, b: int = 2):
+        """路由函数"""
+        return a * b
+
+    assert handler.__doc__ == '路由函数'
+    assert asyncio.run(handler(3)) == 6
+
+
+def test_offload_rejects_process_pool():
+    with pytest.raises(ValueError):
+        offload(BoundedPool('process', max_workers=1, max_pending=1, kind='process'))
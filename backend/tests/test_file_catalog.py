@@ -0,0 +1,109 @@
+import os
+
+import polars as pl
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.data_version import Base, Project, ProjectFile
+from app.services import file_catalog
+from app.services.file_catalog import CatalogReconciler, FileCatalog, parse_object_key
+
+
+class FakeMinio:
+    """存储桶中的对象为本地目录中的文件"""
+
+    def __init__(self, root):
+        self.root = root
+        self.manifests = {}
+
+    def list_files(self, bucket_name, prefix=''):
+        directory = os.path.join(self.root, bucket_name, prefix)
+        if not os.path.isdir(directory):
+            return []
+        return [{'object_name': prefix + name, 'size': os.path.getsize(os.path.join(directory, name))}
+                for name in sorted(os.listdir(directory))]
+
+    def get_json(self, bucket_name, object_name):
+        return self.manifests.get((bucket_name, object_name))
+
+    def object_uri(self, bucket_name, object_name):
+        return os.path.join(self.root, bucket_name, object_name)
+
+    storage_options = None
+
+    def put(self, bucket_name, object_key, data: bytes = b'x'):
+        path = self.object_uri(bucket_name, object_key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'catalog.db'}")
+    Base.metadata.create_all(bind=engine, tables=[Project.__table__, ProjectFile.__table__])
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = factory()
+    session.add(Project(id='p1', name='project'))
+    session.commit()
+    yield session, factory
+    session.close()
+    engine.dispose()
+
+
+def test_parse_object_key():
+    assert parse_object_key('data/abc_名称_1.csv') == {'file_id': 'abc', 'name': '名称_1.csv'}
+    assert parse_object_key('meta/abc_x.csv.json') is None
+    assert parse_object_key('data/noid') is None
+
+
+def test_register_get_list_remove(db):
+    session, _ = db
+    catalog = FileCatalog(session)
+    catalog.register('p1', 'f1', 'a.csv', 'data/f1_a.parquet', 10,
+                     {'format': 'parquet', 'source_format': 'csv', 'rows': 3, 'schema': {'a': 'Int64'}})
+    catalog.register('p1', 'f2', 'b.parquet', 'data/f2_b.parquet', 20)
+    record = catalog.get('p1', 'f1')
+    assert (record.format, record.source_format, record.row_count) == ('parquet', 'csv', 3)
+    assert catalog.get('p1', 'f2').format == 'parquet'
+
+    # 重新登记同一文件时更新记录
+    catalog.register('p1', 'f1', 'a.csv', 'data/f1_a.parquet', 11)
+    assert [r.file_id for r in catalog.list('p1')] == ['f1', 'f2']
+    assert catalog.get('p1', 'f1').size == 11
+    assert catalog.remove('p1', 'f2') and not catalog.remove('p1', 'f2')
+    assert catalog.get('p1', 'f2') is None
+
+
+def test_reconcile(db, tmp_path):
+    session, _ = db
+    minio = FakeMinio(str(tmp_path / 'store'))
+    catalog = FileCatalog(session)
+    catalog.register('p1', 'gone', 'gone.csv', 'data/gone_gone.csv', 1)
+    minio.put('project-p1', 'data/resized_r.csv', b'abc')
+    catalog.register('p1', 'resized', 'r.csv', 'data/resized_r.csv', 1)
+    minio.put('project-p1', 'data/new_n.csv', b'a\n1\n')
+    minio.manifests[('project-p1', 'meta/new_n.csv.json')] = {'original_name': '新.csv', 'format': 'csv', 'rows': 1}
+    # 没有清单的旧Parquet对象从文件元数据读取schema和行数
+    pl.DataFrame({'a': [1, 2]}).write_parquet(minio.object_uri('project-p1', 'data/old_o.parquet'))
+
+    stats = catalog.reconcile('p1', minio)
+    assert stats == {'added': 2, 'removed': 1, 'updated': 1}
+    assert catalog.get('p1', 'gone') is None
+    assert catalog.get('p1', 'resized').size == 3
+    assert catalog.get('p1', 'new').name == '新.csv'
+    old = catalog.get('p1', 'old')
+    assert (old.format, old.row_count, old.schema) == ('parquet', 2, {'a': 'Int64'})
+    assert catalog.reconcile('p1', minio) == {'added': 0, 'removed': 0, 'updated': 0}
+
+
+def test_reconciler_run_once(db, tmp_path, monkeypatch):
+    session, factory = db
+    monkeypatch.setattr(file_catalog, 'SessionLocal', factory)
+    minio = FakeMinio(str(tmp_path / 'store'))
+    minio.put('project-p1', 'data/f1_a.csv')
+    result = CatalogReconciler(interval=0).run_once(minio)
+    assert result['projects'] == 1 and result['added'] == 1 and result['errors'] == 0
+    assert FileCatalog(session).get('p1', 'f1') is not None
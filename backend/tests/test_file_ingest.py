@@ -0,0 +1,113 @@
+import codecs
+
+import polars as pl
+
+from app.services.file_ingest import detect_csv_format, ingest_file, read_data, transcode_file
+
+ROWS = ''.join(f'{i};城市{i % 9};备注，第{i}行\n' for i in range(3000))
+TEXT = 'id;城市;备注\n' + ROWS
+
+
+def write(tmp_path, name, data: bytes):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_utf8_file_left_in_place(tmp_path):
+    path = write(tmp_path, 'a.csv', TEXT.encode('utf-8'))
+    manifest = ingest_file(path)
+    assert manifest['source_encoding'] == 'utf-8' and not manifest['transcoded']
+    assert manifest['delimiter'] == ';'
+    assert manifest['schema'] == {'id': 'Int64', '城市': 'String', '备注': 'String'}
+
+
+def test_gbk_file_transcoded_once(tmp_path):
+    path = write(tmp_path, 'a.csv', TEXT.encode('gbk'))
+    manifest = ingest_file(path)
+    assert manifest['transcoded']
+    assert manifest['source_encoding'] == 'gb18030'
+    assert manifest['encoding'] == 'utf-8'
+    with open(path, encoding='utf-8') as f:
+        assert f.read() == TEXT
+    # 下游按清单直接读取，不再检测编码
+    df = read_data(path, manifest)
+    assert df.shape == (3000, 3) and df['城市'][1] == '城市1'
+
+
+def test_bom_removed(tmp_path):
+    path = write(tmp_path, 'a.csv', codecs.BOM_UTF8 + TEXT.encode('utf-8'))
+    assert detect_csv_format(path)['encoding'] == 'utf-8-sig'
+    manifest = ingest_file(path)
+    assert manifest['transcoded']
+    with open(path, 'rb') as f:
+        assert not f.read().startswith(codecs.BOM_UTF8)
+    assert list(manifest['schema']) == ['id', '城市', '备注']
+
+
+def test_invalid_utf8_after_sample_falls_back(tmp_path):
+    # 开头是合法的UTF-8，检测样本之后出现GBK字节
+    data = ('id,name\n' + 'x,y\n' * 20_000).encode('utf-8') + '1,名称\n'.encode('gbk')
+    path = write(tmp_path, 'a.csv', data)
+    manifest = ingest_file(path)
+    assert manifest['transcoded']
+    assert manifest['source_encoding'] == 'gb18030'
+    with open(path, encoding='utf-8') as f:
+        assert f.read().endswith('1,名称\n')
+
+
+def test_upload_validation_result_reused(tmp_path):
+    path = write(tmp_path, 'a.tsv', 'a\tb\n1\t2\n'.encode('utf-8'))
+    manifest = ingest_file(path, utf8_valid=True)
+    assert manifest['delimiter'] == '\t' and not manifest['transcoded']
+
+
+def test_transcode_file_in_small_chunks(tmp_path):
+    source = write(tmp_path, 'a.csv', TEXT.encode('gb18030'))
+    target = str(tmp_path / 'b.csv')
+    # 多字节字符跨分块边界
+    transcode_file(source, target, 'gb18030', chunk_size=7)
+    with open(target, encoding='utf-8') as f:
+        assert f.read() == TEXT
+
+
+def test_parquet_manifest(tmp_path):
+    path = str(tmp_path / 'a.parquet')
+    pl.DataFrame({'a': [1, 2, 3]}).write_parquet(path)
+    manifest = ingest_file(path)
+    assert manifest['rows'] == 3 and manifest['schema'] == {'a': 'Int64'}
+
+
+def test_convert_csv_to_parquet(tmp_path, monkeypatch):
+    from app.core.config import settings
+    from app.core.parquet_index import _CompactReader
+    from app.services.file_ingest import convert_to_parquet
+
+    monkeypatch.setattr(settings, 'INGEST_ROW_GROUP_SIZE', 1000)
+    path = write(tmp_path, 'a.csv', TEXT.encode('gbk'))
+    manifest = ingest_file(path)
+    target = str(tmp_path / 'a.parquet')
+    columnar = convert_to_parquet(path, manifest, target)
+
+    assert columnar['format'] == 'parquet' and columnar['source_format'] == 'csv'
+    assert columnar['rows'] == 3000
+    assert columnar['source_encoding'] == 'gb18030'
+    assert columnar['size'] == (tmp_path / 'a.parquet').stat().st_size
+    assert read_data(target, columnar).equals(read_data(path, manifest))
+    # 按配置的行组大小写出，每个列块带统计信息（列块元数据字段12）
+    data = (tmp_path / 'a.parquet').read_bytes()
+    footer_size = int.from_bytes(data[-8:-4], 'little')
+    footer = _CompactReader(data[-8 - footer_size:-8]).read_struct()
+    assert [group.get(3) for group in footer[4]] == [1000, 1000, 1000]
+    assert all(12 in column[3] for group in footer[4] for column in group[1])
+
+
+def test_convert_falls_back_to_full_schema_inference(tmp_path):
+    from app.services.file_ingest import convert_to_parquet
+
+    # 前10000行都是整数，之后出现文本
+    text = 'a\n' + '1\n' * 12_000 + 'x\n'
+    path = write(tmp_path, 'a.csv', text.encode())
+    columnar = convert_to_parquet(path, ingest_file(path), str(tmp_path / 'a.parquet'))
+    assert columnar['schema'] == {'a': 'String'}
+    assert columnar['rows'] == 12_001
@@ -0,0 +1,59 @@
+from fastapi.responses import Response
+
+from app.core.http_cache import cached, etag_matches, make_etag
+
+ETAG = make_etag('version', 'v1')
+
+
+def not_found() -> Response:
+    return Response(status_code=404)
+
+
+def ok() -> Response:
+    return Response(content=b'data', status_code=200)
+
+
+class TestEtagMatches:
+    def test_missing_header(self):
+        assert not etag_matches(None, ETAG)
+        assert not etag_matches('', ETAG)
+
+    def test_exact_and_list(self):
+        assert etag_matches(ETAG, ETAG)
+        assert etag_matches(f'"other", {ETAG}', ETAG)
+        assert not etag_matches('"other"', ETAG)
+
+    def test_weak_comparison(self):
+        assert etag_matches(f'W/{ETAG}', ETAG)
+
+    def test_wildcard(self):
+        assert etag_matches('*', ETAG)
+        assert etag_matches(' * ', ETAG)
+
+
+class TestCached:
+    def test_match_returns_304_without_building(self):
+        def build():
+            raise AssertionError('不应生成响应体')
+        response = cached(ETAG, ETAG, 'no-cache', build, vary='Accept')
+        assert response.status_code == 304
+        assert response.headers['ETag'] == ETAG
+        assert response.headers['Vary'] == 'Accept'
+
+    def test_miss_builds_with_cache_headers(self):
+        response = cached('"other"', ETAG, 'no-cache', ok)
+        assert response.status_code == 200
+        assert response.headers['ETag'] == ETAG
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+    def test_wildcard_for_missing_resource(self):
+        response = cached('*', ETAG, 'no-cache', not_found, exists=lambda: False)
+        assert response.status_code == 404
+
+    def test_wildcard_for_existing_resource(self):
+        assert cached('*', ETAG, 'no-cache', not_found, exists=lambda: True).status_code == 304
+
+    def test_exists_only_checked_for_wildcard(self):
+        def exists():
+            raise AssertionError('只有 * 需要检查资源是否存在')
+        assert cached(ETAG, ETAG, 'no-cache', ok, exists=exists).status_code == 304
@@ -0,0 +1,122 @@
+import threading
+import time
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.data_version import Base, Job
+from app.services import jobs
+from app.services.jobs import JobManager, STOPPED_ERROR
+
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}",
+                           connect_args={'check_same_thread': False})
+    Base.metadata.create_all(bind=engine, tables=[Job.__table__])
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(jobs, 'SessionLocal', factory)
+    yield factory
+    engine.dispose()
+
+
+def wait_for(manager, job_id, statuses, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.get(job_id)
+        if status['status'] in statuses:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"任务状态: {manager.get(job_id)['status']}")
+
+
+def waiting_handler(started: threading.Event):
+    def handler(ctx, params):
+        started.set()
+        while True:
+            ctx.check_cancelled()
+            time.sleep(0.01)
+    return handler
+
+
+def test_submit_and_result(sessions):
+    manager = JobManager(max_workers=1)
+    manager.register('add', lambda ctx, params: {'sum': params['a'] + params['b']})
+    job_id = manager.submit('add', {'a': 1, 'b': 2})['job_id']
+    status = wait_for(manager, job_id, {'succeeded'})
+    assert status['progress'] == 1.0
+    assert manager.result(job_id)['result'] == {'sum': 3}
+    types = [event['type'] for event in manager.events_since(job_id)]
+    assert types[0] == 'status' and len(types) == 3
+    manager.stop()
+
+
+def test_failure_and_retry(sessions):
+    manager = JobManager(max_workers=1)
+    attempts = []
+
+    def flaky(ctx, params):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError('boom')
+        return 'ok'
+
+    manager.register('flaky', flaky)
+    job_id = manager.submit('flaky', {})['job_id']
+    assert wait_for(manager, job_id, {'failed'})['error'] == 'boom'
+    retried = manager.retry(job_id)
+    assert retried['retry_of'] == job_id
+    wait_for(manager, retried['job_id'], {'succeeded'})
+    manager.stop()
+
+
+def test_cancel_running_job(sessions):
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    manager.register('wait', waiting_handler(started))
+    job_id = manager.submit('wait', {})['job_id']
+    assert started.wait(5)
+    manager.cancel(job_id)
+    wait_for(manager, job_id, {'cancelled'})
+    manager.stop()
+
+
+def test_stop_interrupts_running_and_keeps_queued(sessions):
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    manager.register('wait', waiting_handler(started))
+    running = manager.submit('wait', {})['job_id']
+    queued = manager.submit('wait', {})['job_id']
+    assert started.wait(5)
+
+    manager.stop(timeout=5)
+    status = manager.get(running)
+    assert status['status'] == 'failed' and status['error'] == STOPPED_ERROR
+    # 未开始的任务保持排队，重启后恢复执行
+    assert manager.get(queued)['status'] == 'pending'
+    with pytest.raises(RuntimeError):
+        manager.submit('wait', {})
+
+    restarted = JobManager(max_workers=1)
+    restarted.register('wait', lambda ctx, params: 'done')
+    restarted.start()
+    wait_for(restarted, queued, {'succeeded'})
+    restarted.stop()
+
+
+def test_stop_marks_stuck_jobs_failed(sessions):
+    manager = JobManager(max_workers=1)
+    started, release = threading.Event(), threading.Event()
+
+    def stuck(ctx, params):
+        # 不检查取消的任务
+        started.set()
+        release.wait(5)
+
+    manager.register('stuck', stuck)
+    job_id = manager.submit('stuck', {})['job_id']
+    assert started.wait(5)
+    manager.stop(timeout=0.1)
+    assert manager.get(job_id)['status'] == 'failed'
+    release.set()
@@ -0,0 +1,79 @@
+import os
+
+import polars as pl
+import pytest
+
+from app.core import parquet_index
+from app.core.parquet_index import read_row_group_index
+
+
+class FakeMinio:
+    """按范围读取本地文件，记录每次请求"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.ranges = []
+
+    def stat_size(self, bucket_name, object_name):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else None
+
+    def get_range(self, bucket_name, object_name, offset, length):
+        self.ranges.append((offset, length))
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+@pytest.fixture
+def parquet_file(tmp_path):
+    path = str(tmp_path / 'data.parquet')
+    pl.DataFrame({
+        'id': range(10000),
+        'name': [f'name{i % 97}' for i in range(10000)]
+    }).write_parquet(path, row_group_size=3000)
+    return path
+
+
+def test_row_groups(parquet_file):
+    minio = FakeMinio(parquet_file)
+    index = read_row_group_index(minio, 'bucket', 'data.parquet')
+
+    assert len(minio.ranges) == 1
+    assert index.rows == pl.scan_parquet(parquet_file).select(pl.len()).collect().item() == 10000
+    assert index.size == os.path.getsize(parquet_file)
+    assert [group['rows'] for group in index.row_groups] == [3000, 3000, 3000, 1000]
+    start = 0
+    for group in index.row_groups:
+        assert group['start'] == start
+        assert group['byte_start'] > 0 and group['bytes'] > 0
+        start += group['rows']
+
+
+def test_covering(parquet_file):
+    index = read_row_group_index(FakeMinio(parquet_file), 'bucket', 'data.parquet')
+    starts = index.starts
+    assert index.covering(0, 10) == (0, 0)
+    assert index.covering(starts[1] - 1, 2) == (0, 1)
+    assert index.covering(9999, 100) == (len(starts) - 1, len(starts) - 1)
+    assert index.covering(10000, 10) == (-1, -1)
+    assert index.covering(0, 0) == (-1, -1)
+
+
+def test_large_footer_needs_second_request(parquet_file, monkeypatch):
+    monkeypatch.setattr(parquet_index, 'TAIL_BYTES', 16)
+    minio = FakeMinio(parquet_file)
+    index = read_row_group_index(minio, 'bucket', 'data.parquet')
+    assert len(minio.ranges) == 2
+    assert index.rows == 10000
+
+
+def test_missing_object(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        read_row_group_index(FakeMinio(str(tmp_path / 'missing.parquet')), 'bucket', 'missing.parquet')
+
+
+def test_not_parquet(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text('id,name\n' + '1,a\n' * 100)
+    with pytest.raises(ValueError):
+        read_row_group_index(FakeMinio(str(path)), 'bucket', 'data.csv')
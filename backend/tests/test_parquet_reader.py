@@ -0,0 +1,64 @@
+import os
+
+import polars as pl
+import pytest
+
+from app.core.minio_client import MinIOClient
+from app.core.parquet_reader import ParquetObjectReader
+from app.core.version_manager import VersionManager
+
+
+class LocalStore:
+    """对象地址为本地文件路径"""
+
+    storage_options = None
+
+    def __init__(self, root):
+        self.root = root
+
+    def object_uri(self, bucket_name, object_name):
+        return os.path.join(self.root, bucket_name, object_name)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalStore(str(tmp_path))
+    os.makedirs(tmp_path / 'bucket')
+    pl.DataFrame({
+        'id': range(10_000),
+        'name': [f'n{i % 13}' for i in range(10_000)],
+        'value': [i * 0.5 for i in range(10_000)],
+    }).write_parquet(store.object_uri('bucket', 'a.parquet'), row_group_size=2500)
+    return store
+
+
+def test_metadata_and_slices(store):
+    reader = ParquetObjectReader(store)
+    assert reader.schema('bucket', 'a.parquet') == {'id': 'Int64', 'name': 'String', 'value': 'Float64'}
+    assert reader.row_count('bucket', 'a.parquet') == 10_000
+
+    rows = reader.read('bucket', 'a.parquet', columns=['value'], offset=6000, limit=3)
+    assert rows.columns == ['value'] and rows['value'].to_list() == [3000.0, 3000.5, 3001.0]
+    assert reader.head('bucket', 'a.parquet', n=2)['id'].to_list() == [0, 1]
+    assert len(reader.read('bucket', 'a.parquet', offset=9998)) == 2
+
+
+def test_minio_uri_and_storage_options(monkeypatch):
+    monkeypatch.setenv('MINIO_ENDPOINT', 'minio:9000')
+    monkeypatch.setenv('MINIO_SECURE', 'false')
+    client = MinIOClient()
+    assert client.object_uri('bucket', 'data/a.parquet') == 's3://bucket/data/a.parquet'
+    assert client.storage_options['aws_endpoint_url'] == 'http://minio:9000'
+    assert client.storage_options['aws_allow_http'] == 'true'
+
+
+def test_diff_reads_common_columns(store):
+    before = pl.scan_parquet(store.object_uri('bucket', 'a.parquet'))
+    after = before.drop('name').with_columns(
+        pl.when(pl.col('id') < 10).then(-1.0).otherwise(pl.col('value')).alias('value'),
+        pl.lit(1).alias('extra')
+    ).head(9000)
+    diff = VersionManager.__new__(VersionManager)._calculate_data_diff(before, after)
+    assert (diff['rows_before'], diff['rows_after'], diff['rows_change']) == (10_000, 9000, -1000)
+    assert diff['columns_added'] == ['extra'] and diff['columns_removed'] == ['name']
+    assert diff['data_changes'] == {'id': 0, 'value': 10}
@@ -0,0 +1,80 @@
+import io
+from datetime import date
+
+import numpy as np
+import orjson
+import polars as pl
+import pytest
+from fastapi import HTTPException
+
+from app.core.preview_payload import (ARROW_MEDIA_TYPE, columnar, json_response, resolve_format,
+                                      rows_frame, table_response, truncate_strings)
+
+
+@pytest.fixture
+def frame():
+    return pl.DataFrame({
+        'id': [1, 2, 3],
+        'text': ['short', 'x' * 50, None],
+        'day': [date(2024, 1, 1), None, date(2024, 1, 3)],
+    })
+
+
+def test_resolve_format():
+    assert resolve_format('rows') == 'rows'
+    assert resolve_format('rows', f'{ARROW_MEDIA_TYPE}, */*') == 'arrow'
+    assert resolve_format('columnar', ARROW_MEDIA_TYPE) == 'columnar'
+    with pytest.raises(HTTPException) as error:
+        resolve_format('csv')
+    assert error.value.status_code == 400
+
+
+def test_truncate_strings(frame):
+    truncated, counts = truncate_strings(frame, 10)
+    assert counts == {'text': 1}
+    assert truncated['text'].to_list() == ['short', 'x' * 10, None]
+    assert truncate_strings(frame, None)[0] is frame
+    assert truncate_strings(frame, 100)[1] == {}
+
+
+def test_columnar(frame):
+    payload = columnar(frame, max_chars=10)
+    assert payload['columns'] == ['id', 'text', 'day']
+    assert payload['schema'] == {'id': 'Int64', 'text': 'String', 'day': 'Date'}
+    assert payload['data'][0] == [1, 2, 3]
+    assert payload['data'][1][1] == 'x' * 10
+    assert payload['truncated'] == {'text': 1}
+    # 行数较多时列式编码比逐行字典小得多
+    large = pl.concat([frame] * 100)
+    assert len(orjson.dumps(columnar(large), default=str)) < 0.7 * len(orjson.dumps(large.to_dicts(), default=str))
+
+
+def test_rows_frame_projection():
+    rows = [{'a': 1, 'b': 'x'}, {'a': None, 'b': 'y', 'c': 2.5}]
+    df = rows_frame(rows, columns=['b', 'missing', 'a'])
+    assert df.columns == ['b', 'a'] and df['a'].to_list() == [1, None]
+    assert rows_frame([]).is_empty()
+
+
+def test_json_response_serializes_numpy_and_dates():
+    response = json_response({'value': np.int64(3), 'array': np.arange(2), 'day': date(2024, 1, 1), 1: 'k'})
+    assert response.media_type == 'application/json'
+    assert orjson.loads(response.body) == {'value': 3, 'array': [0, 1], 'day': '2024-01-01', '1': 'k'}
+
+
+def test_table_response_formats(frame):
+    metadata = {'offset': 0, 'total_rows': 3}
+    rows = orjson.loads(table_response(frame, 'rows', metadata).body)
+    assert rows['rows'][1]['text'] == 'x' * 50 and 'truncated' not in rows
+    assert rows['total_rows'] == 3 and rows['dtypes']['day'] == 'Date'
+
+    columns = orjson.loads(table_response(frame, 'columnar', metadata, default_max_chars=10).body)
+    assert columns['format'] == 'columnar' and columns['truncated'] == {'text': 1}
+
+    response = table_response(frame, 'arrow', metadata, max_chars=10)
+    assert response.media_type == ARROW_MEDIA_TYPE
+    assert response.headers['X-Preview-Total-Rows'] == '3'
+    assert response.headers['X-Preview-Truncated-Cells'] == '1'
+    decoded = pl.read_ipc_stream(io.BytesIO(response.body))
+    assert decoded['text'].to_list() == ['short', 'x' * 10, None]
+    assert decoded['day'].to_list() == frame['day'].to_list()
@@ -0,0 +1,98 @@
+import os
+
+from app.services.profile_cache import ProfileCache, file_content_hash
+
+
+def profile(size: int = 10):
+    return {'basic_info': {'total_rows': size}, 'payload': 'x' * size}
+
+
+def entry_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith('.json'))
+
+
+def test_memory_and_disk_hits(tmp_path):
+    cache = ProfileCache(str(tmp_path), memory_entries=2)
+    cache.put('a', profile())
+    assert cache.get('a') == profile()
+    assert cache.get('missing') is None
+
+    # 新实例只有磁盘层
+    reloaded = ProfileCache(str(tmp_path), memory_entries=2)
+    assert reloaded.get('a') == profile()
+    assert reloaded.get('a') == profile()
+    stats = reloaded.stats()
+    assert (stats['disk_hits'], stats['memory_hits'], stats['misses']) == (1, 1, 0)
+    assert cache.stats()['hit_rate'] == 0.5
+
+
+def test_memory_lru(tmp_path):
+    cache = ProfileCache(str(tmp_path), memory_entries=2)
+    for key in ('a', 'b'):
+        cache.put(key, profile())
+    cache.get('a')
+    cache.put('c', profile())
+    assert list(cache.memory) == ['a', 'c']
+
+
+def test_disk_eviction(tmp_path):
+    entry_bytes = len(b'{"basic_info":{"total_rows":100},"payload":""}') + 100
+    cache = ProfileCache(str(tmp_path), memory_entries=1, disk_bytes=entry_bytes * 2)
+    cache.put('a', profile(100))
+    cache.put('b', profile(100))
+    # 访问 a 之后，超出容量时先淘汰 b
+    cache.get('a')
+    cache.put('c', profile(100))
+    assert entry_files(tmp_path) == ['a.json', 'c.json']
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['disk_bytes'] <= entry_bytes * 2
+
+
+def test_oversized_entry_stays_in_memory(tmp_path):
+    cache = ProfileCache(str(tmp_path), disk_bytes=10)
+    cache.put('a', profile(100))
+    assert cache.get('a') == profile(100)
+    assert entry_files(tmp_path) == []
+
+
+def test_entries_are_json_and_leftovers_removed(tmp_path):
+    (tmp_path / 'old.pkl').write_bytes(b'\x80\x04')
+    (tmp_path / 'a.json.1234.tmp').write_bytes(b'{')
+    cache = ProfileCache(str(tmp_path))
+    cache.put('a', profile())
+    assert sorted(os.listdir(tmp_path)) == ['a.json']
+
+
+def test_refs_survive_restart(tmp_path):
+    cache = ProfileCache(str(tmp_path))
+    cache.bind('bucket/file1', 'hash1')
+    cache.bind('bucket/file2', 'hash2')
+    cache.forget('bucket/file1')
+    reloaded = ProfileCache(str(tmp_path))
+    assert reloaded.resolve('bucket/file1') is None
+    assert reloaded.resolve('bucket/file2') == 'hash2'
+
+
+def test_refs_bounded_and_log_compacted(tmp_path):
+    cache = ProfileCache(str(tmp_path), max_refs=10)
+    for i in range(3000):
+        cache.bind(f'bucket/file{i}', f'hash{i}')
+    assert len(cache.refs) == 10
+    assert cache.resolve('bucket/file0') is None
+    assert cache.resolve('bucket/file2999') == 'hash2999'
+    with open(tmp_path / 'refs.jsonl') as f:
+        assert sum(1 for _ in f) <= 2 * 10 + 1000 + 1
+
+    reloaded = ProfileCache(str(tmp_path), max_refs=10)
+    assert len(reloaded.refs) == 10
+    with open(tmp_path / 'refs.jsonl') as f:
+        assert sum(1 for _ in f) == 10
+
+
+def test_file_content_hash(tmp_path):
+    first, second = tmp_path / 'a.csv', tmp_path / 'b.csv'
+    first.write_bytes(b'id\n1\n' * 1000)
+    second.write_bytes(b'id\n1\n' * 1000)
+    assert file_content_hash(str(first), chunk_size=7) == file_content_hash(str(second))
+    second.write_bytes(b'id\n2\n')
+    assert file_content_hash(str(first)) != file_content_hash(str(second))
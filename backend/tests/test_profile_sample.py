@@ -0,0 +1,92 @@
+import time
+
+import polars as pl
+import pytest
+
+from app.services.data_profiler import DataProfiler
+from app.services.profile_tasks import ProfileTaskManager
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    # 按值排序的文件：只读开头的样本不具代表性
+    frame = pl.DataFrame({'value': list(range(50_000)), 'group': [i // 10_000 for i in range(50_000)]})
+    path = tmp_path / 'data.csv'
+    frame.write_csv(path)
+    return str(path)
+
+
+def test_complete_scan_has_confidence_interval(data_file):
+    report = DataProfiler().profile_sample(data_file, sample_size=1000, time_budget=60, seed=1)
+    sampling = report['sampling']
+    assert sampling['complete_scan'] and not sampling['prefix_sample']
+    assert sampling['sample_size'] == 1000
+    assert sampling['total_rows'] == report['basic_info']['total_rows'] == 50_000
+    assert sampling['confidence_level'] == 0.95
+    assert 0 < sampling['margin_of_error'] < 0.04
+    # 随机样本覆盖所有分组
+    assert report['columns']['group']['unique_count'] == 5
+
+
+def test_seed_reproduces_sample(data_file):
+    profiler = DataProfiler()
+    first = profiler.profile_sample(data_file, sample_size=500, time_budget=60, seed=7)
+    second = profiler.profile_sample(data_file, sample_size=500, time_budget=60, seed=7)
+    assert first['columns']['value'] == second['columns']['value']
+
+
+def test_budget_exhausted_gives_prefix_sample(data_file):
+    report = DataProfiler().profile_sample(data_file, sample_size=1000, time_budget=0)
+    sampling = report['sampling']
+    assert sampling['prefix_sample'] and not sampling['complete_scan']
+    assert sampling['confidence_level'] is None and sampling['margin_of_error'] is None
+    assert not sampling['total_rows_exact']
+    assert sampling['rows_scanned'] < 50_000
+
+
+def test_whole_file_sample_is_exact(data_file):
+    report = DataProfiler().profile_sample(data_file, sample_size=100_000, time_budget=60)
+    assert report['sampling']['exact']
+    assert report['sampling']['margin_of_error'] == 0.0
+
+
+def wait_done(manager, task_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.get(task_id)
+        if status['status'] in ('completed', 'failed'):
+            return status
+        time.sleep(0.01)
+    raise AssertionError(manager.get(task_id))
+
+
+def test_task_manager_runs_once_and_cleans_up(tmp_path):
+    manager = ProfileTaskManager(max_workers=1)
+    leftover = tmp_path / 'download.csv'
+    leftover.write_text('a\n1\n')
+    calls = []
+
+    def profile():
+        calls.append(1)
+        return {'rows': 1}
+
+    _, submitted = manager.submit('task', profile, str(leftover))
+    assert submitted
+    assert wait_done(manager, 'task')['result'] == {'rows': 1}
+    _, submitted = manager.submit('task', profile)
+    assert not submitted and len(calls) == 1
+    assert not leftover.exists()
+
+
+def test_task_manager_failure_and_eviction():
+    manager = ProfileTaskManager(max_workers=1, max_tasks=2)
+
+    def fail():
+        raise RuntimeError('boom')
+
+    manager.submit('bad', fail)
+    assert wait_done(manager, 'bad')['error'] == 'boom'
+    manager.complete('a', {})
+    manager.complete('b', {})
+    assert manager.get('bad') is None
+    assert manager.get('a') is not None and manager.get('b') is not None
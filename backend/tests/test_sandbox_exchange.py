@@ -0,0 +1,80 @@
+import os
+import time
+
+from app.core.sandbox_exchange import ArrowExchange
+
+
+def writer(size: int, calls: list = None):
+    def create(path):
+        if calls is not None:
+            calls.append(path)
+        with open(path, 'wb') as f:
+            f.write(b'x' * size)
+    return create
+
+
+def arrow_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith('.arrow'))
+
+
+def test_acquire_creates_once(tmp_path):
+    exchange = ArrowExchange(str(tmp_path), max_bytes=1000)
+    calls = []
+    first = exchange.acquire('v1', writer(10, calls))
+    second = exchange.acquire('v1', writer(10, calls))
+    assert first == second == exchange.path('v1')
+    assert len(calls) == 1
+    # 临时文件已移入或删除
+    assert arrow_files(tmp_path) == ['v1.arrow']
+    assert sorted(os.listdir(tmp_path)) == ['v1.arrow']
+
+
+def test_unpinned_evicted_lru(tmp_path):
+    exchange = ArrowExchange(str(tmp_path), max_bytes=250)
+    for version_id in ('v1', 'v2'):
+        with exchange.using(version_id, writer(100)):
+            pass
+        time.sleep(0.01)
+    # 访问 v1 之后先淘汰 v2
+    with exchange.using('v1', writer(100)):
+        pass
+    with exchange.using('v3', writer(100)):
+        pass
+    assert arrow_files(tmp_path) == ['v1.arrow', 'v3.arrow']
+
+
+def test_pinned_file_survives_eviction(tmp_path):
+    exchange = ArrowExchange(str(tmp_path), max_bytes=150)
+    path = exchange.acquire('v1', writer(100))
+    # 使用期间其他版本放入交换目录，超出容量也不删除 v1
+    with exchange.using('v2', writer(100)):
+        pass
+    assert arrow_files(tmp_path) == ['v1.arrow', 'v2.arrow']
+
+    exchange.release(path)
+    with exchange.using('v3', writer(100)):
+        pass
+    assert arrow_files(tmp_path) == ['v3.arrow']
+
+
+def test_nested_pins(tmp_path):
+    exchange = ArrowExchange(str(tmp_path), max_bytes=150)
+    first = exchange.acquire('v1', writer(100))
+    second = exchange.acquire('v1', writer(100))
+    exchange.release(first)
+    with exchange.using('v2', writer(100)):
+        pass
+    assert os.path.exists(second)
+    exchange.release(second)
+    exchange.release(None)
+    assert exchange._pins == {}
+
+
+def test_put_with_pin(tmp_path):
+    exchange = ArrowExchange(str(tmp_path), max_bytes=150)
+    source = exchange.pending_path()
+    writer(100)(source)
+    path = exchange.put('v1', source, pin=True)
+    with exchange.using('v2', writer(100)):
+        pass
+    assert os.path.exists(path)
@@ -0,0 +1,84 @@
+import json
+import os
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.core.config import settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUNNER = os.path.join(BACKEND_DIR, 'app', 'core', 'sandbox_runner.py')
+
+
+def read(*parts):
+    with open(os.path.join(BACKEND_DIR, *parts), encoding='utf-8') as f:
+        return f.read()
+
+
+def test_requirements_match_lock():
+    pins = dict(re.findall(r'^([\w-]+)==([\w.]+)$', read('sandbox', 'requirements.txt'), re.M))
+    locked = re.search(r'name = "polars"\nversion = "([\w.]+)"', read('uv.lock')).group(1)
+    assert pins['polars'] == locked
+    minimum = re.search(r'"polars>=([\w.]+)"', read('pyproject.toml')).group(1)
+    assert tuple(map(int, locked.split('.'))) >= tuple(map(int, minimum.split('.')))
+
+
+def test_image_user_matches_settings():
+    uid = re.search(r'useradd --uid (\d+)', read('sandbox', 'Dockerfile')).group(1)
+    assert int(uid) == settings.SANDBOX_CONTAINER_UID
+
+
+def request(socket_path, payload, timeout=30):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.settimeout(timeout)
+        conn.connect(socket_path)
+        with conn.makefile('rwb') as stream:
+            stream.write(json.dumps(payload).encode() + b'\n')
+            stream.flush()
+            return json.loads(stream.readline())
+
+
+@pytest.fixture
+def runner(tmp_path):
+    # 与镜像中一样，运行器单独放在一个目录中，不依赖 app 包
+    runner_dir, work_dir, scratch = tmp_path / 'runner', tmp_path / 'work', tmp_path / 'scratch'
+    for directory in (runner_dir, work_dir, scratch):
+        directory.mkdir()
+    shutil.copy(RUNNER, runner_dir / 'sandbox_runner.py')
+    socket_path = str(work_dir / 'worker.sock')
+    proc = subprocess.Popen([sys.executable, '-I', str(runner_dir / 'sandbox_runner.py'),
+                             '--serve', socket_path, '--scratch', str(scratch)], cwd=str(work_dir))
+    deadline = time.monotonic() + 30
+    while not os.path.exists(socket_path):
+        assert proc.poll() is None and time.monotonic() < deadline
+        time.sleep(0.05)
+    yield socket_path, work_dir, scratch
+    proc.kill()
+    proc.wait()
+
+
+def test_standalone_runner_serves_jobs(runner):
+    socket_path, work_dir, scratch = runner
+    assert request(socket_path, {'type': 'ping'}) == {'ready': True}
+
+    (work_dir / 'input.csv').write_text('a,b\n1,x\n2,y\n3,z\n')
+    (scratch / 'leftover').write_text('tmp')
+    code = "import sys\nresult_df = df.filter(pl.col('a') > 1).with_columns(pl.lit(sys.flags.isolated).alias('c'))"
+    result = request(socket_path, {
+        'code': code,
+        'input_path': str(work_dir / 'input.csv'),
+        'output_path': str(work_dir / 'output.parquet'),
+        'preview_rows': 5
+    })
+    assert result['success'], result.get('traceback')
+    assert result['manifest']['rows'] == 2
+    assert result['manifest']['preview'][0] == {'a': 2, 'b': 'y', 'c': 1}
+
+    # 下一个任务由新的子进程处理，上一个任务的临时文件已清空
+    assert request(socket_path, {'type': 'ping'}) == {'ready': True}
+    assert not os.listdir(scratch)
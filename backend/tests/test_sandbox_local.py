@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+import time
+
+import polars as pl
+import pytest
+
+from app.core.sandbox_local import LocalProcessExecutor, sandbox_env
+
+
+@pytest.fixture(scope='module')
+def scratch():
+    directory = tempfile.mkdtemp(prefix='test-sandbox-')
+    yield directory
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture(scope='module')
+def executor(scratch):
+    # forkserver启动时的环境中有密钥，子进程不应看到
+    os.environ['OPENAI_API_KEY'] = 'sk-test-secret'
+    try:
+        backend = LocalProcessExecutor(scratch_dir=os.path.join(scratch, 'local'), timeout=3,
+                                       memory_limit='1g', cpu_limit=1, max_concurrency=2)
+    finally:
+        del os.environ['OPENAI_API_KEY']
+    yield backend
+    backend.shutdown()
+
+
+@pytest.fixture(scope='module')
+def input_file(scratch):
+    path = os.path.join(scratch, 'input.parquet')
+    pl.DataFrame({'a': [1, 2, 3, None], 'b': ['x', 'y', 'z', 'w']}).write_parquet(path)
+    return path
+
+
+def output(scratch, name):
+    return os.path.join(scratch, name)
+
+
+def alive(pid: int) -> bool:
+    """进程是否还在运行（僵尸进程视为已退出）"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_runs_code(executor, input_file, scratch):
+    result = executor.run("result_df = df.filter(pl.col('a') > 1)", input_file, output(scratch, 'out.parquet'))
+    assert result['success'], result.get('error')
+    assert result['stats']['rows'] == 2
+    assert pl.read_parquet(result['output_path'])['a'].to_list() == [2, 3]
+
+
+def test_env_has_no_secrets(executor, input_file, scratch):
+    code = "import os\nresult_df = df.head(1).with_columns(key=pl.lit(os.environ.get('OPENAI_API_KEY', '')))"
+    result = executor.run(code, input_file, output(scratch, 'env.parquet'))
+    assert result['success'], result.get('error')
+    assert pl.read_parquet(result['output_path'])['key'].to_list() == ['']
+
+
+def test_sandbox_env_is_minimal(monkeypatch):
+    monkeypatch.setenv('MINIO_SECRET_KEY', 'secret')
+    monkeypatch.setenv('POLARS_MAX_THREADS', '2')
+    env = sandbox_env('/scratch')
+    assert 'MINIO_SECRET_KEY' not in env
+    assert env['POLARS_MAX_THREADS'] == '2'
+    assert env['TMPDIR'] == env['HOME'] == '/scratch'
+
+
+def test_timeout_kills_process_group(executor, input_file, scratch):
+    pid_dir = tempfile.mkdtemp(prefix='test-sandbox-pid-')
+    # 切换用户后的子进程也要能写入
+    os.chmod(pid_dir, 0o777)
+    pid_file = os.path.join(pid_dir, 'pid')
+    code = (
+        "import subprocess, time\n"
+        "child = subprocess.Popen(['sleep', '60'])\n"
+        f"open({pid_file!r}, 'w').write(str(child.pid))\n"
+        "time.sleep(60)\n"
+        "result_df = df"
+    )
+    try:
+        started = time.monotonic()
+        result = executor.run(code, input_file, output(scratch, 'timeout.parquet'))
+        assert not result['success']
+        assert '超时' in result['error']
+        assert time.monotonic() - started < 10
+        with open(pid_file) as f:
+            pid = int(f.read())
+        deadline = time.monotonic() + 5
+        while alive(pid) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not alive(pid), '超时后生成代码启动的子进程也应被终止'
+    finally:
+        shutil.rmtree(pid_dir, ignore_errors=True)
+    assert executor.timeouts >= 1
+    # 超时后forkserver仍可执行任务
+    assert executor.run("result_df = df", input_file, output(scratch, 'after.parquet'))['success']
+
+
+def test_memory_limit(executor, input_file, scratch):
+    result = executor.run("buffer = bytearray(4 << 30)\nresult_df = df", input_file, output(scratch, 'mem.parquet'))
+    assert not result['success']
+    assert 'MemoryError' in result['error'] or '内存' in result['error']
+
+
+def test_pipeline_breaker(executor, input_file, scratch):
+    steps = [
+        "result_df = df.filter(pl.col('a').is_not_null())",
+        # LazyFrame不支持按列名取值，在这一步先计算出结果
+        "result_df = df.with_columns(c=df['a'] * 2)",
+        "result_df = df.filter(pl.col('c') > 2)"
+    ]
+    result = executor.run(steps, input_file, output(scratch, 'pipeline.parquet'))
+    assert result['success'], result.get('error')
+    assert result['pipeline']['breakers'] == [1]
+    assert pl.read_parquet(result['output_path'])['c'].to_list() == [4, 6]
+
+
+def test_pipeline_error_is_not_breaker(executor, input_file, scratch):
+    # 只有 AttributeError/TypeError 按断点处理，其他错误直接报告，不在DataFrame上重试
+    steps = ["if isinstance(df, pl.LazyFrame):\n    raise ValueError('invalid step')\nresult_df = df"]
+    result = executor.run(steps, input_file, output(scratch, 'pipeline_error.parquet'))
+    assert not result['success']
+    assert 'invalid step' in result['error']
@@ -0,0 +1,81 @@
+import os
+import stat
+
+import pytest
+
+from app.core.sandbox_pool import SandboxWorker, WarmContainerPool
+
+
+def test_shared_dirs_not_world_writable(tmp_path):
+    pool = WarmContainerPool(None, image='sandbox', shared_dir=str(tmp_path), container_uid=10001)
+    path = tmp_path / 'worker'
+    path.mkdir()
+    pool.grant_dir(str(path))
+    info = os.stat(path)
+    assert not info.st_mode & stat.S_IRWXO
+    if os.geteuid() == 0:
+        assert (info.st_uid, info.st_gid) == (10001, 10001)
+        assert pool.container_user() == '10001:10001'
+    else:
+        assert stat.S_IMODE(info.st_mode) == 0o770
+        assert pool.container_user() == f'10001:{os.getgid()}'
+
+
+class _FakeContainer:
+    def __init__(self):
+        self.removed = False
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class _FakePool(WarmContainerPool):
+    """不启动Docker容器，只检查容器的复用和回收"""
+
+    def _start_worker(self):
+        worker_id = f'w{self.started}'
+        host_dir = os.path.join(self.shared_dir, worker_id)
+        os.makedirs(host_dir)
+        self.started += 1
+        return SandboxWorker(worker_id, _FakeContainer(), host_dir)
+
+
+def test_lease_reuses_and_recycles_workers(tmp_path):
+    pool = _FakePool(None, image='sandbox', shared_dir=str(tmp_path), size=2,
+                     min_warm=0, max_warm=1, max_jobs=2)
+    with pool.lease() as first:
+        open(first.host_path('output.arrow'), 'wb').close()
+    # 归还时清空工作目录，下一个任务复用同一个容器
+    assert os.listdir(first.host_dir) == []
+    with pool.lease() as second:
+        assert second is first
+    # 达到 max_jobs 后销毁
+    assert first.container.removed
+    assert pool.stats()['recycled'] == 1
+    assert pool.stats()['idle'] == 0
+
+
+def test_failed_lease_destroys_worker(tmp_path):
+    pool = _FakePool(None, image='sandbox', shared_dir=str(tmp_path), size=1,
+                     min_warm=0, max_warm=1)
+    with pytest.raises(ValueError):
+        with pool.lease() as worker:
+            raise ValueError('boom')
+    assert worker.container.removed
+    assert not os.path.exists(worker.host_dir)
+    assert pool.stats()['busy'] == 0
+    with pool.lease() as replacement:
+        assert replacement is not worker
+
+
+def test_acquire_times_out_when_pool_is_full(tmp_path):
+    pool = _FakePool(None, image='sandbox', shared_dir=str(tmp_path), size=1,
+                     min_warm=0, max_warm=1)
+    worker = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire(timeout=0.05)
+    pool.release(worker)
+    assert pool.acquire(timeout=0.05) is worker
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.acquire(timeout=0.05)
@@ -0,0 +1,89 @@
+import polars as pl
+import pytest
+
+from app.core.sandbox_runner import build_manifest, run_job, run_pipeline
+
+
+@pytest.fixture
+def input_file(tmp_path):
+    path = str(tmp_path / 'input.parquet')
+    pl.DataFrame({
+        'id': list(range(1000)),
+        'value': [float(i % 37) if i % 11 else None for i in range(1000)],
+        'name': [f'n{i % 7}' for i in range(1000)],
+    }).write_parquet(path)
+    return path
+
+
+STEPS = [
+    "result_df = df.filter(pl.col('id') % 2 == 0)",
+    "result_df = df.with_columns((pl.col('value') * 2).alias('double'))",
+]
+BREAKER = "result_df = df.filter(pl.col('value') > df['value'].median())"
+
+
+def job(tmp_path, input_file, steps, **extra):
+    return {
+        'steps': steps,
+        'input_path': input_file,
+        'output_path': str(tmp_path / 'out.parquet'),
+        'exchange_path': str(tmp_path / 'out.arrow'),
+        'preview_rows': 5,
+        **extra
+    }
+
+
+def expected(input_file, steps):
+    df = pl.read_parquet(input_file)
+    for code in steps:
+        namespace = {'pl': pl, 'df': df}
+        exec(code, namespace)
+        df = namespace['result_df']
+    return df
+
+
+def test_pipeline_without_breakers_sinks_output(tmp_path, input_file):
+    result = run_job(job(tmp_path, input_file, STEPS))
+    assert result['success'], result.get('traceback')
+    assert result['pipeline']['breakers'] == []
+    df = expected(input_file, STEPS)
+    assert pl.read_parquet(tmp_path / 'out.parquet').equals(df)
+    assert pl.read_ipc(tmp_path / 'out.arrow').equals(df)
+
+    manifest = result['manifest']
+    reference = build_manifest(df, 5)
+    for key in ('rows', 'columns', 'column_names', 'dtypes', 'null_counts', 'column_stats', 'preview'):
+        assert manifest[key] == reference[key]
+    assert manifest['memory_usage'] > 0
+    assert result['stats']['rows'] == len(df)
+
+
+def test_pipeline_with_breaker(tmp_path, input_file):
+    steps = STEPS + [BREAKER]
+    result = run_job(job(tmp_path, input_file, steps))
+    assert result['success'], result.get('traceback')
+    assert result['pipeline']['breakers'] == [2]
+    df = expected(input_file, steps)
+    assert pl.read_parquet(tmp_path / 'out.parquet').equals(df)
+    assert result['manifest'] == build_manifest(df, 5)
+
+
+def test_partial_pipeline(tmp_path, input_file):
+    result = run_job(job(tmp_path, input_file, STEPS, limit=3))
+    assert result['success'], result.get('traceback')
+    assert result['pipeline']['partial']
+    assert result['manifest']['rows'] == 3
+
+
+def test_run_pipeline_is_lazy(input_file):
+    lf, plan = run_pipeline(STEPS, pl.scan_parquet(input_file))
+    assert isinstance(lf, pl.LazyFrame)
+    assert plan['steps'] == 2 and not plan['partial']
+
+
+def test_manifest_of_empty_result(tmp_path, input_file):
+    result = run_job(job(tmp_path, input_file, ["result_df = df.filter(pl.col('id') < 0)"]))
+    assert result['success'], result.get('traceback')
+    manifest = result['manifest']
+    assert manifest['rows'] == 0
+    assert manifest['column_stats']['id'] == {'null_count': 0}
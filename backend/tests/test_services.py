@@ -0,0 +1,59 @@
+import threading
+import time
+
+from app.core.services import ServiceContainer
+
+
+def test_get_creates_once_across_threads():
+    container = ServiceContainer()
+    created = []
+
+    def factory():
+        time.sleep(0.01)
+        created.append(object())
+        return created[-1]
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(container._get('client', factory)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(created) == 1
+    assert all(result is created[0] for result in results)
+
+
+def test_profiler_shared_and_loaded_flags():
+    container = ServiceContainer()
+    assert container.loaded() == {'minio': False, 'agent': False, 'sandbox': False, 'profiler': False}
+    assert container.profiler is container.profiler
+    assert container.loaded()['profiler']
+
+
+class FakeSandbox:
+    def __init__(self):
+        self.closed = False
+
+    def shutdown(self):
+        self.closed = True
+
+
+def test_startup_tolerates_failures_and_shutdown_releases(monkeypatch):
+    container = ServiceContainer()
+    sandbox = FakeSandbox()
+    attempts = []
+
+    def failing_minio(self):
+        attempts.append(1)
+        raise ConnectionError('minio unavailable')
+
+    monkeypatch.setattr(ServiceContainer, 'minio', property(failing_minio))
+    monkeypatch.setattr(ServiceContainer, 'sandbox', property(lambda self: self._get('sandbox', lambda: sandbox)))
+    container.startup()
+    assert attempts == [1]
+    assert container.loaded()['sandbox'] and container.loaded()['profiler']
+
+    container.shutdown()
+    assert sandbox.closed
+    assert not any(container.loaded().values())
@@ -0,0 +1,81 @@
+import json
+
+import numpy as np
+import polars as pl
+import pytest
+
+from app.services.data_profiler import DataProfiler
+from app.services.sketches import HyperLogLog, KLLSketch
+
+
+@pytest.mark.parametrize('distinct', [10, 1000, 200_000])
+def test_hll_within_error_bound(distinct):
+    sketch = HyperLogLog(12)
+    sketch.update(pl.Series(np.arange(distinct) % distinct).cast(pl.Utf8))
+    # 4倍标准误差，小基数时线性计数几乎精确
+    assert abs(sketch.count() - distinct) <= max(4 * sketch.relative_error * distinct, 1)
+
+
+def test_hll_merge_and_serialization():
+    whole, left, right = HyperLogLog(12), HyperLogLog(12), HyperLogLog(12)
+    values = pl.Series(np.arange(50_000))
+    whole.update(values)
+    left.update(values[:30_000])
+    right.update(values[20_000:])
+    left.merge(right)
+    assert np.array_equal(left.registers, whole.registers)
+    restored = HyperLogLog.from_dict(json.loads(json.dumps(left.to_dict())))
+    assert restored.count() == whole.count()
+    with pytest.raises(ValueError):
+        left.merge(HyperLogLog(10))
+
+
+def test_kll_rank_error():
+    rng = np.random.default_rng(3)
+    values = rng.lognormal(0, 1, 200_000)
+    sketch = KLLSketch(200)
+    for chunk in np.array_split(values, 40):
+        sketch.update(chunk)
+    ordered = np.sort(values)
+    for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+        estimate = sketch.quantile(q)
+        rank = np.searchsorted(ordered, estimate) / len(values)
+        assert abs(rank - q) <= 2 * sketch.rank_error
+    assert sketch.n == len(values)
+    assert sum(len(level) for level in sketch.levels) < 2000
+
+
+def test_kll_merge_and_serialization():
+    rng = np.random.default_rng(4)
+    left, right = KLLSketch(200, seed=1), KLLSketch(200, seed=2)
+    left.update(rng.normal(0, 1, 50_000))
+    right.update(rng.normal(0, 1, 50_000))
+    left.merge(right)
+    assert left.n == 100_000
+    assert abs(left.quantile(0.5)) < 0.05
+    restored = KLLSketch.from_dict(json.loads(json.dumps(left.to_dict())))
+    assert restored.quantile(0.5) == left.quantile(0.5)
+    assert KLLSketch().quantile(0.5) is None
+
+
+def test_approximate_profile_close_to_exact(tmp_path):
+    rng = np.random.default_rng(5)
+    rows = 60_000
+    frame = pl.DataFrame({
+        'value': rng.normal(50, 10, rows),
+        'key': [f'k{i}' for i in rng.integers(0, 20_000, rows)],
+    })
+    path = tmp_path / 'data.parquet'
+    frame.write_parquet(path)
+    profiler = DataProfiler()
+    exact = profiler.profile_data(str(path), streaming=False)
+    approximate = profiler.profile_data(str(path), approximate=True, batch_size=10_000)
+
+    assert approximate['approximation']['unique_count']['method'] == 'HyperLogLog'
+    assert set(approximate['sketches']) == {'value', 'key'}
+    for col in ('value', 'key'):
+        assert approximate['columns'][col]['unique_count'] == pytest.approx(
+            exact['columns'][col]['unique_count'], rel=0.05)
+    # 秩误差约1.3%，在正态分布中心附近约为0.03个标准差
+    assert approximate['columns']['value']['median'] == pytest.approx(exact['columns']['value']['median'], abs=1.0)
+    assert approximate['columns']['value']['mean'] == pytest.approx(exact['columns']['value']['mean'])
@@ -0,0 +1,83 @@
+import numpy as np
+import polars as pl
+import pytest
+
+from app.services.data_profiler import DataProfiler
+from app.services.streaming_profiler import ColumnAccumulator, StreamingProfiler
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    rng = np.random.default_rng(1)
+    rows = 5000
+    frame = pl.DataFrame({
+        'id': np.arange(rows) % 4800,
+        'amount': [value if i % 17 else None for i, value in enumerate(rng.normal(100, 15, rows))],
+        'category': [f'c{i % 6}' if i % 9 else None for i in range(rows)],
+        'label': [f'item-{i % 700}' for i in range(rows)],
+    })
+    frame = pl.concat([frame, frame.head(25)])
+    path = tmp_path / 'data.parquet'
+    frame.write_parquet(path)
+    return str(path), frame
+
+
+def test_streaming_matches_exact_profile(data_file):
+    path, frame = data_file
+    profiler = DataProfiler()
+    exact = profiler.profile_data(path, streaming=False)
+    streamed = profiler.profile_data(path, streaming=True, batch_size=700)
+    assert streamed['streaming']['batches'] == 8
+    assert streamed['streaming']['approximate'] == ['median', 'outliers', 'top_values']
+
+    assert streamed['basic_info']['total_rows'] == exact['basic_info']['total_rows'] == len(frame)
+    for col in frame.columns:
+        for stat in ('null_count', 'unique_count'):
+            assert streamed['columns'][col][stat] == exact['columns'][col][stat], (col, stat)
+
+    amount, expected = streamed['columns']['amount'], exact['columns']['amount']
+    assert amount['min'] == expected['min'] and amount['max'] == expected['max']
+    assert amount['mean'] == pytest.approx(expected['mean'])
+    assert amount['std'] == pytest.approx(expected['std'])
+    # 样本容量大于行数时中位数也是精确的
+    assert amount['median'] == pytest.approx(expected['median'])
+
+    # 计数相同的值顺序可能不同
+    def counts(report):
+        return sorted((item['category'], item['count']) for item in report['columns']['category']['top_values'])
+    assert counts(streamed) == counts(exact)
+    assert streamed['quality_report']['issues'] == exact['quality_report']['issues']
+    assert streamed['sample_data'] == exact['sample_data']
+
+
+def test_distinct_overflow_falls_back_to_hll(data_file):
+    path, frame = data_file
+    result = StreamingProfiler(batch_size=1000, max_distinct=100).profile_file(path)
+    assert not result['distinct_exact']
+    label = result['columns'][frame.columns.index('label')]
+    # HyperLogLog 误差（p=12 时标准误差约1.6%）
+    assert label['unique_count'] == pytest.approx(frame['label'].n_unique(), rel=0.05)
+
+
+def test_distinct_budget_split_across_columns(data_file):
+    path, frame = data_file
+    result = StreamingProfiler(batch_size=1000, distinct_budget=4 * 1000).profile_file(path)
+    # 每列最多精确跟踪1000个值，id 列超过后改为估计值
+    assert not result['distinct_exact']
+    assert result['columns'][frame.columns.index('label')]['unique_count'] == 700
+
+
+def test_accumulator_merge_equals_single_pass():
+    rng = np.random.default_rng(0)
+    values = pl.Series('x', rng.integers(0, 50, 3000), dtype=pl.Int64)
+    whole = ColumnAccumulator('x', pl.Int64)
+    whole.update(values, np.random.default_rng(0))
+    left, right = ColumnAccumulator('x', pl.Int64), ColumnAccumulator('x', pl.Int64)
+    left.update(values[:1234], np.random.default_rng(1))
+    right.update(values[1234:], np.random.default_rng(2))
+    left.merge(right)
+    merged, expected = left.result(), whole.result()
+    for stat in ('null_count', 'unique_count', 'min', 'max', 'count'):
+        assert merged[stat] == expected[stat]
+    assert merged['mean'] == pytest.approx(expected['mean'])
+    assert merged['std'] == pytest.approx(expected['std'])
@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import io
+import threading
+
+import pytest
+
+from app.core.config import settings
+from app.services.upload_stream import ChunkPipe, UploadAborted, receive_upload
+
+
+class FakeUpload:
+    """按块读取内存中的数据，可在读到某个位置后抛出异常（模拟客户端断开）"""
+
+    def __init__(self, data: bytes, fail_after: int = None):
+        self.stream = io.BytesIO(data)
+        self.fail_after = fail_after
+
+    async def read(self, size: int) -> bytes:
+        await asyncio.sleep(0)
+        if self.fail_after is not None and self.stream.tell() >= self.fail_after:
+            raise ConnectionError('client disconnected')
+        return self.stream.read(size)
+
+
+class FakeMinio:
+    """按分段读取管道，记录上传的内容"""
+
+    def __init__(self, fail_after_parts: int = None):
+        self.objects = {}
+        self.fail_after_parts = fail_after_parts
+        self.error = None
+
+    def put_stream(self, bucket_name, object_name, stream, part_size):
+        parts = []
+        try:
+            while True:
+                if self.fail_after_parts is not None and len(parts) >= self.fail_after_parts:
+                    return False
+                part = stream.read(part_size)
+                if not part:
+                    break
+                parts.append(part)
+        except IOError as e:
+            self.error = e
+            raise
+        self.objects[(bucket_name, object_name)] = b''.join(parts)
+        return True
+
+
+@pytest.fixture(autouse=True)
+def small_chunks(monkeypatch):
+    monkeypatch.setattr(settings, 'UPLOAD_CHUNK_BYTES', 1024)
+    monkeypatch.setattr(settings, 'UPLOAD_QUEUE_CHUNKS', 2)
+    monkeypatch.setattr(settings, 'UPLOAD_PART_SIZE_MB', 1)
+
+
+def payload(size: int = 300_000) -> bytes:
+    return ''.join(f'{i},名称{i}\n' for i in range(size // 10)).encode('utf-8')[:size]
+
+
+def test_receive_upload(tmp_path):
+    data = 'id,name\n'.encode() + payload()
+    minio = FakeMinio()
+    path = str(tmp_path / 'upload.csv')
+    result = asyncio.run(receive_upload(FakeUpload(data), path, minio, 'bucket', 'raw/upload.csv'))
+    assert result['uploaded']
+    assert result['size'] == len(data)
+    assert result['content_hash'] == hashlib.sha256(data).hexdigest()
+    assert minio.objects[('bucket', 'raw/upload.csv')] == data
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_utf8_detection(tmp_path):
+    data = 'id,name\n1,名称\n'.encode('gbk')
+    result = asyncio.run(receive_upload(FakeUpload(data), str(tmp_path / 'a.csv'), FakeMinio(), 'bucket', None))
+    assert not result['utf8_valid']
+    # 多字节字符跨分块时仍是合法的UTF-8
+    data = '名' * 2000
+    result = asyncio.run(receive_upload(FakeUpload(data.encode()), str(tmp_path / 'b.csv'), FakeMinio(), 'bucket', None))
+    assert result['utf8_valid']
+
+
+def test_local_only(tmp_path):
+    data = payload()
+    minio = FakeMinio()
+    path = str(tmp_path / 'upload.csv')
+    result = asyncio.run(receive_upload(FakeUpload(data), path, minio, 'bucket', None))
+    assert result['uploaded'] and not minio.objects
+    with open(path, 'rb') as f:
+        assert f.read() == data
+
+
+def test_upload_failure_does_not_block_writer(tmp_path):
+    minio = FakeMinio(fail_after_parts=0)
+    result = asyncio.run(asyncio.wait_for(
+        receive_upload(FakeUpload(payload(3_000_000)), str(tmp_path / 'a.csv'), minio, 'bucket', 'raw/a.csv'),
+        timeout=10))
+    assert not result['uploaded']
+
+
+def test_client_disconnect_aborts_upload(tmp_path):
+    minio = FakeMinio()
+    with pytest.raises(ConnectionError):
+        asyncio.run(receive_upload(FakeUpload(payload(), fail_after=50_000), str(tmp_path / 'a.csv'),
+                                   minio, 'bucket', 'raw/a.csv'))
+    assert isinstance(minio.error, IOError)
+    assert not minio.objects
+
+
+def test_many_concurrent_uploads(tmp_path):
+    # 每个上传使用专用线程，并发数超过默认执行器的线程数时也不会互相阻塞
+    minio = FakeMinio()
+    data = payload(20_000)
+
+    async def main():
+        return await asyncio.gather(*[
+            receive_upload(FakeUpload(data), str(tmp_path / f'{i}.csv'), minio, 'bucket', f'raw/{i}.csv')
+            for i in range(64)
+        ])
+
+    results = asyncio.run(asyncio.wait_for(main(), timeout=30))
+    assert all(result['uploaded'] for result in results)
+    assert len(minio.objects) == 64
+
+
+def test_pipe_write_after_reader_finished():
+    pipe = ChunkPipe(max_chunks=1)
+    pipe.finish_reading()
+    with pytest.raises(UploadAborted):
+        asyncio.run(pipe.write(b'data'))
+
+
+def test_pipe_abort_wakes_reader():
+    pipe = ChunkPipe(max_chunks=4)
+    errors = []
+
+    def reader():
+        try:
+            pipe.read(1024)
+        except IOError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    pipe.abort(RuntimeError('writer failed'))
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+    assert errors and 'writer failed' in str(errors[0])
+
+
+def test_pipe_read_sizes():
+    pipe = ChunkPipe(max_chunks=8)
+
+    async def feed():
+        for chunk in (b'abc', b'defg', b'h'):
+            await pipe.write(chunk)
+        await pipe.close()
+
+    asyncio.run(feed())
+    assert pipe.read(5) == b'abcde'
+    assert pipe.read(5) == b'fgh'
+    assert pipe.read(5) == b''